@@ -1,6 +1,7 @@
 import logging
-from typing import Optional, Dict, Callable
-from PySide6.QtCore import QObject, Signal, QTimer, QMutex, QThread
+import threading
+from typing import Optional, Dict, Callable, List, Tuple
+from PySide6.QtCore import QObject, Qt, Signal, QTimer, QMutex, QThread
 from dataclasses import dataclass
 
 
@@ -15,11 +16,20 @@ class LogLevel:
 
 
 class LogService(QObject):
-    """线程安全的日志服务，支持缓冲写入和多种输出方式"""
-    
-    log_received = Signal(str, str)  # level, message
+    """
+    线程安全的日志总线
+    - 任意线程调用 log 只在锁内追加到队列；队列由空变非空时经排队信号唤醒主线程定时器，
+      保证最迟 flush_interval 毫秒内送达，不依赖主线程上恰好有其它日志
+    - 每次刷新以列表形式发射一次 logs_received，界面只有这一条渲染路径
+    - 连续重复的日志合并为一条并附带次数；队列满（界面跟不上）时，与已排队日志重复的行继续合并，
+      其余丢弃并在下一批中提示丢弃数
+    """
+
+    logs_received = Signal(list)  # [(level, message), ...]
+    _wake = Signal()
     _instance: Optional['LogService'] = None
     _lock = QMutex()  # 类级别的线程锁
+    MAX_QUEUE = 10000  # 待送达的最多条数（合并后），超出后启用溢出策略
 
     def __new__(cls):
         cls._lock.lock()  # 手动加锁替代with语句
@@ -36,19 +46,25 @@ class LogService(QObject):
         if not self._initialized:
             super().__init__()
             self._initialized = True
-            self._buffer = []
-            self._buffer_lock = QMutex()
+            # 队列项为 [level, message, 次数]；_queued 按 (level, message) 索引，用于溢出时合并
+            self._queue: List[list] = []
+            self._queued: Dict[Tuple[str, str], list] = {}
+            self._dropped = 0
+            self._scheduled = False
+            self._queue_lock = threading.Lock()
             self._setup_logging()
 
     def _setup_logging(self) -> None:
         """配置日志记录器"""
         self._enable_file_log = False
         self._log_path = "resources/app.log"
-        self._flush_interval = 200  # ms
-        
+        self._flush_interval = 100  # ms，任意线程日志的最大送达延迟
+
         self._timer = QTimer()
+        self._timer.setSingleShot(True)
         self._timer.setInterval(self._flush_interval)
         self._timer.timeout.connect(self._flush_buffer)
+        self._wake.connect(self._schedule_flush, Qt.ConnectionType.QueuedConnection)
         
         logging.getLogger().handlers.clear()
         logging.getLogger().propagate = False
@@ -74,36 +90,49 @@ class LogService(QObject):
         self.logger.addHandler(file_handler)
 
     def log(self, level: str, message: str, *args, **kwargs) -> None:
-        """线程安全的日志记录方法，支持立即刷新"""
+        """线程安全的日志记录方法，可在任意线程调用；flush_immediately 仅在主线程立即送达"""
         flush_immediately = kwargs.pop("flush_immediately", False)
+        key = (str(level).upper(), str(message))
+        with self._queue_lock:
+            entry = self._queue[-1] if self._queue else None
+            if entry is not None and entry[0] == key[0] and entry[1] == key[1]:
+                entry[2] += 1
+            elif len(self._queue) < self.MAX_QUEUE:
+                entry = [key[0], key[1], 1]
+                self._queue.append(entry)
+                self._queued.setdefault(key, entry)
+            elif key in self._queued:
+                self._queued[key][2] += 1
+            else:
+                self._dropped += 1
+            wake = not self._scheduled
+            self._scheduled = True
+
+        if flush_immediately and QThread.currentThread() == self.thread():
+            self._flush_buffer()
+        elif wake:
+            self._wake.emit()
 
-        self._buffer_lock.lock()
-        try:
-            self._buffer.append((level, str(message)))
-
-            if flush_immediately:
-                self._flush_buffer()
-            elif QThread.currentThread() == self.thread() and not self._timer.isActive():
-                self._timer.start()
-        finally:
-            self._buffer_lock.unlock()
+    def _schedule_flush(self) -> None:
+        """主线程中启动单次定时器（已在计时时不重置，避免推迟送达）"""
+        if not self._timer.isActive():
+            self._timer.start()
 
     def _flush_buffer(self) -> None:
-        """刷新缓冲区到所有输出"""
-        self._buffer_lock.lock()
-        try:
-            if not self._buffer:
-                self._timer.stop()
-                return
-
-            current_batch = self._buffer.copy()
-            self._buffer.clear()
-        finally:
-            self._buffer_lock.unlock()
+        """把队列作为一批送达所有输出"""
+        with self._queue_lock:
+            batch, self._queue, self._queued = self._queue, [], {}
+            dropped, self._dropped = self._dropped, 0
+            self._scheduled = False
+        if not batch and not dropped:
+            return
 
-        for level, message in current_batch:
+        records = [(level, f"{message} (x{count})" if count > 1 else message) for level, message, count in batch]
+        if dropped:
+            records.append((LogLevel.WARNING, f"⚠️ {dropped} log lines dropped, the log view could not keep up"))
+        for level, message in records:
             self._write_file_log(level, message)
-            self.log_received.emit(level, message)
+        self.logs_received.emit(records)
 
     def _write_file_log(self, level: str, message: str) -> None:
         """写入文件日志（如果启用）"""
@@ -126,33 +155,21 @@ class LogService(QObject):
             print(f"Failed to write log: {e}")
 
     def enable_file_logging(self, enabled: bool) -> None:
-        """动态启用/禁用文件日志"""
-        self._buffer_lock.lock()
-        try:
-            self._enable_file_log = enabled
-            if enabled and not any(
-                isinstance(h, logging.FileHandler) for h in self.logger.handlers
-            ):
-                self._add_file_handler()
-        finally:
-            self._buffer_lock.unlock()
+        """动态启用/禁用文件日志（仅在主线程调用）"""
+        self._enable_file_log = enabled
+        if enabled and not any(
+            isinstance(h, logging.FileHandler) for h in self.logger.handlers
+        ):
+            self._add_file_handler()
 
     def set_flush_interval(self, interval_ms: int) -> None:
-        """设置缓冲区刷新间隔（毫秒）"""
-        self._buffer_lock.lock()
-        try:
-            self._flush_interval = max(50, interval_ms)
-            self._timer.setInterval(self._flush_interval)
-        finally:
-            self._buffer_lock.unlock()
+        """设置缓冲区刷新间隔（毫秒），即日志的最大送达延迟"""
+        self._flush_interval = max(50, interval_ms)
+        self._timer.setInterval(self._flush_interval)
 
     def shutdown(self) -> None:
         """安全关闭日志服务"""
-        self._buffer_lock.lock()
-        try:
-            self._timer.stop()
-            self._flush_buffer()
-            for handler in self.logger.handlers:
-                handler.close()
-        finally:
-            self._buffer_lock.unlock()
\ No newline at end of file
+        self._timer.stop()
+        self._flush_buffer()
+        for handler in self.logger.handlers:
+            handler.close()
\ No newline at end of file
@@ -6,20 +6,32 @@ import time
 import uuid
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
-from PySide6.QtCore import QTimer, QThread, Slot, QThreadPool
+from PySide6.QtCore import Qt, QTimer, QThread, Slot, QThreadPool
 from PySide6.QtWidgets import QFileDialog
 from common.mail.email_task import GetRandomEmailTask
 from common.mail.tempEmailService import EmailService
+from gui.widgets.py_apk_library.apk_library_dialog import ApkLibraryDialog
+from gui.widgets.py_logcat.logcat_search_window import LogcatSearchWindow
+from gui.widgets.py_logcat.logcat_tail_window import LogcatTailWindow
 from gui.widgets.py_panel.adb_contral_signals import ADBControllerSignals
 from gui.widgets.py_screenshot.screenshot_viewer import ScreenshotViewer
 from models.adb_model import ADBModel
+from models.apk_library import ApkLibrary
+from models.app_snapshot import SNAPSHOT_DIR
 from models.device_store import DeviceStore
+from models.crash_clusters import format_crash_table
+from models.log_volume import format_volume_table
+from models.permission_provisioner import dangerous_permissions
+from utils.apk_size import compare_reports, format_size
+from models.input_macro import MACRO_DIR, InputMacro, MacroRecorder
 from common.log_service import LogLevel, LogService
 from utils.yaml_tool import YamlTool
 
 
 class ADBController:
     """Fully decoupled ADB controller communicating via signals"""
+
+    CRAWL_DURATION = 30 * 60  # D-pad 遍历最长时间（秒），可再次点击提前停止
     
     def __init__(self, log_service: LogService):
         self.signals = ADBControllerSignals()
@@ -32,8 +44,18 @@ class ADBController:
         self._pending_operations = {}  # 跟踪进行中的异步操作
         self._active_threads = []  # 跟踪所有活动线程
         self.adb_model.command_finished.connect(self._handle_async_response)
+        # 结果从最多 32 个安装线程发出，排队到主线程处理，完成计数与进度刻度不会并发读写
+        self.signals.install_apk_result.connect(self._process_install_apk_result, Qt.ConnectionType.QueuedConnection)
         self.last_save_dir = None  # 新增，记录上次保存的文件夹
         self.executor = ThreadPoolExecutor(max_workers=4)  # 最大并发数
+        # 安装任务大部分时间在等待传输名额，并发由 TransferScheduler 按链路控制
+        self.install_executor = ThreadPoolExecutor(max_workers=32)
+        self._macro_recorder = None  # 当前正在录制的输入宏
+        self._crawl_stop = None  # 正在运行的 D-pad 遍历的停止标志
+        self.apk_library = ApkLibrary(on_updated=self._on_apk_library_updated)  # 构建目录索引
+        self.last_apk_info = None  # 最近一次解析的 APK，用于权限预授权
+        self._log_windows = []  # 打开中的日志窗口（保持引用，避免被回收）
+        self.apk_library.start()
         
         try:
             DeviceStore.load()
@@ -408,7 +430,10 @@ class ADBController:
         
         if result.get("success"):
             # 直接传入完整消息（不再让 _emit_operation 添加额外前缀）
-            self._emit_operation("retrieve_device_logs", True, f"✅ Log saved for {device_ip} at {log_path}")
+            transfer = result.get("transfer") or {}
+            detail = (f" [{transfer['summary']}, {transfer['wire_bytes'] / 1048576:.1f} MB on wire, "
+                      f"{transfer['elapsed']}s]" if transfer else "")
+            self._emit_operation("retrieve_device_logs", True, f"✅ Log saved for {device_ip} at {log_path}{detail}")
             self.signals.logs_retrieved.emit(device_ip, log_path)
         else:
             error = result.get("error", "Unknown error")
@@ -417,6 +442,31 @@ class ADBController:
             message = f"Failed to save log for {device_ip}: {error_msg}"
             self._emit_operation("retrieve_device_logs", False, message)
 
+    def open_live_logcat(self, devices: list, package_name: str = ""):
+        """打开多设备实时 logcat 窗口，填入包名时只看该应用进程"""
+        if not devices:
+            self._emit_operation("live_logcat", False, "⚠️ No devices selected")
+            return
+        window = LogcatTailWindow(list(devices), package_name)
+        window.alert_raised.connect(self._on_log_alert)
+        window.finished.connect(lambda _: self._log_windows.remove(window) if window in self._log_windows else None)
+        self._log_windows.append(window)
+        window.show()
+        window.start()
+        self._emit_operation("live_logcat", True, f"📡 Live logcat started on {len(devices)} devices"
+                                                 + (f" (package {package_name})" if package_name else ""))
+
+    def _on_log_alert(self, event):
+        repeated = f" (+{event.suppressed} more in cooldown)" if event.suppressed else ""
+        self._emit_operation("log_alert", False, f"🚨 [{event.device_ip}] {event.rule}{repeated}: {event.line}")
+
+    def open_log_search(self):
+        """打开抓取日志检索窗口，默认定位到上次保存日志的目录"""
+        window = LogcatSearchWindow(self.last_save_dir or "")
+        window.finished.connect(lambda _: self._log_windows.remove(window) if window in self._log_windows else None)
+        self._log_windows.append(window)
+        window.show()
+
     def cleanup_device_logs(self, devices: list):
         """清除设备日志"""
         if not devices:
@@ -450,7 +500,11 @@ class ADBController:
         if not text.strip():
             self._emit_operation("input_text", False, "⚠️ Input text cannot be empty")
             return
-            
+
+        self.total_input = len(devices)
+        self.finished_input = 0
+        self.input_timings = {}
+        # 每台设备各自一个异步任务，全部并发下发
         for device_ip in devices:
             self._send_text_to_device(device_ip, text)
     
@@ -466,7 +520,9 @@ class ADBController:
         text = result.get("text", "")
         
         if result.get("success"):
-            message = f"Text '{text}' input on {device_ip}"
+            elapsed = result.get("elapsed_ms", 0)
+            self.input_timings[device_ip] = elapsed
+            message = f"Text '{text}' input on {device_ip} via {result.get('method')} in {elapsed} ms"
             self._emit_operation("input_text", True, message)
             self.signals.text_input.emit(device_ip, text)
         else:
@@ -474,7 +530,145 @@ class ADBController:
             error_msg = error.split(":")[-1].strip() if ":" in error else error
             message = f"Failed to input text on {device_ip}: {error_msg}"
             self._emit_operation("input_text", False, message)
+
+        self.finished_input = getattr(self, "finished_input", 0) + 1
+        if self.finished_input == getattr(self, "total_input", 0) and self.input_timings:
+            slowest = max(self.input_timings, key=self.input_timings.get)
+            self._emit_operation(
+                "input_text", True,
+                f"🎯 Text input done on {len(self.input_timings)}/{self.total_input} devices, "
+                f"slowest {slowest} ({self.input_timings[slowest]} ms)"
+            )
     
+    def toggle_macro_recording(self, devices: list):
+        """开始/停止在第一台选中设备上录制输入宏"""
+        if self._macro_recorder is None:
+            if not devices:
+                self._emit_operation("macro", False, "⚠️ No devices selected")
+                return
+            name = f"macro_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            recorder = MacroRecorder(devices[0], name)
+            try:
+                recorder.start()
+            except Exception as e:
+                self._emit_operation("macro", False, f"❌ Failed to start recording on {devices[0]}: {e}")
+                return
+            self._macro_recorder = recorder
+            self.signals.macro_recording_changed.emit(True)
+            self._emit_operation("macro", True, f"⏺️ Recording input on {devices[0]} ... click again to stop")
+            return
+
+        recorder, self._macro_recorder = self._macro_recorder, None
+        self.signals.macro_recording_changed.emit(False)
+        macro = recorder.stop()
+        if not macro.events:
+            self._emit_operation("macro", False, f"⚠️ No input events captured on {recorder.device_ip}")
+            return
+        try:
+            path = macro.save()
+        except OSError as e:
+            self._emit_operation("macro", False, f"❌ {e} ({len(macro.events)} events discarded)")
+            return
+        self._emit_operation(
+            "macro", True,
+            f"💾 Macro saved: {path}\n   🔢 Events: {len(macro.events)} | ⏱️ Duration: {macro.duration:.2f}s"
+        )
+
+    def replay_macro(self, devices: list):
+        """选择宏文件并在所有选中设备上并行回放"""
+        if not devices:
+            self._emit_operation("macro", False, "⚠️ No devices selected")
+            return
+
+        macro_path, _ = QFileDialog.getOpenFileName(None, "Select Macro File", MACRO_DIR, "Macro Files (*.yaml);;All Files (*)")
+        if not macro_path:
+            self._emit_operation("macro", False, "⚠️ Macro selection cancelled")
+            return
+        try:
+            macro = InputMacro.load(macro_path)
+        except Exception as e:
+            self._emit_operation("macro", False, f"❌ Invalid macro file {macro_path}: {e}")
+            return
+
+        self._emit_operation("macro", True, f"▶️ Replaying {macro.name} ({len(macro.events)} events) on {len(devices)} devices")
+        for idx, device_ip in enumerate(devices, 1):
+            self.executor.submit(self.adb_model.replay_macro_async, device_ip, macro, idx)
+
+    def _process_replay_macro_result(self, result: dict):
+        device_ip = result.get("device_ip", "unknown")
+        idx = result.get("index", 0)
+        if result.get("success"):
+            self._emit_operation("macro", True, f"✅ {idx}. Macro {result.get('macro')} replayed on {device_ip} in {result.get('elapsed')}s")
+        else:
+            error = result.get("error") or result.get("output") or "Unknown error"
+            self._emit_operation("macro", False, f"❌ {idx}. Macro replay failed on {device_ip}:\n{error}")
+
+    def snapshot_app_data(self, devices: list, package_name: str):
+        """在第一台选中设备上为应用数据创建快照"""
+        if not devices:
+            self._emit_operation("snapshot_app_data", False, "⚠️ No devices selected")
+            return
+        if not package_name:
+            self._emit_operation("snapshot_app_data", False, "⚠️ No package name provided")
+            return
+        self._emit_operation("snapshot_app_data", True, f"📸 Snapshotting {package_name} data on {devices[0]} ...")
+        self.executor.submit(self.adb_model.snapshot_app_data_async, devices[0], package_name, 1)
+
+    def _process_snapshot_app_data_result(self, result: dict):
+        device_ip = result.get("device_ip", "unknown")
+        if result.get("success"):
+            self._emit_operation(
+                "snapshot_app_data", True,
+                f"💾 Snapshot saved: {result.get('path')}\n"
+                f"   📦 {result.get('package_name')} (versionCode {result.get('version_code') or 'n/a'}) via {result.get('access')}\n"
+                f"   📏 {result.get('size', 0) / (1 << 20):.2f} MB | ⏱️ {result.get('elapsed')}s"
+            )
+        else:
+            self._emit_operation("snapshot_app_data", False, f"❌ Snapshot failed on {device_ip}: {result.get('error')}")
+
+    def restore_app_data(self, devices: list, package_name: str = ""):
+        """选择快照并并行恢复到所有选中设备"""
+        if not devices:
+            self._emit_operation("restore_app_data", False, "⚠️ No devices selected")
+            return
+        start_dir = os.path.join(SNAPSHOT_DIR, package_name) if package_name and os.path.isdir(os.path.join(SNAPSHOT_DIR, package_name)) else SNAPSHOT_DIR
+        snapshot_path, _ = QFileDialog.getOpenFileName(None, "Select App Data Snapshot", start_dir, "Snapshots (*.tar.gz);;All Files (*)")
+        if not snapshot_path:
+            self._emit_operation("restore_app_data", False, "⚠️ Snapshot selection cancelled")
+            return
+
+        self.total_restore = len(devices)
+        self.finished_restore = 0
+        self.restore_timings = {}
+        self.restore_started = time.perf_counter()
+        self._emit_operation("restore_app_data", True, f"♻️ Restoring {os.path.basename(snapshot_path)} to {len(devices)} devices")
+        for idx, device_ip in enumerate(devices, 1):
+            self.install_executor.submit(self.adb_model.restore_app_data_async, device_ip, snapshot_path, idx)
+
+    def _process_restore_app_data_result(self, result: dict):
+        device_ip = result.get("device_ip", "unknown")
+        idx = result.get("index", 0)
+        if result.get("success"):
+            self.restore_timings[device_ip] = result.get("elapsed", 0)
+            msg = f"✅ {idx}. Restored {result.get('package_name')} on {device_ip} in {result.get('elapsed')}s via {result.get('access')}"
+            if result.get("snapshot_version") and result.get("version_code") != result.get("snapshot_version"):
+                msg += (f"\n   ⚠️ Snapshot is from versionCode {result.get('snapshot_version')}, "
+                        f"device has {result.get('version_code') or 'n/a'}")
+            self._emit_operation("restore_app_data", True, msg)
+        else:
+            self._emit_operation("restore_app_data", False, f"❌ {idx}. Restore failed on {device_ip}: {result.get('error')}")
+
+        self.finished_restore += 1
+        if self.finished_restore == self.total_restore:
+            summary = (
+                f"🏁 Restore completed on {len(self.restore_timings)}/{self.total_restore} devices "
+                f"in {time.perf_counter() - self.restore_started:.1f}s"
+            )
+            if self.restore_timings:
+                slowest = max(self.restore_timings, key=self.restore_timings.get)
+                summary += f", slowest {slowest} ({self.restore_timings[slowest]}s)"
+            self._emit_operation("restore_app_data", True, summary)
+
     def get_current_package(self, devices: list):
         if not devices:
             self._emit_operation("clear_data", False, "⚠️ No devices selected")
@@ -519,30 +713,33 @@ class ADBController:
             self._emit_operation("clear_data", False, "⚠️ No devices selected")
             return
 
-        apk_path, _ = QFileDialog.getOpenFileName(
-            None,
-            "Select APK File",
-            "",
-            "APK Files (*.apk);;All Files (*)"
-        )
-        if not apk_path:
+        apk_paths = ApkLibraryDialog.select_packages(self.apk_library, "Install APK")
+        if not apk_paths:
             self._emit_operation("install", False, "APK selection canceled")
             return
 
         self.total_devices = len(devices)
         self.finished_devices = 0
-        apk_nama = os.path.basename(apk_path)
+        self.install_stats = {"pushed": 0, "staged": 0, "skipped": 0, "failed": 0}
+        self.install_progress = {}  # 设备 -> 已输出的进度刻度
+        apk_path = apk_paths if len(apk_paths) > 1 else apk_paths[0]
+        apk_nama = os.path.basename(apk_paths[0]) + (f" (+{len(apk_paths) - 1} splits)" if len(apk_paths) > 1 else "")
 
         for idx, device_ip in enumerate(devices, 1):
             # 提交安装任务
-            self.executor.submit(self._install_single_device, idx, device_ip, apk_path, apk_nama)
+            self.install_executor.submit(self._install_single_device, idx, device_ip, apk_path, apk_nama)
 
-    def _install_single_device(self, idx: int, device_ip: str, apk_path: str, apk_nama: str):
+    def _install_single_device(self, idx: int, device_ip: str, apk_path, apk_nama: str):
         """单设备APK安装任务（带设备序号）"""
+        def on_progress(event: dict):
+            self.signals.install_apk_result.emit({
+                "stage": "progress", "apk_name": apk_nama, "device_ip": device_ip, "index": idx, **event
+            })
+
         try:
                         # 开始前打印提示
             self._emit_operation("install", True, f"Start install ({idx}/{self.total_devices}) {apk_nama} on {device_ip} ...")
-            result = self.adb_model.install_apk_async(device_ip, apk_path, apk_nama, idx)
+            result = self.adb_model.install_apk(device_ip, apk_path, apk_nama, idx, progress=on_progress)
             result.update({
                 "apk_name": apk_nama,
                 "device_ip": device_ip,
@@ -565,11 +762,36 @@ class ADBController:
         device_ip = result.get("device_ip")
         idx = result.get("index", 1)
 
+        if result.get("stage") == "progress" and result.get("queued"):
+            self._emit_operation("install", True, f"🚦 ({idx}/{self.total_devices}) {device_ip} queued, link {result.get('link')} is busy")
+            return
+        if result.get("stage") == "progress":
+            # 每台设备只在跨过 10% 刻度时输出一次
+            percent = result.get("sent", 0) * 100 // max(result.get("total", 0), 1)
+            if percent // 10 <= self.install_progress.get(device_ip, -1):
+                return
+            self.install_progress[device_ip] = percent // 10
+            self._emit_operation(
+                "install", True,
+                f"⏳ ({idx}/{self.total_devices}) {device_ip} {percent}% "
+                f"{result.get('rate', 0) / (1 << 20):.1f} MB/s, ETA {result.get('eta', 0):.0f}s [{result.get('link', '')}]"
+            )
+            return
+
         if result.get("success"):
             output = result.get("output", "")
-            message = f"✅ install success ({idx}/{self.total_devices}) {apk_name} on {device_ip}\nADB output:{output}"
+            action = result.get("action", "pushed")
+            self.install_stats[action] = self.install_stats.get(action, 0) + 1
+            if action == "skipped":
+                message = f"⏭️ already up to date ({idx}/{self.total_devices}) {apk_name} on {device_ip}\n{output}"
+            else:
+                source = "staged copy, no transfer" if action == "staged" else "pushed"
+                message = (f"✅ install success ({idx}/{self.total_devices}) {apk_name} on {device_ip} "
+                           f"[{source}, {result.get('splits', 1)} apk, {result.get('elapsed', 0)}s, "
+                           f"~{result.get('throughput', 0)} MB/s]\nADB output:{output}")
             self._emit_operation("install", True, message)
         else:
+            self.install_stats["failed"] += 1
             error = result.get("error", "Unknown error")
             message = f"❌ install failed ({idx}/{self.total_devices}) {apk_name} on {device_ip}\n错误信息:{error}"
             self._emit_operation("install", False, message)
@@ -578,7 +800,19 @@ class ADBController:
         self.finished_devices += 1
         # 如果全部完成，可以打一个总提示
         if self.finished_devices == self.total_devices:
-            self._emit_operation("install", True, "🎯 所有设备安装任务完成")
+            stats = self.install_stats
+            self._emit_operation(
+                "install", True,
+                f"🎯 所有设备安装任务完成: 📤 pushed {stats['pushed']}, ♻️ staged {stats['staged']}, "
+                f"⏭️ skipped {stats['skipped']}, ❌ failed {stats['failed']}"
+            )
+            for link, link_stats in self.adb_model.apk_installer.scheduler.link_stats().items():
+                if link_stats["transferred"]:
+                    self._emit_operation(
+                        "install", True,
+                        f"   🔗 {link}: {link_stats['transferred'] / (1 << 20):.1f} MB at "
+                        f"{link_stats['average_rate'] / (1 << 20):.1f} MB/s, concurrency {link_stats['slots']}"
+                    )
             
     def uninstall_apk(self, devices: list, package_name: str):
         """批量卸载 APK（结构与安装保持一致）"""
@@ -683,23 +917,30 @@ class ADBController:
             )
             self._emit_operation("clear_data", True, summary)
             
-    def restart_app(self, devices: list, package_name: str):
-        """批量重启应用"""
+    def restart_app(self, devices: list, package_name: str, clear_data: bool = False):
+        """批量重启应用，clear_data 为 True 时在启动前清除应用数据"""
+        operation = "clear_restart_app" if clear_data else "restart_app"
         if not devices:
-            self._emit_operation("restart_app", False, "⚠️ No devices selected")
+            self._emit_operation(operation, False, "⚠️ No devices selected")
             return
         if not package_name:
-            self._emit_operation("restart_app", False, "⚠️ No package name provided")
+            self._emit_operation(operation, False, "⚠️ No package name provided")
             return
 
         self.total_restart = len(devices)
         self.finished_restart = 0
         self.success_restart = 0
+        self.restart_timings = []
 
+        task = self.adb_model.clear_and_restart_app_async if clear_data else self.adb_model.restart_app_async
         for idx, device_ip in enumerate(devices, 1):
-            self.executor.submit(self.adb_model.restart_app_async, device_ip, package_name, idx)
+            self.executor.submit(task, device_ip, package_name, idx)
+
+    def clear_and_restart_app(self, devices: list, package_name: str):
+        """批量清除数据并重启应用"""
+        self.restart_app(devices, package_name, clear_data=True)
 
-    def _process_restart_app_result(self, result: dict):
+    def _process_restart_app_result(self, result: dict, operation: str = "restart_app", title: str = "Restart"):
         """处理重启结果"""
         idx = result.get("index", 1)
         ip = result.get("device_ip", "unknown")
@@ -708,32 +949,46 @@ class ADBController:
 
         if result.get("success"):
             self.success_restart += 1
+            launch = result.get("launch") or {}
+            if launch.get("total_ms") is not None:
+                self.restart_timings.append((launch["total_ms"], ip))
+            timing = f"{launch['total_ms']} ms" if launch.get("total_ms") is not None else "n/a"
+            source = "cached" if launch.get("cached") else "resolved"
             msg = (
-                f"✅ Restart Success ({idx}/{self.total_restart})\n"
+                f"✅ {title} Success ({idx}/{self.total_restart})\n"
                 f"   📦 Package : {pkg}\n"
                 f"   🌐 Device  : {ip}\n"
+                f"   🚀 Launch  : {launch.get('method', 'n/a')} {launch.get('component', '')} ({source})\n"
+                f"   ⏱️ Timing  : TotalTime {timing}, round trip {result.get('elapsed_ms', 0)} ms\n"
                 f"   📤 Output  :\n"
                 f"{self._indent_output(output)}"
             )
-            self._emit_operation("restart_app", True, msg)
+            self._emit_operation(operation, True, msg)
         else:
             msg = (
-                f"❌ Restart Failed ({idx}/{self.total_restart})\n"
+                f"❌ {title} Failed ({idx}/{self.total_restart})\n"
                 f"   📦 Package : {pkg}\n"
                 f"   🌐 Device  : {ip}\n"
                 f"   ⚠️ Error   :\n"
                 f"{self._indent_output(output)}"
             )
-            self._emit_operation("restart_app", False, msg)
+            self._emit_operation(operation, False, msg)
 
         self.finished_restart += 1
         if self.finished_restart == self.total_restart:
             summary = (
-                f"🏁 Restart App Completed\n"
+                f"🏁 {title} App Completed\n"
                 f"   ✅ Success : {self.success_restart}\n"
                 f"   ❌ Failed  : {self.total_restart - self.success_restart}"
             )
-            self._emit_operation("restart_app", True, summary)
+            if self.restart_timings:
+                slowest_ms, slowest_ip = max(self.restart_timings)
+                average = sum(t for t, _ in self.restart_timings) // len(self.restart_timings)
+                summary += f"\n   ⏱️ Launch  : avg {average} ms, slowest {slowest_ms} ms ({slowest_ip})"
+            self._emit_operation(operation, True, summary)
+
+    def _process_clear_and_restart_app_result(self, result: dict):
+        self._process_restart_app_result(result, "clear_restart_app", "Clear & Restart")
 
     def _indent_output(self, text: str, prefix: str = "     ") -> str:
         """为多行输出添加缩进美化"""
@@ -782,14 +1037,39 @@ class ADBController:
         if self.finished_activity == self.total_activity:
             self._emit_operation("current_activity", True, "✅ Activity info fetch completed.")
 
+    def dump_ui_hierarchy(self, devices: list):
+        """获取设备当前界面的 UI 层级"""
+        if not devices:
+            self._emit_operation("dump_ui", False, "⚠️ No devices selected")
+            return
+
+        for idx, device_ip in enumerate(devices, 1):
+            self.executor.submit(self.adb_model.dump_ui_hierarchy_async, device_ip, idx)
+
+    def _process_dump_ui_hierarchy_result(self, result: dict):
+        """处理 UI 层级结果，输出可交互元素"""
+        device_ip = result.get("device_ip", "unknown")
+        idx = result.get("index", 0)
+
+        if not result.get("success"):
+            self._emit_operation("dump_ui", False, f"❌ {idx}. Failed to dump UI on {device_ip}:\n{result.get('error', 'Unknown error')}")
+            return
+
+        source = "cache" if result.get("cached") else "device"
+        focused = result.get("focused")
+        msg_lines = [
+            f"🧩 ({idx}) {device_ip} - UI Hierarchy",
+            f"   🔢 Nodes   : {result.get('node_count', 0)} ({source}, {result.get('elapsed_ms', 0)} ms)",
+            f"   🎯 Focused : {(focused.resource_id or focused.class_name) if focused else 'None'}",
+        ]
+        for node in result.get("interactive", [])[:50]:
+            label = node.text or node.content_desc
+            msg_lines.append(f"     {node.resource_id or node.class_name} {label!r} {list(node.bounds)}")
+        self._emit_operation("dump_ui", True, "\n".join(msg_lines))
+
     def parse_apk_info(self):
         """弹出系统文件选择对话框并解析 APK"""
-        apk_path, _ = QFileDialog.getOpenFileName(
-            None,
-            "Select APK File",
-            "",
-            "APK Files (*.apk);;All Files (*)"
-        )
+        apk_path = ApkLibraryDialog.select_apk(self.apk_library, "Parse APK Info")
 
         if not apk_path:
             self._emit_operation("apk_info", False, "⚠️ APK file selection cancelled")
@@ -800,59 +1080,196 @@ class ADBController:
             return
 
         self._emit_operation("apk_info", True, f"📦 Selected APK: {apk_path}")
+        info = self.apk_library.get(apk_path)
+        if info is not None:
+            # 已在构建库中索引且文件未变化，直接使用索引结果
+            self._process_parse_apk_info_result({"success": True, "apk_path": apk_path, "info": info, "elapsed_ms": 0})
+            return
         self.executor.submit(self.adb_model.parse_apk_info_async, apk_path)
 
-    def _process_parse_apk_info_result(self, result: dict):
-        """处理 APK 解析结果并提取关键字段"""
-        apk_path = result.get("apk_path", "unknown")
+    def analyze_apk_size(self):
+        """选择 APK 统计体积构成；再选一个基准 APK 时逐条目对比（取消则只统计）"""
+        apk_path = ApkLibraryDialog.select_apk(self.apk_library, "Analyze APK Size")
+        if not apk_path:
+            self._emit_operation("apk_size", False, "⚠️ APK file selection cancelled")
+            return
+        baseline_path = ApkLibraryDialog.select_apk(self.apk_library, "Compare against baseline APK (Cancel to skip)")
+        self.executor.submit(self.adb_model.analyze_apk_size_async, apk_path, baseline_path)
+
+    def analyze_crashes(self):
+        """选择日志目录（可包含多台设备的 Monkey 日志与 tombstone），聚合崩溃签名"""
+        root = QFileDialog.getExistingDirectory(None, "Select directory with captured logs / tombstones",
+                                                self.last_save_dir or "")
+        if not root:
+            self._emit_operation("crash_clusters", False, "⚠️ No log directory selected")
+            return
+        self._emit_operation("crash_clusters", True, f"🔎 Analyzing crashes under {root}...")
+        self.executor.submit(self.adb_model.analyze_crashes_async, root)
 
-        if result.get("success"):
-            raw_output = result.get("output", "")
-            try:
-                # 正则提取核心字段
-                package_name = re.search(r"package: name='(.*?)'", raw_output)
-                version_code = re.search(r"versionCode='(.*?)'", raw_output)
-                version_name = re.search(r"versionName='(.*?)'", raw_output)
-                min_sdk = re.search(r"sdkVersion:'(.*?)'", raw_output)
-                target_sdk = re.search(r"targetSdkVersion:'(.*?)'", raw_output)
-                compile_sdk = re.search(r"compileSdkVersion='(.*?)'", raw_output)
-                build_version = re.search(r"platformBuildVersionName='(.*?)'", raw_output)
-
-                label_match = re.search(r"application-label(?:-[\w\-]+)?:'(.*?)'", raw_output)
-                app_label = label_match.group(1) if label_match else "N/A"
-
-                icon_match = re.search(r"application: label='.*?' icon='(.*?)'", raw_output)
-                icon_path = icon_match.group(1) if icon_match else "N/A"
-
-                permissions = re.findall(r"uses-permission: name='(.*?)'", raw_output)
-                features = re.findall(r"uses-feature(?:-not-required)?: name='(.*?)'", raw_output)
-                native_code = re.findall(r"native-code: '(.*?)'", raw_output)
-
-                # 格式化输出
-                formatted = f"""
-    🔹 应用名称: {app_label}
-    📦 包名: {package_name.group(1) if package_name else 'N/A'}
-    🔢 版本号: {version_name.group(1) if version_name else 'N/A'} (Code: {version_code.group(1) if version_code else 'N/A'})
-    🎯 SDK版本: min={min_sdk.group(1) if min_sdk else 'N/A'}, target={target_sdk.group(1) if target_sdk else 'N/A'}, compile={compile_sdk.group(1) if compile_sdk else 'N/A'}
-    🛠️ 构建版本: {build_version.group(1) if build_version else 'N/A'}
-    🖼️ 应用图标: {icon_path}
-    🔐 权限数: {len(permissions)} 项
-    ⚙️ 特性声明: {", ".join(features) if features else "None"}
-    🧬 支持架构: {", ".join(native_code) if native_code else "未声明"}
-    """
+    def _process_analyze_crashes_result(self, result: dict):
+        if not result.get("success"):
+            self._emit_operation("crash_clusters", False, f"❌ Crash analysis failed: {result.get('error')}")
+            return
+        clusters = result["clusters"]
+        lines = [f"💥 {result['crashes']} crashes → {len(clusters)} signatures "
+                 f"({result['logs']} logcat captures, {result['tombstones']} tombstones, "
+                 f"{result['lines']} lines in {result['elapsed']}s)"]
+        if clusters:
+            lines.extend(f"   {row}" for row in format_crash_table(clusters, limit=20))
+            if len(clusters) > 20:
+                lines.append(f"   ... {len(clusters) - 20} more signatures")
+        lines.append(f"📄 Full report: {result['report_path']}")
+        self._emit_operation("crash_clusters", True, "\n".join(lines))
+
+    def analyze_log_volume(self):
+        """选择日志目录，统计各设备与整个设备群中最吵的 tag / 进程"""
+        root = QFileDialog.getExistingDirectory(None, "Select directory with captured logs", self.last_save_dir or "")
+        if not root:
+            self._emit_operation("log_volume", False, "⚠️ No log directory selected")
+            return
+        self._emit_operation("log_volume", True, f"📊 Measuring log volume under {root}...")
+        self.executor.submit(self.adb_model.analyze_log_volume_async, root)
+
+    def _process_analyze_log_volume_result(self, result: dict):
+        if not result.get("success"):
+            self._emit_operation("log_volume", False, f"❌ Log volume analysis failed: {result.get('error')}")
+            return
+        lines = [f"📊 {result['lines']} lines, {result['bytes'] / 1048576:.1f} MB from "
+                 f"{len(result['devices'])} devices ({result['files']} files in {result['elapsed']}s)"]
+        lines.extend(f"   {row}" for row in format_volume_table(result["fleet"], "tags", limit=10))
+        for label, counter in list(result["devices"].items())[:5]:
+            top = counter.ranked("tags", 3)
+            noisiest = ", ".join(f"{tag} {size * 100 / max(counter.bytes, 1):.0f}%" for tag, _, size in top)
+            lines.append(f"   {label}: {counter.bytes / 1048576:.1f} MB, noisiest {noisiest}")
+        lines.append(f"📄 Full report: {result['report_path']}")
+        self._emit_operation("log_volume", True, "\n".join(lines))
+
+    def sample_log_volume(self, devices: list):
+        """在选中设备上实时采样 logd 统计，找出占满环形缓冲区的来源"""
+        if not devices:
+            self._emit_operation("log_volume", False, "⚠️ No devices selected")
+            return
+        for idx, device_ip in enumerate(devices, 1):
+            self._emit_operation("log_volume", True, f"📊 {idx}. Sampling logd statistics on {device_ip}...")
+            self.executor.submit(self.adb_model.sample_log_volume_async, device_ip, idx)
 
-                # 可选附加调试信息（开发时开启）
-                # formatted += f"\n--- 原始输出 ---\n{raw_output}"
+    def _process_sample_log_volume_result(self, result: dict):
+        device_ip, idx = result.get("device_ip"), result.get("index")
+        if not result.get("success"):
+            self._emit_operation("log_volume", False, f"❌ {idx}. {device_ip}: {result.get('error')}")
+            return
+        lines = [f"📊 {idx}. {device_ip}: logd statistics over {result['samples']} samples"]
+        for name, rate in sorted(result["rates"].items(), key=lambda item: -item[1]):
+            if rate:
+                wrap = result["wrap"].get(name)
+                wrap_text = f", {result['ring'][name] // 1024} KB buffer wraps every {wrap:.0f}s" if wrap else ""
+                lines.append(f"   {name}: {rate / 1024:.1f} KB/s{wrap_text}")
+        for buffer, kind, source, size, share in result["sources"][:10]:
+            lines.append(f"   {share * 100:5.1f}% {size / 1024:8.1f} KB  {buffer:<7} {kind:<4} {source}")
+        self._emit_operation("log_volume", True, "\n".join(lines))
+
+    def _process_analyze_apk_size_result(self, result: dict):
+        apk_path = result.get("apk_path", "unknown")
+        if not result.get("success"):
+            self._emit_operation("apk_size", False, f"❌ APK size analysis failed: {apk_path}\nError: {result.get('error')}")
+            return
 
-                self._emit_operation("apk_info", True, formatted)
+        report = result["report"]
+        lines = [f"📏 {os.path.basename(apk_path)}: {format_size(report.file_size)}, "
+                 f"{len(report.entries)} entries (analyzed in {result.get('elapsed_ms', 0)} ms)"]
+        for name, category in sorted(report.categories.items(), key=lambda item: item[1].compressed, reverse=True):
+            share = category.compressed * 100 / report.file_size if report.file_size else 0
+            stored = f", stored {format_size(category.stored)}" if category.stored else ""
+            lines.append(f"   {name:<18} {format_size(category.compressed):>10} ({share:4.1f}%)  "
+                         f"raw {format_size(category.size)}, {category.count} files{stored}")
+        lines.append(f"   {'zip/signing':<18} {format_size(report.overhead):>10}")
+        lines.append("   🔝 Largest entries:")
+        lines.extend(f"      {format_size(e.compressed):>10}  {e.name}" for e in report.largest(5))
+
+        baseline = result.get("baseline")
+        if baseline is not None:
+            categories, deltas = compare_reports(baseline, report)
+            total = report.file_size - baseline.file_size
+            lines.append(f"   ⚖️ vs {os.path.basename(baseline.path)} ({format_size(baseline.file_size)}): "
+                         f"{'+' if total >= 0 else '-'}{format_size(abs(total))}")
+            for name, (before, after) in categories.items():
+                if before != after:
+                    lines.append(f"      {name:<18} {format_size(before):>10} → {format_size(after):>10} "
+                                 f"({'+' if after >= before else '-'}{format_size(abs(after - before))})")
+            added = sum(1 for d in deltas if d.status == "added")
+            removed = sum(1 for d in deltas if d.status == "removed")
+            lines.append(f"      entries: {added} added, {removed} removed, {len(deltas) - added - removed} changed")
+            lines.extend(
+                f"      {d.status:<8} {'+' if d.delta >= 0 else '-'}{format_size(abs(d.delta)):>10}  {d.name}"
+                for d in deltas[:10]
+            )
+        self._emit_operation("apk_size", True, "\n".join(lines))
 
-            except Exception as e:
-                self._emit_operation("apk_info", False, f"⚠️ APK Field parsing exception: {apk_path}\nError: {str(e)}")
+    def _on_apk_library_updated(self, added: int, failed: int):
+        """构建库后台扫描完成回调（在扫描线程中调用）"""
+        message = f"📚 APK library: {added} indexed, {failed} failed, {len(self.apk_library)} builds total"
+        self._emit_operation("apk_library", failed == 0, message)
 
+    def _process_parse_apk_info_result(self, result: dict):
+        """格式化 APK 解析结果"""
+        apk_path = result.get("apk_path", "unknown")
+
+        if result.get("success"):
+            info = result["info"]
+            self.last_apk_info = info
+            launch = info.leanback_activity or info.launchable_activity
+            dangerous = [p.replace("android.permission.", "") for p in dangerous_permissions(info.permissions)]
+            formatted = f"""
+    🔹 应用名称: {info.label or 'N/A'}
+    📦 包名: {info.package or 'N/A'}{f" (split: {info.split})" if info.split else ""}
+    🔢 版本号: {info.version_name or 'N/A'} (Code: {info.version_code or 'N/A'})
+    🎯 SDK版本: min={info.min_sdk or 'N/A'}, target={info.target_sdk or 'N/A'}, compile={info.compile_sdk or 'N/A'}
+    🛠️ 构建版本: {info.platform_build or 'N/A'}
+    🖼️ 应用图标: {info.icon or 'N/A'}
+    🚀 启动页: {launch or 'N/A'}
+    🔐 权限数: {len(info.permissions)} 项，运行时权限 {len(dangerous)} 项{f": {', '.join(dangerous)}" if dangerous else ""}
+    ⚙️ 特性声明: {", ".join(info.features) if info.features else "None"}
+    🧬 支持架构: {", ".join(info.native_abis) if info.native_abis else "未声明"}
+    ⏱️ 解析耗时: {result.get("elapsed_ms", 0)} ms
+    """
+            self._emit_operation("apk_info", True, formatted)
         else:
             error = result.get("error", "Unknown error")
             self._emit_operation("apk_info", False, f"❌ APK Analysis failed: {apk_path}\nError: {error}")
 
+    def provision_permissions(self, devices: list, package_name: str):
+        """
+        批量预授予运行时权限与 app-ops
+        包名与最近解析的 APK 一致时使用其声明的权限，否则在设备端读取 requested permissions
+        """
+        if not devices:
+            self._emit_operation("provision_permissions", False, "⚠️ No devices selected")
+            return
+        if not package_name:
+            self._emit_operation("provision_permissions", False, "⚠️ No package name provided")
+            return
+
+        info = self.last_apk_info
+        permissions = info.permissions if info and info.package == package_name else None
+        source = "parsed APK" if permissions is not None else "device package manager"
+        self._emit_operation("provision_permissions", True, f"🔐 Provisioning {package_name} on {len(devices)} devices (permissions from {source})")
+        for idx, device_ip in enumerate(devices, 1):
+            self.executor.submit(self.adb_model.provision_permissions_async, device_ip, package_name, idx, permissions)
+
+    def _process_provision_permissions_result(self, result: dict):
+        device_ip = result.get("device_ip", "unknown")
+        idx = result.get("index", 0)
+        if not result.get("success"):
+            self._emit_operation("provision_permissions", False, f"❌ {idx}. Provisioning failed on {device_ip}: {result.get('error')}")
+            return
+        granted, failed = result.get("granted", []), result.get("failed", [])
+        msg = f"✅ {idx}. {device_ip}: {len(granted)} granted in {result.get('elapsed_ms', 0)} ms"
+        if granted:
+            msg += f"\n   ✔️ {', '.join(granted)}"
+        if failed:
+            msg += f"\n   ⚠️ Not granted: {', '.join(failed)}"
+        self._emit_operation("provision_permissions", not failed, msg)
+
     def kill_monkey(self, devices: list):
         if not devices:
             self._emit_operation("kill_monkey", False, "⚠️ No devices selected")
@@ -1000,8 +1417,10 @@ class ADBController:
                 f"║ ✅ Monkey 测试报告 - 设备: {device_ip}\n"
                 "╠═══════════════════════════════════════════════════════════════════════════\n"
                 f"║ ⏱️ 执行时长: {duration}\n"
+                f"║ 🧭 界面覆盖: {result.get('windows_per_min', 'N/A')} windows/min\n"
                 f"║ 📄 Monkey 日志: {monkey_log}\n"
-                f"║ 📄 Logcat 日志: {logcat_log}\n"
+                f"║ 📄 Logcat 日志: {os.path.dirname(logcat_log)} "
+                f"({len(result.get('logcat_segments', []))} 个分段, {result.get('logcat_bytes', 0) / (1 << 20):.1f} MB)\n"
                 "╚═══════════════════════════════════════════════════════════════════════════"
             )
         else:
@@ -1017,6 +1436,54 @@ class ADBController:
 
         return self._emit_operation("monkey", result.get("success"), message)
 
+    def toggle_dpad_crawl(self, devices: list, package_name: str):
+        """开始/停止 STB 遥控器系统遍历"""
+        if self._crawl_stop is not None:
+            self._crawl_stop.set()
+            self._crawl_stop = None
+            self._emit_operation("dpad_crawl", True, "🛑 Stopping D-pad crawl...")
+            return
+        if not devices:
+            return self._emit_operation("dpad_crawl", False, "⚠️ No devices selected")
+        if not package_name:
+            return self._emit_operation("dpad_crawl", False, "⚠️ No package name provided")
+
+        self._crawl_stop = threading.Event()
+        self.total_crawl = len(devices)
+        self.finished_crawl = 0
+        log = LogService().log
+        for idx, device_ip in enumerate(devices, 1):
+            self.executor.submit(
+                self.adb_model.run_dpad_crawl_async,
+                device_ip,
+                package_name,
+                self.CRAWL_DURATION,
+                idx,
+                stop_event=self._crawl_stop,
+                callback=lambda msg: log(LogLevel.INFO, msg)
+            )
+
+    def _process_run_dpad_crawl_result(self, result: dict):
+        device_ip = result.get("device_ip", "unknown")
+        if result.get("success"):
+            message = (
+                "\n╔═══════════════════════════════════════════════════════════════════════════\n"
+                f"║ ✅ D-pad 遍历报告 - 设备: {device_ip}\n"
+                "╠═══════════════════════════════════════════════════════════════════════════\n"
+                f"║ ⏱️ 执行时长: {result.get('duration')}s | 按键次数: {result.get('actions')}\n"
+                f"║ 🧭 界面覆盖: {result.get('screens')} screens ({result.get('screens_per_min')} /min), "
+                f"{result.get('windows')} windows ({result.get('windows_per_min')} /min)\n"
+                f"║ 🔗 状态数: {result.get('states')} | 重新拉起: {result.get('relaunches')}\n"
+                "╚═══════════════════════════════════════════════════════════════════════════"
+            )
+            self._emit_operation("dpad_crawl", True, message)
+        else:
+            self._emit_operation("dpad_crawl", False, f"❌ D-pad crawl failed on {device_ip}: {result.get('error', 'Unknown error')}")
+
+        self.finished_crawl += 1
+        if self.finished_crawl == self.total_crawl:
+            self._crawl_stop = None
+
     def get_random_email_and_code(self):
         task = GetRandomEmailTask()
 
@@ -1072,15 +1539,26 @@ class ADBController:
             "retrieve_device_logs": self._process_retrieve_logs_result,
             "cleanup_device_logs": self._process_cleanup_logs_result,
             "input_text": self._process_input_text_result,
+            "replay_macro": self._process_replay_macro_result,
+            "snapshot_app_data": self._process_snapshot_app_data_result,
+            "provision_permissions": self._process_provision_permissions_result,
+            "restore_app_data": self._process_restore_app_data_result,
             # 可以继续添加其他操作...
             "get_current_package": self._process_get_package_result,
             "install_apk": self._process_install_apk_result,
             "uninstall_apk": self._process_uninstall_apk_result,
             "clear_app_data": self._process_clear_app_data_result,
             "restart_app": self._process_restart_app_result,
+            "clear_and_restart_app": self._process_clear_and_restart_app_result,
             "get_current_activity": self._process_get_current_activity_result,
+            "dump_ui_hierarchy": self._process_dump_ui_hierarchy_result,
             "parse_apk_info": self._process_parse_apk_info_result,
+            "analyze_apk_size": self._process_analyze_apk_size_result,
+            "analyze_crashes": self._process_analyze_crashes_result,
+            "analyze_log_volume": self._process_analyze_log_volume_result,
+            "sample_log_volume": self._process_sample_log_volume_result,
             "run_monkey_test": self._process_run_monkey_test_result,
+            "run_dpad_crawl": self._process_run_dpad_crawl_result,
             "kill_monkey": self._process_kill_monkey_result,
             "list_installed_packages": self._process_list_installed_packages_result,
             "capture_bugreport": self._process_capture_bugreport_result,
@@ -58,7 +58,7 @@ class MainFrame(QMainWindow):
         """连接所有组件信号"""
         # ADB控制器 -> UI组件
         self.adb_controller.signals.devices_updated.connect(self.left_panel.update_device_list)
-        self.adb_controller.signals.operation_completed.connect(self.log_panel._append_log)
+        self.adb_controller.signals.devices_updated.connect(self.log_panel.set_devices)
         self.left_panel.signals.connect_requested.connect(self.adb_controller.connect_device)
         self.left_panel.signals.refresh_devices_requested.connect(self.adb_controller.refresh_devices)
         self.left_panel.signals.device_info_requested.connect(self.adb_controller.get_device_info)
@@ -87,6 +87,16 @@ class MainFrame(QMainWindow):
         self.left_panel.signals.uninstall_app_requested.connect(self.adb_controller.uninstall_apk)
         self.left_panel.signals.clear_app_data_requested.connect(self.adb_controller.clear_app_data)
         self.left_panel.signals.restart_app_requested.connect(self.adb_controller.restart_app)
+        self.left_panel.signals.clear_restart_app_requested.connect(self.adb_controller.clear_and_restart_app)
+        self.left_panel.signals.snapshot_app_data_requested.connect(self.adb_controller.snapshot_app_data)
+        self.left_panel.signals.restore_app_data_requested.connect(self.adb_controller.restore_app_data)
+        self.left_panel.signals.provision_permissions_requested.connect(self.adb_controller.provision_permissions)
+        self.left_panel.signals.analyze_apk_size_requested.connect(self.adb_controller.analyze_apk_size)
+        self.left_panel.signals.live_logcat_requested.connect(self.adb_controller.open_live_logcat)
+        self.left_panel.signals.search_logs_requested.connect(self.adb_controller.open_log_search)
+        self.left_panel.signals.crash_clusters_requested.connect(self.adb_controller.analyze_crashes)
+        self.left_panel.signals.log_volume_requested.connect(self.adb_controller.analyze_log_volume)
+        self.left_panel.signals.live_log_volume_requested.connect(self.adb_controller.sample_log_volume)
         self.left_panel.signals.print_activity_requested.connect(self.adb_controller.get_current_activity)
         self.left_panel.signals.parse_apk_info_requested.connect(self.adb_controller.parse_apk_info)
         self.left_panel.signals.start_monkey_requested.connect(self.adb_controller.run_monkey_test)
@@ -94,6 +104,11 @@ class MainFrame(QMainWindow):
         self.left_panel.signals.list_installed_packages_requested.connect(self.adb_controller.list_installed_packages)
         self.left_panel.signals.capture_bugreport_requested.connect(self.adb_controller.capture_bugreport)
         self.left_panel.signals.pull_anr_file_requested.connect(self.adb_controller.pull_anr_files)
+        self.left_panel.signals.dump_ui_requested.connect(self.adb_controller.dump_ui_hierarchy)
+        self.left_panel.signals.record_macro_requested.connect(self.adb_controller.toggle_macro_recording)
+        self.left_panel.signals.replay_macro_requested.connect(self.adb_controller.replay_macro)
+        self.left_panel.signals.dpad_crawl_requested.connect(self.adb_controller.toggle_dpad_crawl)
+        self.adb_controller.signals.macro_recording_changed.connect(self.left_panel.update_macro_recording)
         
     def _setup_menu(self):
         """初始化菜单栏"""
@@ -0,0 +1,144 @@
+# gui/widgets/py_apk_library/apk_library_dialog.py
+from datetime import datetime
+import os
+from typing import List, Optional
+
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QTableWidget,
+    QTableWidgetItem, QPushButton, QHeaderView, QAbstractItemView,
+    QFileDialog, QLabel
+)
+
+from models.apk_library import ApkLibrary
+
+
+class ApkLibraryDialog(QDialog):
+    """APK 构建库选择对话框：即时搜索已索引的构建，也可以直接浏览单个文件"""
+
+    COLUMNS = ("Package", "Label", "Version", "Code", "ABI", "Modified", "File")
+
+    def __init__(self, library: ApkLibrary, title: str = "Select APK", parent=None, allow_bundles: bool = False):
+        super().__init__(parent)
+        self.library = library
+        self.allow_bundles = allow_bundles
+        self.selected_paths: List[str] = []
+        self._results = []
+
+        self.setWindowTitle(title)
+        self.resize(900, 520)
+        self._init_ui()
+        self._refresh()
+
+    def _init_ui(self):
+        font = QFont("Arial", 10)
+        layout = QVBoxLayout(self)
+
+        search_row = QHBoxLayout()
+        self.search_edit = QLineEdit()
+        self.search_edit.setFont(font)
+        self.search_edit.setPlaceholderText("Search package / label / version / ABI / file name")
+        self.search_edit.textChanged.connect(self._refresh)
+        self.search_edit.returnPressed.connect(self._accept_current)
+        search_row.addWidget(self.search_edit, 1)
+        layout.addLayout(search_row)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setFont(font)
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.doubleClicked.connect(self._accept_current)
+        layout.addWidget(self.table, 1)
+
+        self.status_label = QLabel()
+        self.status_label.setFont(font)
+        layout.addWidget(self.status_label)
+
+        button_row = QHBoxLayout()
+        for text, slot in (
+            ("Add Folder", self._add_folder),
+            ("Remove Folder", self._remove_folder),
+            ("Browse File...", self._browse_file),
+        ):
+            btn = QPushButton(text)
+            btn.setFont(font)
+            btn.clicked.connect(slot)
+            button_row.addWidget(btn)
+        button_row.addStretch()
+        select_btn = QPushButton("Select")
+        select_btn.setFont(font)
+        select_btn.setDefault(True)
+        select_btn.clicked.connect(self._accept_current)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.setFont(font)
+        cancel_btn.clicked.connect(self.reject)
+        button_row.addWidget(select_btn)
+        button_row.addWidget(cancel_btn)
+        layout.addLayout(button_row)
+
+    def _refresh(self):
+        """纯内存检索，每次按键都可以即时刷新"""
+        self._results = self.library.search(self.search_edit.text())
+        self.table.setRowCount(len(self._results))
+        for row, info in enumerate(self._results):
+            # 用索引中的修改时间，避免每次按键都访问（可能在网络共享上的）文件
+            mtime = self.library.modified(info.path)
+            modified = datetime.fromtimestamp(mtime).strftime("%m-%d %H:%M") if mtime else "-"
+            values = (info.package, info.label, info.version_name, str(info.version_code),
+                      ",".join(info.native_abis) or "-", modified, os.path.basename(info.path))
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setToolTip(info.path)
+                self.table.setItem(row, col, item)
+        if self._results:
+            self.table.selectRow(0)
+        folders = ", ".join(self.library.directories) or "none (use Add Folder)"
+        self.status_label.setText(f"{len(self._results)}/{len(self.library)} builds  |  Folders: {folders}")
+
+    def _accept_current(self, *_):
+        row = self.table.currentRow()
+        if 0 <= row < len(self._results):
+            self.selected_paths = [self._results[row].path]
+            self.accept()
+
+    def _add_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select build folder")
+        if directory:
+            self.library.add_directory(directory)
+            self.status_label.setText(f"Indexing {directory} in background ...")
+
+    def _remove_folder(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select folder to remove from library")
+        if directory:
+            self.library.remove_directory(directory)
+            self._refresh()
+
+    def _browse_file(self):
+        file_filter = "APK Files (*.apk);;All Files (*)"
+        if self.allow_bundles:
+            file_filter = "APK / Bundles (*.apk *.apks *.xapk);;All Files (*)"
+        paths, _ = QFileDialog.getOpenFileNames(self, "Select APK File", "", file_filter)
+        if paths:
+            self.selected_paths = paths if self.allow_bundles else paths[:1]
+            self.accept()
+
+    @classmethod
+    def select_apk(cls, library: ApkLibrary, title: str = "Select APK", parent=None) -> Optional[str]:
+        """弹出对话框并返回选中的 APK 路径，取消返回 None"""
+        dialog = cls(library, title, parent)
+        if dialog.exec() == QDialog.Accepted and dialog.selected_paths:
+            return dialog.selected_paths[0]
+        return None
+
+    @classmethod
+    def select_packages(cls, library: ApkLibrary, title: str = "Select APK", parent=None) -> List[str]:
+        """选择待安装文件：单个 APK、同一应用的多个拆分 APK，或 .apks/.xapk 包"""
+        dialog = cls(library, title, parent, allow_bundles=True)
+        if dialog.exec() == QDialog.Accepted:
+            return dialog.selected_paths
+        return []
@@ -0,0 +1 @@
+# gui/__init__.py
\ No newline at end of file
@@ -0,0 +1,168 @@
+# gui/widgets/py_logcat/logcat_search_window.py
+import os
+import threading
+from datetime import datetime
+
+from PySide6.QtCore import Signal
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QPlainTextEdit,
+    QPushButton, QLabel, QFileDialog
+)
+
+from models.log_timeline import merge_timeline
+from utils.logcat_index import LogcatArchive, LogQuery
+
+
+class LogcatSearchWindow(QDialog):
+    """按时间 / tag / 级别 / PID 检索已抓取的 logcat（旁路索引 + mmap 只读命中块），查询在后台线程执行"""
+
+    MAX_RESULTS = 5000
+    search_finished = Signal(dict)
+    merge_finished = Signal(dict)
+
+    def __init__(self, root: str = "", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Search Captured Logs")
+        self.resize(1100, 640)
+        self._searching = False
+        self._init_ui(root)
+        self.search_finished.connect(self._show_results)
+        self.merge_finished.connect(self._show_merge)
+
+    def _init_ui(self, root: str):
+        font = QFont("Arial", 10)
+        layout = QVBoxLayout(self)
+
+        root_row = QHBoxLayout()
+        self.root_edit = QLineEdit(root)
+        self.root_edit.setPlaceholderText("Folder with captured logs (searched recursively)")
+        browse_btn = QPushButton("Browse...")
+        browse_btn.clicked.connect(self._browse)
+        for widget in (self.root_edit, browse_btn):
+            widget.setFont(font)
+        root_row.addWidget(self.root_edit, 1)
+        root_row.addWidget(browse_btn)
+        layout.addLayout(root_row)
+
+        filter_row = QHBoxLayout()
+        self.start_edit = QLineEdit()
+        self.start_edit.setPlaceholderText("From, e.g. 02:00 or 10-18 02:00")
+        self.end_edit = QLineEdit()
+        self.end_edit.setPlaceholderText("To (inclusive), e.g. 02:10")
+        self.tags_edit = QLineEdit()
+        self.tags_edit.setPlaceholderText("Tags, e.g. AndroidRuntime ActivityManager")
+        self.levels_edit = QLineEdit()
+        self.levels_edit.setPlaceholderText("Levels, e.g. EF")
+        self.pids_edit = QLineEdit()
+        self.pids_edit.setPlaceholderText("PIDs")
+        self.text_edit = QLineEdit()
+        self.text_edit.setPlaceholderText("Contains")
+        for widget, stretch in ((self.start_edit, 2), (self.end_edit, 2), (self.tags_edit, 3),
+                                (self.levels_edit, 1), (self.pids_edit, 1), (self.text_edit, 2)):
+            widget.setFont(font)
+            widget.returnPressed.connect(self.search)
+            filter_row.addWidget(widget, stretch)
+        layout.addLayout(filter_row)
+
+        self.view = QPlainTextEdit()
+        self.view.setReadOnly(True)
+        self.view.setFont(QFont("Consolas", 9))
+        self.view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        layout.addWidget(self.view, 1)
+
+        button_row = QHBoxLayout()
+        self.status_label = QLabel("Enter a query and press Search")
+        self.status_label.setFont(font)
+        button_row.addWidget(self.status_label, 1)
+        self.search_btn = QPushButton("Search")
+        self.search_btn.setFont(font)
+        self.search_btn.setDefault(True)
+        self.search_btn.clicked.connect(self.search)
+        button_row.addWidget(self.search_btn)
+        self.merge_btn = QPushButton("Merge Timeline")
+        self.merge_btn.setFont(font)
+        self.merge_btn.setToolTip("Merge all device logs in the folder into one clock-corrected timeline file")
+        self.merge_btn.clicked.connect(self.merge)
+        button_row.addWidget(self.merge_btn)
+        layout.addLayout(button_row)
+
+    def _browse(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select log folder", self.root_edit.text())
+        if folder:
+            self.root_edit.setText(folder)
+
+    def search(self):
+        root = self.root_edit.text().strip()
+        if self._searching or not root:
+            return
+        query = LogQuery(
+            start=self.start_edit.text().strip(),
+            end=self.end_edit.text().strip(),
+            tags=tuple(self.tags_edit.text().split()),
+            levels=self.levels_edit.text().strip().upper(),
+            pids=tuple(self.pids_edit.text().split()),
+            text=self.text_edit.text(),
+        )
+        self._set_busy(True, "Searching... (logs without an index are indexed on first search)")
+        threading.Thread(target=self._run, args=(root, query), daemon=True).start()
+
+    def _run(self, root: str, query: LogQuery):
+        try:
+            summary = LogcatArchive(root).search(query, self.MAX_RESULTS)
+        except Exception as e:
+            summary = {"error": str(e)}
+        self.search_finished.emit(summary)
+
+    def _set_busy(self, busy: bool, status: str = ""):
+        self._searching = busy
+        self.search_btn.setEnabled(not busy)
+        self.merge_btn.setEnabled(not busy)
+        if status:
+            self.status_label.setText(status)
+
+    def merge(self):
+        root = self.root_edit.text().strip()
+        if self._searching or not root:
+            return
+        output = os.path.join(root, f"timeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+        self._set_busy(True, "Merging device logs into one timeline...")
+        threading.Thread(target=self._run_merge, args=(root, output), daemon=True).start()
+
+    def _run_merge(self, root: str, output: str):
+        try:
+            summary = merge_timeline(root, output)
+        except Exception as e:
+            summary = {"error": str(e)}
+        self.merge_finished.emit(summary)
+
+    def _show_merge(self, summary: dict):
+        self._set_busy(False)
+        if summary.get("error"):
+            self.status_label.setText(f"Merge failed: {summary['error']}")
+            return
+        offsets = ", ".join(f"{label} {offset * 1000:+.0f} ms" for label, offset in summary["offsets"].items())
+        status = (f"Merged {summary['lines']} lines from {len(summary['devices'])} devices in "
+                  f"{summary['elapsed']}s → {summary['output']}")
+        if offsets:
+            status += f" | clock offsets: {offsets}"
+        if summary["uncorrected"]:
+            status += f" | no clock data: {', '.join(summary['uncorrected'])}"
+        self.status_label.setText(status)
+
+    def _show_results(self, summary: dict):
+        self._set_busy(False)
+        if summary.get("error"):
+            self.status_label.setText(f"Search failed: {summary['error']}")
+            return
+        self.view.setPlainText("\n".join(f"[{source}] {line}" for source, line in summary["matches"]))
+        status = (f"{summary['total']} matches in {summary['files']} files | "
+                  f"read {summary['blocks_read']}/{summary['blocks']} blocks "
+                  f"({summary['bytes_read'] / 1048576:.1f} MB) in {summary['elapsed_ms']} ms")
+        if summary["truncated"]:
+            status += f" | showing first {len(summary['matches'])}"
+        if summary["indexed"]:
+            status += f" | indexed {summary['indexed']} files"
+        if summary["skipped"]:
+            status += f" | {len(summary['skipped'])} compressed files without index skipped"
+        self.status_label.setText(status)
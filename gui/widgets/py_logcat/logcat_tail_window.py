@@ -0,0 +1,142 @@
+# gui/widgets/py_logcat/logcat_tail_window.py
+import re
+from typing import List
+
+from PySide6.QtCore import QTimer, Signal
+from PySide6.QtGui import QFont, QTextCursor
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QPlainTextEdit,
+    QPushButton, QLabel, QCheckBox, QListWidget
+)
+
+from models.log_alerts import AlertEngine, AlertEvent
+from models.logcat_tail import LogcatTailManager, TailFilter
+
+
+class LogcatTailWindow(QDialog):
+    """多设备实时 logcat 窗口（非模态），定时从后台队列批量取行，GUI 线程不做任何 adb 读取"""
+
+    MAX_VIEW_LINES = 20000  # 视图保留的最大行数，超出后自动丢弃最旧的行
+    REFRESH_MS = 100
+    LINES_PER_TICK = 200    # 每台设备每次刷新最多取出的行数
+    MAX_ALERTS = 200
+
+    # 告警在读取线程中产生，经信号排队到 GUI 线程
+    alert_raised = Signal(object)
+
+    def __init__(self, devices: List[str], package_name: str = "", parent=None):
+        super().__init__(parent)
+        self.devices = devices
+        self.alerts = AlertEngine.from_config(self.alert_raised.emit)
+        self.manager = LogcatTailManager(alerts=self.alerts)
+        self.shown_lines = 0
+        self.dropped_lines = 0
+        self.alert_count = 0
+
+        self.setWindowTitle(f"Live Logcat - {len(devices)} device(s)")
+        self.resize(1100, 640)
+        self._init_ui(package_name)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.REFRESH_MS)
+        self.timer.timeout.connect(self._drain)
+        self.alert_raised.connect(self._show_alert)
+
+    def _init_ui(self, package_name: str):
+        font = QFont("Arial", 10)
+        layout = QVBoxLayout(self)
+
+        filter_row = QHBoxLayout()
+        self.package_edit = QLineEdit(package_name)
+        self.package_edit.setPlaceholderText("Package (device-side --pid, follows restarts)")
+        self.specs_edit = QLineEdit()
+        self.specs_edit.setPlaceholderText("tag:level specs, e.g. ActivityManager:I *:W")
+        self.regex_edit = QLineEdit()
+        self.regex_edit.setPlaceholderText("Regex (device-side -e)")
+        self.text_edit = QLineEdit()
+        self.text_edit.setPlaceholderText("Contains (host-side, live)")
+        self.text_edit.textChanged.connect(self.manager.set_host_text)
+        for widget, stretch in ((self.package_edit, 2), (self.specs_edit, 2), (self.regex_edit, 2), (self.text_edit, 2)):
+            widget.setFont(font)
+            filter_row.addWidget(widget, stretch)
+        layout.addLayout(filter_row)
+
+        self.alert_list = QListWidget()
+        self.alert_list.setFont(QFont("Consolas", 9))
+        self.alert_list.setMaximumHeight(90)
+        self.alert_list.setToolTip("Alerts from resources/alert_rules.yaml, checked on an unfiltered logcat of each device")
+        layout.addWidget(self.alert_list)
+
+        self.view = QPlainTextEdit()
+        self.view.setReadOnly(True)
+        self.view.setFont(QFont("Consolas", 9))
+        self.view.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.view.setMaximumBlockCount(self.MAX_VIEW_LINES)
+        layout.addWidget(self.view, 1)
+
+        button_row = QHBoxLayout()
+        self.status_label = QLabel("Stopped")
+        self.status_label.setFont(font)
+        button_row.addWidget(self.status_label, 1)
+        self.follow_check = QCheckBox("Auto-scroll")
+        self.follow_check.setChecked(True)
+        self.follow_check.setFont(font)
+        button_row.addWidget(self.follow_check)
+        for text, slot in (("Start", self.start), ("Stop", self.stop), ("Clear", self.view.clear)):
+            btn = QPushButton(text)
+            btn.setFont(font)
+            btn.clicked.connect(slot)
+            button_row.addWidget(btn)
+        layout.addLayout(button_row)
+
+    def start(self):
+        regex = self.regex_edit.text().strip()
+        try:
+            re.compile(regex)
+        except re.error as e:
+            self.status_label.setText(f"Invalid regex: {e}")
+            return
+        tail_filter = TailFilter(
+            package=self.package_edit.text().strip(),
+            specs=tuple(self.specs_edit.text().split()),
+            regex=regex,
+            text=self.text_edit.text(),
+        )
+        self.manager.start(self.devices, tail_filter)
+        self.shown_lines = self.dropped_lines = 0
+        self.timer.start()
+
+    def stop(self):
+        self.manager.stop()
+        self.timer.stop()
+        self._drain()
+        self.status_label.setText(f"Stopped | {self.shown_lines} lines shown, {self.dropped_lines} dropped")
+
+    def _drain(self):
+        lines, dropped = self.manager.drain(self.LINES_PER_TICK)
+        self.dropped_lines += dropped
+        if lines:
+            # 一次追加整批文本，避免逐行触发布局
+            self.view.appendPlainText("\n".join(lines))
+            self.shown_lines += len(lines)
+            if self.follow_check.isChecked():
+                self.view.moveCursor(QTextCursor.End)
+        states = self.manager.status()
+        active = sum(1 for s in states.values() if s.startswith("tailing"))
+        self.status_label.setText(
+            f"{active}/{len(states)} tailing | {self.shown_lines} lines shown, {self.dropped_lines} dropped"
+            f" | {self.alert_count} alerts"
+        )
+
+    def _show_alert(self, event: AlertEvent):
+        self.alert_count += 1
+        repeated = f" (+{event.suppressed} more)" if event.suppressed else ""
+        self.alert_list.insertItem(0, f"🚨 [{event.device_ip}] {event.rule}{repeated}: {event.line}")
+        while self.alert_list.count() > self.MAX_ALERTS:
+            self.alert_list.takeItem(self.alert_list.count() - 1)
+
+    def done(self, result):
+        """关闭（含 Esc 与标题栏关闭）时结束所有 logcat 进程"""
+        self.manager.stop()
+        self.timer.stop()
+        super().done(result)
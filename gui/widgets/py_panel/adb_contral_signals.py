@@ -21,6 +21,7 @@ class ADBControllerSignals(QObject):
     list_packages_result = Signal(str)
     get_bugreport_result = Signal(str)
     start_monkey_result = Signal(str)
+    macro_recording_changed = Signal(bool)  # 是否正在录制输入宏
     
     email_updated = Signal(str)      # 设置 email_input 内容
     vercode_updated = Signal(str)    # 设置 vercode_input 内容
\ No newline at end of file
@@ -64,6 +64,8 @@ class LeftPanel(QWidget):
         self.btn_screenshot.clicked.connect(lambda: self.signals.screenshot_requested.emit(self.selected_devices))
         self.btn_retrieve_devices_logs.clicked.connect(lambda: self.signals.retrieve_logs_requested.emit(self.selected_devices))
         self.btn_cleanup_logs.clicked.connect(lambda: self.signals.cleanup_logs_requested.emit(self.selected_devices))
+        self.btn_live_logcat.clicked.connect(lambda: self.signals.live_logcat_requested.emit(self.selected_devices, self.program_edit.currentText()))
+        self.btn_search_logs.clicked.connect(self.signals.search_logs_requested.emit)
         self.btn_send_text.clicked.connect(lambda: self.signals.send_text_requested.emit(self.selected_devices, self.input_text_edit.text()))
         self.input_text_edit.returnPressed.connect(lambda: self.signals.send_text_requested.emit(self.selected_devices, self.input_text_edit.text()))
         # 设备列表双击事件
@@ -73,6 +75,11 @@ class LeftPanel(QWidget):
         self.uninstall_btn.clicked.connect(lambda: self.signals.uninstall_app_requested.emit(self.selected_devices, self.program_edit.currentText()))
         self.clear_app_data_btn.clicked.connect(lambda: self.signals.clear_app_data_requested.emit(self.selected_devices, self.program_edit.currentText()))
         self.restart_app_btn.clicked.connect(lambda: self.signals.restart_app_requested.emit(self.selected_devices, self.program_edit.currentText()))
+        self.clear_restart_app_btn.clicked.connect(lambda: self.signals.clear_restart_app_requested.emit(self.selected_devices, self.program_edit.currentText()))
+        self.snapshot_app_data_btn.clicked.connect(lambda: self.signals.snapshot_app_data_requested.emit(self.selected_devices, self.program_edit.currentText()))
+        self.restore_app_data_btn.clicked.connect(lambda: self.signals.restore_app_data_requested.emit(self.selected_devices, self.program_edit.currentText()))
+        self.grant_permissions_btn.clicked.connect(lambda: self.signals.provision_permissions_requested.emit(self.selected_devices, self.program_edit.currentText()))
+        self.apk_size_btn.clicked.connect(lambda: self.signals.analyze_apk_size_requested.emit())
         self.print_activity_btn.clicked.connect(lambda: self.signals.print_activity_requested.emit(self.selected_devices))
         self.parse_apk_info_btn.clicked.connect(lambda: self.signals.parse_apk_info_requested.emit())
         self.start_monkey_btn.clicked.connect(lambda: self.signals.start_monkey_requested.emit(self.selected_devices, self.device_type.currentText(), self.program_edit.currentText(), self.select_times.currentText()))
@@ -80,6 +87,13 @@ class LeftPanel(QWidget):
         self.list_package_btn.clicked.connect(lambda: self.signals.list_installed_packages_requested.emit(self.selected_devices))
         self.get_bugreport_btn.clicked.connect(lambda: self.signals.capture_bugreport_requested.emit(self.selected_devices))
         self.get_anr_file_btn.clicked.connect(lambda: self.signals.pull_anr_file_requested.emit(self.selected_devices))
+        self.dump_ui_btn.clicked.connect(lambda: self.signals.dump_ui_requested.emit(self.selected_devices))
+        self.record_macro_btn.clicked.connect(lambda: self.signals.record_macro_requested.emit(self.selected_devices))
+        self.replay_macro_btn.clicked.connect(lambda: self.signals.replay_macro_requested.emit(self.selected_devices))
+        self.dpad_crawl_btn.clicked.connect(lambda: self.signals.dpad_crawl_requested.emit(self.selected_devices, self.program_edit.currentText()))
+        self.crash_clusters_btn.clicked.connect(self.signals.crash_clusters_requested.emit)
+        self.log_volume_btn.clicked.connect(self.signals.log_volume_requested.emit)
+        self.live_volume_btn.clicked.connect(lambda: self.signals.live_log_volume_requested.emit(self.selected_devices))
         
         self.btn_generate_email.clicked.connect(lambda: self.signals.generate_email_requested.emit()) 
         self.email_text_sender.returnPressed.connect(lambda: self.signals.send_text_requested.emit(self.selected_devices, self.email_text_sender.text()))
@@ -135,6 +149,10 @@ class LeftPanel(QWidget):
         self.btn_screenshot.setToolTip("Select a file save path once")
         self.btn_retrieve_devices_logs = self._create_button("Retrieve device logs", "resources/icons/Save_alt.svg")
         self.btn_cleanup_logs = self._create_button("Cleanup logs", "resources/icons/Cleaning_services.svg")
+        self.btn_live_logcat = self._create_button("Live logcat", "resources/icons/format_list_bulleted.svg")
+        self.btn_live_logcat.setToolTip("Live logcat of selected devices, filtered to the package in the action group")
+        self.btn_search_logs = self._create_button("Search logs", "resources/icons/Select_activity.svg")
+        self.btn_search_logs.setToolTip("Search captured logcat files by time, tag, level and PID")
         button_layout.addWidget(self.btn_refresh_devices)
         button_layout.addWidget(self.btn_devices_Info)
         button_layout.addWidget(self.btn_disconnect_devices)
@@ -143,6 +161,8 @@ class LeftPanel(QWidget):
         button_layout.addWidget(self.btn_screenshot)
         button_layout.addWidget(self.btn_retrieve_devices_logs)
         button_layout.addWidget(self.btn_cleanup_logs)
+        button_layout.addWidget(self.btn_live_logcat)
+        button_layout.addWidget(self.btn_search_logs)
 
         button_layout.addStretch()
         device_row.addWidget(self.listbox_devices, 2)
@@ -224,6 +244,28 @@ class LeftPanel(QWidget):
             action_row3.addWidget(btn, 1)
         layout.addLayout(action_row3)
 
+        # ▶️ 第四行
+        action_row4 = QHBoxLayout()
+        self.clear_restart_app_btn = self._create_button("Clear & Restart", "resources/icons/Clear_data.svg")
+        self.clear_restart_app_btn.setToolTip("Force-stop, clear data and relaunch in one adb round trip")
+        self.snapshot_app_data_btn = self._create_button("Snapshot Data", "resources/icons/Save_alt.svg")
+        self.snapshot_app_data_btn.setToolTip("Save app data from the first selected device (debuggable build or root)")
+        self.restore_app_data_btn = self._create_button("Restore Data", "resources/icons/Restore.svg")
+        self.restore_app_data_btn.setToolTip("Restore a saved app data snapshot to all selected devices in parallel")
+        for btn in (self.clear_restart_app_btn, self.snapshot_app_data_btn, self.restore_app_data_btn):
+            action_row4.addWidget(btn, 1)
+        layout.addLayout(action_row4)
+
+        # ▶️ 第五行
+        action_row5 = QHBoxLayout()
+        self.grant_permissions_btn = self._create_button("Grant Permissions", "resources/icons/Info.svg")
+        self.grant_permissions_btn.setToolTip("Pre-grant runtime permissions and app-ops in one adb round trip per device")
+        self.apk_size_btn = self._create_button("APK Size", "resources/icons/Parse_APK.svg")
+        self.apk_size_btn.setToolTip("Break down APK size by dex / native ABI / resources / assets, optionally against a baseline")
+        for btn in (self.grant_permissions_btn, self.apk_size_btn):
+            action_row5.addWidget(btn, 1)
+        layout.addLayout(action_row5)
+
         layout.addStretch()
         group.setLayout(layout)
         return group
@@ -263,11 +305,35 @@ class LeftPanel(QWidget):
                 # ▶️ 第三行
         perf_row3 = QHBoxLayout()
         self.get_anr_file_btn = self._create_button("Get ANR File", "resources/icons/Get_ANR.svg")
-        perf_btn2 = self._create_button("Print", "resources/icons/Print.svg")
-        perf_btn3 = self._create_button("Parse", "resources/icons/Parse_APK.svg")
-        for btn in (self.get_anr_file_btn, perf_btn2, perf_btn3):
+        self.dpad_crawl_btn = self._create_button("D-pad Crawl", "resources/icons/Monkey.svg")
+        self.dpad_crawl_btn.setToolTip("Systematic DPAD/ENTER/BACK exploration, click again to stop")
+        self.crash_clusters_btn = self._create_button("Crash Clusters", "resources/icons/Bugreport.svg")
+        self.crash_clusters_btn.setToolTip("Group Java/native crashes in captured logs and tombstones by signature")
+        for btn in (self.get_anr_file_btn, self.dpad_crawl_btn, self.crash_clusters_btn):
             perf_row3.addWidget(btn, 1)
         layout.addLayout(perf_row3)
+
+        # ▶️ 第四行
+        perf_row4 = QHBoxLayout()
+        self.dump_ui_btn = self._create_button("Dump UI", "resources/icons/Select_activity.svg")
+        self.dump_ui_btn.setToolTip("Dump UI hierarchy, cached until the screen changes")
+        self.record_macro_btn = self._create_button("Record Macro", "resources/icons/Input.svg")
+        self.record_macro_btn.setToolTip("Record raw input on the first selected device, click again to stop")
+        self.replay_macro_btn = self._create_button("Replay Macro", "resources/icons/Restart_app.svg")
+        for btn in (self.dump_ui_btn, self.record_macro_btn, self.replay_macro_btn):
+            perf_row4.addWidget(btn, 1)
+        layout.addLayout(perf_row4)
+
+        # ▶️ 第五行：日志量分析
+        perf_row5 = QHBoxLayout()
+        self.log_volume_btn = self._create_button("Log Volume", "resources/icons/format_list_bulleted.svg")
+        self.log_volume_btn.setToolTip("Rank the noisiest tags / processes in captured logs, per device and fleet-wide")
+        self.live_volume_btn = self._create_button("Live Volume", "resources/icons/Info.svg")
+        self.live_volume_btn.setToolTip("Sample logd statistics (logcat -S) on the selected devices: "
+                                        "write rate, buffer wrap time and top sources")
+        for btn in (self.log_volume_btn, self.live_volume_btn):
+            perf_row5.addWidget(btn, 1)
+        layout.addLayout(perf_row5)
         
         layout.addStretch()
         group.setLayout(layout)
@@ -444,6 +510,10 @@ class LeftPanel(QWidget):
 
         QTimer.singleShot(0, _update)
         
+    def update_macro_recording(self, recording: bool):
+        """切换录制按钮文字"""
+        self.record_macro_btn.setText("Stop Recording" if recording else "Record Macro")
+
     def update_email(self, text: str):
         self.email_text_sender.setText(text)
 
@@ -19,6 +19,16 @@ class LeftPanelSignals(QObject):
     uninstall_app_requested = Signal(list, str)
     clear_app_data_requested = Signal(list, str)
     restart_app_requested = Signal(list, str)
+    clear_restart_app_requested = Signal(list, str)
+    snapshot_app_data_requested = Signal(list, str)
+    restore_app_data_requested = Signal(list, str)
+    provision_permissions_requested = Signal(list, str)
+    analyze_apk_size_requested = Signal()
+    live_logcat_requested = Signal(list, str)
+    search_logs_requested = Signal()
+    crash_clusters_requested = Signal()
+    log_volume_requested = Signal()
+    live_log_volume_requested = Signal(list)
     print_activity_requested = Signal(list)
     parse_apk_info_requested = Signal()
     kill_monkey_requested = Signal(list)
@@ -26,3 +36,7 @@ class LeftPanelSignals(QObject):
     list_installed_packages_requested = Signal(list)
     capture_bugreport_requested = Signal(list)
     start_monkey_requested = Signal(list, str, str, str)
+    dump_ui_requested = Signal(list)
+    record_macro_requested = Signal(list)
+    replay_macro_requested = Signal(list)
+    dpad_crawl_requested = Signal(list, str)
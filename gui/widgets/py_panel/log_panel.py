@@ -1,14 +1,33 @@
-from typing import Dict, Optional
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtWidgets import QWidget, QTextEdit, QVBoxLayout
-from PySide6.QtGui import QFont, QColor, QTextCharFormat, QTextCursor
+import re
+from collections import deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import (
+    QWidget, QPlainTextEdit, QTextEdit, QVBoxLayout, QHBoxLayout, QComboBox, QLineEdit, QLabel
+)
+from PySide6.QtGui import QFont, QColor, QTextCharFormat, QTextCursor, QTextDocument
 from gui.widgets.style.base_styles import BaseStyles
 from common.log_service import LogService
 
+# 消息中的设备地址（ip[:port]）；已知设备列表通过 set_devices 补充（USB 序列号等）
+_DEVICE_ADDRESS = re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d{1,5})?\b")
+
+
+class LogRecord(NamedTuple):
+    level: str
+    message: str
+    device: str  # 消息涉及的设备，未识别时为空
+
 
 class LogPanel(QWidget):
-    """优化后的日志显示面板，保持原有样式和功能"""
-    
+    """
+    日志显示面板
+    - 记录保存在定长环形缓冲区（deque），视图为 QPlainTextEdit + maximumBlockCount，追加与淘汰都是 O(1)
+    - 日志由 LogService 按批送达，每批在一个编辑块内写入视图，突发输出不会卡住界面
+    - 级别 / 设备过滤时从环形缓冲区重建视图；搜索在停止输入后才执行（防抖），回车跳到下一处
+    - 搜索从文档末尾向前查找，最多高亮 MAX_HIGHLIGHTS 处；命中数按当前仍在视图中的高亮重新统计
+    """
+
     # 日志等级颜色映射（保持原有样式）
     LEVEL_COLORS: Dict[str, str] = {
         "DEBUG": BaseStyles.DEBUG_COLOR,
@@ -18,29 +37,78 @@ class LogPanel(QWidget):
         "ERROR": BaseStyles.ERROR_COLOR,
         "CRITICAL": BaseStyles.CRITICAL_COLOR
     }
+    LEVEL_RANKS: Dict[str, int] = {"DEBUG": 0, "INFO": 1, "SUCCESS": 1, "WARNING": 2, "ERROR": 3, "CRITICAL": 4}
+    LEVEL_FILTERS: Tuple[Tuple[str, int], ...] = (("All levels", 0), ("Info+", 1), ("Warning+", 2), ("Error+", 3))
+    ALL_DEVICES = "All devices"
 
-    # 自定义信号
-    log_appended = Signal(str, str)  # (level, message)
+    DEFAULT_MAX_LINES = 100000
+    MIN_MAX_LINES = 100
+    MAX_HIGHLIGHTS = 1000  # 同时高亮的最多命中数（保留最新的）
+    SEARCH_DELAY_MS = 250  # 搜索防抖间隔
 
     def __init__(self, parent: Optional[QWidget] = None):
         super().__init__(parent)
+        self._max_lines = self.DEFAULT_MAX_LINES  # 默认最大行数
+        self._records: Deque[LogRecord] = deque(maxlen=self._max_lines)
+        self._known_devices: Optional[re.Pattern] = None
+        self._min_rank = 0
+        self._device = ""
+        self._search = ""
+        self._highlights: List[QTextEdit.ExtraSelection] = []
+        self._truncated = False  # 命中数超过 MAX_HIGHLIGHTS，更早的命中未高亮
+        self._formats = self._build_formats()
         self._init_ui()
         self._setup_styles()
         self._connect_services()
-        self._max_lines = 1000  # 默认最大行数
+
+    def _build_formats(self) -> Dict[str, QTextCharFormat]:
+        formats = {}
+        for level, color in self.LEVEL_COLORS.items():
+            fmt = QTextCharFormat()
+            fmt.setForeground(QColor(color))
+            formats[level] = fmt
+        return formats
 
     def _init_ui(self) -> None:
-        """初始化UI组件（保持原有结构）"""
-        self.text_output = QTextEdit(self)
+        """初始化UI组件：过滤 / 搜索栏 + 日志视图"""
+        self.level_filter = QComboBox(self)
+        for label, rank in self.LEVEL_FILTERS:
+            self.level_filter.addItem(label, rank)
+        self.device_filter = QComboBox(self)
+        self.device_filter.addItem(self.ALL_DEVICES, "")
+        self.search_edit = QLineEdit(self)
+        self.search_edit.setPlaceholderText("Search (Enter for next match)")
+        self.search_edit.setClearButtonEnabled(True)
+        self.match_label = QLabel(self)
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self.SEARCH_DELAY_MS)
+
+        filter_row = QHBoxLayout()
+        filter_row.setContentsMargins(0, 0, 0, 0)
+        filter_row.addWidget(self.level_filter)
+        filter_row.addWidget(self.device_filter)
+        filter_row.addWidget(self.search_edit, 1)
+        filter_row.addWidget(self.match_label)
+
+        self.text_output = QPlainTextEdit(self)
         self.text_output.setReadOnly(True)
         self.text_output.setUndoRedoEnabled(False)  # 禁用撤销重做提高性能
+        self.text_output.setMaximumBlockCount(self._max_lines)
         self._configure_font()
-        
+
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(filter_row)
         layout.addWidget(self.text_output)
         self.setLayout(layout)
 
+        self.level_filter.currentIndexChanged.connect(self._apply_filters)
+        self.device_filter.currentIndexChanged.connect(self._apply_filters)
+        self.search_edit.textChanged.connect(lambda _: self._search_timer.start())
+        self._search_timer.timeout.connect(self._apply_search)
+        self.search_edit.returnPressed.connect(self.find_next)
+
     def _configure_font(self) -> None:
         """配置日志字体（保持原有样式）"""
         log_font = QFont(BaseStyles.LOG_FONT, BaseStyles.LOG_FONT_SIZE)
@@ -50,7 +118,7 @@ class LogPanel(QWidget):
     def _setup_styles(self) -> None:
         """设置样式表（保持原有样式）"""
         self.text_output.setStyleSheet(f"""
-            QTextEdit {{
+            QPlainTextEdit {{
                 background-color: {BaseStyles.LOG_BACKGROUND};
                 color: {BaseStyles.LOG_TEXT_COLOR};
                 border: none;
@@ -60,81 +128,157 @@ class LogPanel(QWidget):
         """)
 
     def _connect_services(self) -> None:
-        """连接日志服务信号"""
+        """连接日志服务：所有日志都经 LogService 按批送达，面板只有这一条渲染路径"""
         self.log_service = LogService()
-        self.log_service.log_received.connect(
-            self._append_log,
+        self.log_service.logs_received.connect(
+            self.append_records,
             Qt.ConnectionType.QueuedConnection  # 确保线程安全
         )
-        self.log_appended.connect(
-            self._handle_log_append,
-            Qt.ConnectionType.QueuedConnection
-        )
 
     def log_message(self, level: str, message: str) -> None:
         """
-        线程安全的日志记录方法
+        线程安全的日志记录方法（转交 LogService，与其它日志一起批量送达）
         参数:
             level: 日志级别 (DEBUG/INFO/WARNING/ERROR/CRITICAL)
             message: 日志消息
         """
-        self.log_appended.emit(level.upper(), str(message))
+        self.log_service.log(level, message)
 
     def _append_log(self, level: str, message: str) -> None:
-        """日志服务信号处理适配方法"""
+        """兼容旧调用方"""
         self.log_message(level, message)
 
-    def _handle_log_append(self, level: str, message: str) -> None:
-        """实际处理日志追加（主线程执行）"""
-        if not hasattr(self, 'text_output'):  # 防止UI未初始化
+    def append_records(self, entries: Iterable[Tuple[str, str]]) -> None:
+        """批量追加 (level, message)，只能在主线程调用"""
+        batch = []
+        for level, message in entries:
+            record = LogRecord(level, message, self._detect_device(message))
+            self._records.append(record)
+            batch.append(record)
+            if record.device and self.device_filter.findData(record.device) < 0:
+                self.device_filter.addItem(record.device, record.device)
+        # 一批超过保留行数时，前面的行写入后也会立即被淘汰，直接跳过
+        self._render([r for r in batch[-self._max_lines:] if self._accepts(r)])
+
+    def _detect_device(self, message: str) -> str:
+        if self._known_devices is not None:
+            match = self._known_devices.search(message)
+            if match:
+                return match.group(0)
+        match = _DEVICE_ADDRESS.search(message)
+        return match.group(0) if match else ""
+
+    def set_devices(self, devices: List[str]) -> None:
+        """登记在线设备，用于识别消息中非 ip:port 形式的设备（如 USB 序列号）"""
+        names = sorted({d for d in devices if d}, key=len, reverse=True)
+        self._known_devices = re.compile("|".join(re.escape(d) for d in names)) if names else None
+
+    def _accepts(self, record: LogRecord) -> bool:
+        if self.LEVEL_RANKS.get(record.level, 1) < self._min_rank:
+            return False
+        return not self._device or record.device == self._device
+
+    def _render(self, records: List[LogRecord]) -> None:
+        if not records:
             return
+        scrollbar = self.text_output.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        document = self.text_output.document()
+        cursor = QTextCursor(document)
+        cursor.movePosition(QTextCursor.End)
+        separator = "\n" if not document.isEmpty() else ""
+        added = 0
+        cursor.beginEditBlock()
+        for record in records:
+            text = f"{separator}[{record.level}] {record.message}"
+            cursor.insertText(text, self._formats.get(record.level, self._formats["INFO"]))
+            added += len(text)
+            separator = "\n"
+        cursor.endEditBlock()
+        if self._search:
+            # 超出 maximumBlockCount 的旧行从文档头部淘汰，新内容的起点按距文档末尾的长度计算
+            self._highlight_from(max(document.characterCount() - 1 - added, 0))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def _apply_filters(self) -> None:
+        """级别 / 设备过滤变化时，从环形缓冲区重建视图"""
+        self._min_rank = self.level_filter.currentData() or 0
+        self._device = self.device_filter.currentData() or ""
+        self.text_output.clear()
+        self._reset_highlights()
+        self._render([r for r in self._records if self._accepts(r)])
+
+    def _apply_search(self) -> None:
+        """停止输入 SEARCH_DELAY_MS 后执行：重新高亮视图中最新的命中"""
+        self._search = self.search_edit.text()
+        self._reset_highlights()
+        if self._search:
+            self._highlight_from(0)
+            self.find_next()
 
-        try:
-            self._append_formatted_text(level, message)
-            self._trim_excess_lines()
-        except Exception as e:
-            print(f"Log append error: {e}")  # 防止日志记录本身崩溃
-
-    def _append_formatted_text(self, level: str, message: str) -> None:
-        """添加带格式的日志文本"""
-        cursor = self.text_output.textCursor()
-        fmt = QTextCharFormat()
-        fmt.setForeground(QColor(self.LEVEL_COLORS.get(level, BaseStyles.INFO_COLOR)))
-        
+    def _reset_highlights(self) -> None:
+        self._highlights = []
+        self._truncated = False
+        self.text_output.setExtraSelections([])
+        self.match_label.setText("")
+
+    def _find_backward(self, position: int) -> List[QTextCursor]:
+        """从文档末尾向前查找到 position 为止，最多 MAX_HIGHLIGHTS 处，按文档顺序返回"""
+        document = self.text_output.document()
+        cursor = QTextCursor(document)
         cursor.movePosition(QTextCursor.End)
-        cursor.insertText(f"[{level}] {message}\n", fmt)
-        self._auto_scroll(cursor)
+        found = []
+        while len(found) < self.MAX_HIGHLIGHTS:
+            cursor = document.find(self._search, cursor, QTextDocument.FindBackward)
+            if cursor.isNull() or cursor.selectionStart() < position:
+                break
+            found.append(cursor)
+        if len(found) >= self.MAX_HIGHLIGHTS:
+            self._truncated = True
+        found.reverse()
+        return found
 
-    def _auto_scroll(self, cursor: QTextCursor) -> None:
-        """自动滚动到底部"""
-        self.text_output.ensureCursorVisible()
-        scrollbar = self.text_output.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
-        self.text_output.setTextCursor(cursor)
-
-    def _trim_excess_lines(self) -> None:
-        """定期修剪多余日志行"""
-        cursor = self.text_output.textCursor()
-        cursor.select(QTextCursor.Document)
-        text = cursor.selectedText()
-        
-        if text.count('\n') > self._max_lines:
-            lines = text.split('\n')
-            new_text = '\n'.join(lines[-self._max_lines:])
-            self.text_output.setPlainText(new_text)
+    def _highlight_from(self, position: int) -> None:
+        highlight = QTextCharFormat()
+        highlight.setBackground(QColor(BaseStyles.LOG_HIGHLIGHT))
+        # 被淘汰行上的高亮会塌缩为空选区，直接丢弃
+        highlights = [s for s in self._highlights if s.cursor.hasSelection()]
+        for cursor in self._find_backward(position):
+            selection = QTextEdit.ExtraSelection()
+            selection.cursor = cursor
+            selection.format = highlight
+            highlights.append(selection)
+        if len(highlights) > self.MAX_HIGHLIGHTS:
+            self._truncated = True
+        self._highlights = highlights[-self.MAX_HIGHLIGHTS:]
+        self.text_output.setExtraSelections(self._highlights)
+        self.match_label.setText(f"{len(self._highlights)}{'+' if self._truncated else ''} matches")
+
+    def find_next(self) -> None:
+        """跳到下一处命中，到末尾后从头开始"""
+        if self._search_timer.isActive():
+            self._search_timer.stop()
+            self._apply_search()
+            return
+        if not self._search:
+            return
+        if not self.text_output.find(self._search):
+            self.text_output.moveCursor(QTextCursor.Start)
+            self.text_output.find(self._search)
 
     def clear(self) -> None:
         """清空日志内容"""
-        if hasattr(self, 'text_output'):
-            self.text_output.clear()
+        self._records.clear()
+        self.text_output.clear()
+        self._reset_highlights()
 
     def set_max_lines(self, max_lines: int) -> None:
-        """设置最大保留日志行数"""
-        self._max_lines = max(max_lines, 1000)  # 最小100行
-        self._trim_excess_lines()
+        """设置最大保留日志行数（环形缓冲区与视图同时生效）"""
+        self._max_lines = max(max_lines, self.MIN_MAX_LINES)
+        self._records = deque(self._records, maxlen=self._max_lines)
+        self.text_output.setMaximumBlockCount(self._max_lines)
 
     def get_log_content(self) -> str:
-        """获取当前日志内容（线程安全）"""
-        if hasattr(self, 'text_output'):
-            return self.text_output.toPlainText()
-        return ""
\ No newline at end of file
+        """获取保留的全部日志（不受过滤影响）"""
+        return "\n".join(f"[{r.level}] {r.message}" for r in self._records)
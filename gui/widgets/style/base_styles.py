@@ -19,6 +19,7 @@ class BaseStyles:
     CRITICAL_COLOR: Final[str] = "#FF0000"
     LOG_BACKGROUND: Final[str] = "#000000"
     LOG_TEXT_COLOR: Final[str] = "#FFFFFF"
+    LOG_HIGHLIGHT: Final[str] = "#806000"    # 日志搜索命中背景
     WINDOW_BACKGROUND: Final[str] = "#f0f0f0"
     
     # CustomMenuBar专用颜色（保持原有名称）
@@ -1,14 +1,30 @@
-import base64
 from datetime import datetime
 import os
 import re
 import subprocess
 from functools import wraps
-from urllib.parse import quote
 import time
 from typing import Dict, List
 import zipfile
 from PySide6.QtCore import QObject, Signal, QThreadPool, QRunnable
+from models.apk_installer import ApkInstaller
+from models.app_snapshot import AppSnapshotter
+from models.compressed_transfer import CompressedTransfer
+from models.crash_clusters import analyze_crashes, write_crash_report
+from models.dpad_crawler import DpadCrawler
+from models.input_macro import InputMacro, MacroPlayer
+from models.launch_resolver import LaunchResolver
+from models.log_alerts import AlertEngine
+from models.log_volume import analyze_volume, sample_logd_volume, write_volume_report
+from models.logcat_capture import LogcatCapture, load_capture_config
+from models.logcat_tail import AlertWatcher
+from models.permission_provisioner import PermissionProvisioner
+from models.shell_batch import ShellBatch, format_steps
+from models.text_input import TextInjector
+from models.transfer_scheduler import TransferScheduler
+from models.ui_hierarchy import WINDOW_SAMPLE_INTERVAL, UiHierarchyCache, UiNode, get_focus_window, window_component
+from utils.apk_parser import parse_apk
+from utils.apk_size import analyze_apk_size
 
 class ADBModel(QObject):
     # 定义信号用于异步返回结果
@@ -17,6 +33,15 @@ class ADBModel(QObject):
     def __init__(self):
         super().__init__()
         self.thread_pool = QThreadPool.globalInstance()
+        self.ui_cache = UiHierarchyCache()
+        self.macro_player = MacroPlayer()
+        self.text_injector = TextInjector()
+        self.launcher = LaunchResolver()
+        self.provisioner = PermissionProvisioner()
+        scheduler = TransferScheduler()
+        self.transfer = CompressedTransfer(scheduler)
+        self.apk_installer = ApkInstaller(scheduler, self.transfer)
+        self.snapshotter = AppSnapshotter(self.transfer)
     
     @staticmethod
     def _execute_command(command: list, timeout: int = 30) -> str:
@@ -204,20 +229,22 @@ class ADBModel(QObject):
     
     @async_command
     def retrieve_device_logs_async(self, device_ip: str, log_path: str) -> dict:
-        """异步保存设备日志"""
+        """异步保存设备日志：以二进制格式流式传输、本地渲染写盘，设备支持时在设备端 gzip 压缩"""
         try:
-            log_content = self._execute_command(["adb", "-s", device_ip, "logcat", "-d"])
-            if log_content.startswith(("Error:", "Timeout:", "SystemError:")):
-                return {"success": False, "device_ip": device_ip, "error": log_content}
-            
-            # 写入文件（文件操作仍在工作线程）
-            with open(log_path, 'w', encoding='utf-8') as f:
-                f.write(log_content)
-                
-            return {"success": True, "device_ip": device_ip, "log_path": log_path}
-            
+            wire_gzip = self.transfer.capabilities(device_ip)["gzip"]
+            capture = LogcatCapture(device_ip, log_path, dump=True, wire_gzip=wire_gzip, binary=True,
+                                    clock=True).start()
+            stats = capture.wait(timeout=300)
+            if stats["error"]:
+                raise RuntimeError(stats["error"])
+            mode = "gzip" if wire_gzip else "none"
+            self.transfer.record(device_ip, mode, stats["bytes"], stats["elapsed"])
+            transfer = {"mode": mode, "bytes": stats["bytes"], "wire_bytes": stats["wire_bytes"],
+                        "elapsed": stats["elapsed"],
+                        "summary": self.transfer.describe(device_ip, mode)}
+            return {"success": True, "device_ip": device_ip, "log_path": log_path, "transfer": transfer}
         except Exception as e:
-            return {"success": False, "device_ip": device_ip, "error": f"FileError: {str(e)}"}
+            return {"success": False, "device_ip": device_ip, "error": f"TransferError: {str(e)}"}
 
     @async_command
     def cleanup_device_logs_async(self, device_ip: str) -> dict:
@@ -230,30 +257,24 @@ class ADBModel(QObject):
             return {"success": False,"device_ip": device_ip,"error": result}
         return {"success": True,"device_ip": device_ip,"output": result}
     
-    @staticmethod
-    def _encode_text_for_adb(text: str) -> str:
-        """终极兼容方案 Base64编码+URL编码双重保护"""
-        # 先进行Base64编码
-        b64_encoded = base64.b64encode(text.encode('utf-8')).decode('ascii')
-        # 再进行URL编码防止特殊符号干扰
-        return quote(b64_encoded)
-    
     @async_command
     def input_text_async(self, device_ip: str, text: str) -> dict:
-        """异步向设备输入文本"""
+        """异步向设备输入文本（自动选择 IME 广播 / 剪贴板 / input text 通道）"""
         try:
-            result = self._execute_command(
-                ["adb", "-s", device_ip, "shell", "input", "text", text]
-            )
-            
-            if result.startswith(("Error:", "Timeout:", "SystemError:")):
-                return {"success": False,"device_ip": device_ip,"error": result,"text": text}
-                
-            return {"success": True,"device_ip": device_ip,"text": text,"output": result}
-            
+            result = self.text_injector.inject(device_ip, text)
+            self.ui_cache.invalidate(device_ip)
+            return {"success": True, "device_ip": device_ip, "text": text, **result}
         except Exception as e:
-            return {"success": False,"device_ip": device_ip,"error": str(e),"text": text}
-    
+            return {"success": False, "device_ip": device_ip, "error": str(e), "text": text}
+
+    @async_command
+    def replay_macro_async(self, device_ip: str, macro: InputMacro, index: int) -> dict:
+        """异步回放输入宏（sendevent 批量写入，避免每次 input 启动 JVM）"""
+        result = self.macro_player.replay(device_ip, macro)
+        self.ui_cache.invalidate(device_ip)
+        result["index"] = index
+        return result
+
     @async_command
     def get_current_package_async(self, device_ip: str) -> dict:
         """异步获取当前前台应用包名"""
@@ -289,27 +310,25 @@ class ADBModel(QObject):
         except Exception as e:
             return {"success": False, "device_ip": device_ip, "error": f"CommandError: {str(e)}"}
 
-    @async_command
-    def install_apk_async(self, device_ip: str, apk_path: str, apk_name: str, idx: int):
-        """同步安装APK 直接执行命令"""
+    def install_apk(self, device_ip: str, apk_path, apk_name: str, idx: int, force: bool = False,
+                    progress=None) -> dict:
+        """
+        同步安装：apk_path 可以是单个文件或文件列表（拆分 APK / .apks / .xapk）
+        设备已是相同构建时跳过，已暂存的文件不再重复传输
+        """
         try:
-            cmd = ["adb", "-s", device_ip, "install", "-r", apk_path]
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                timeout=120,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
-            output = result.stdout.strip()
-            return {"success": True, "device_ip": device_ip, "apk_path": apk_path, "output": output, "index": idx, "apk_name": apk_name}
-            
+            result = self.apk_installer.install(device_ip, apk_path, force=force, progress=progress)
+            return {"success": True, "device_ip": device_ip, "apk_path": apk_path, "index": idx, "apk_name": apk_name, **result}
         except subprocess.TimeoutExpired as e:
             return {"success": False, "device_ip": device_ip, "error": f"CommandError: {str(e)}"}
         except Exception as e:
             return {"success": False, "device_ip": device_ip, "error": f"CommandError: {str(e)}"}
-    
+
+    @async_command
+    def install_apk_async(self, device_ip: str, apk_path, apk_name: str, idx: int):
+        """异步安装APK"""
+        return self.install_apk(device_ip, apk_path, apk_name, idx)
+
     @async_command
     def uninstall_app_sync(self, device_ip: str, package_name: str, idx: int) -> dict:
         """修正的同步卸载方法"""
@@ -358,32 +377,70 @@ class ADBModel(QObject):
                 timeout=30,
                 creationflags=subprocess.CREATE_NO_WINDOW
             )
+            self.ui_cache.invalidate(device_ip)
             output = result.stdout.strip()
             return {"success": True, "device_ip": device_ip, "package_name": package_name, "output": output, "index": idx}
         except Exception as e:
             return {"success": False, "device_ip": device_ip, "package_name": package_name, "output": str(e), "idnex": idx}
 
+    def _build_restart_batch(self, device_ip: str, package_name: str, clear_data: bool = False) -> ShellBatch:
+        """停止 →（清数据）→ 解析启动组件（有缓存时跳过）→ am start，编译为一次 shell 调用"""
+        batch = ShellBatch(device_ip).add("force-stop", f"am force-stop {package_name}")
+        if clear_data:
+            batch.add("clear", f"pm clear {package_name}", stop_on_error=True)
+        return self.launcher.add_launch(batch, package_name)
+
+    def _run_restart_batch(self, device_ip: str, package_name: str, index: int, clear_data: bool = False) -> dict:
+        try:
+            start = time.perf_counter()
+            steps = self._build_restart_batch(device_ip, package_name, clear_data).run(timeout=60)
+            self.ui_cache.invalidate(device_ip)
+            success = "launch" in steps and all(step.ok for step in steps.values())
+            launch = self.launcher.result(device_ip, package_name, steps)
+            return {"success": success, "device_ip": device_ip, "package_name": package_name,
+                    "output": format_steps(steps), "steps": steps, "launch": launch,
+                    "elapsed_ms": int((time.perf_counter() - start) * 1000), "index": index}
+        except Exception as e:
+            return {"success": False, "device_ip": device_ip, "package_name": package_name, "output": str(e), "index": index}
+
     @async_command
     def restart_app_async(self, device_ip: str, package_name: str, index: int):
-        """异步重启应用"""
+        """异步重启应用（force-stop 与启动合并为一次 adb 往返）"""
+        return self._run_restart_batch(device_ip, package_name, index)
+
+    @async_command
+    def clear_and_restart_app_async(self, device_ip: str, package_name: str, index: int):
+        """停止、清除数据并重新启动应用，一次 adb 往返"""
+        return self._run_restart_batch(device_ip, package_name, index, clear_data=True)
+
+    @async_command
+    def provision_permissions_async(self, device_ip: str, package_name: str, index: int, permissions: list = None) -> dict:
+        """批量授予运行时权限并设置 app-ops（一次 adb 往返）"""
         try:
-            # 停止应用
-            stop_cmd = ["adb", "-s", device_ip, "shell", "am", "force-stop", package_name]
-            stop_output = self._execute_command(stop_cmd)
-
-            # 启动应用
-            start_cmd = [
-                "adb", "-s", device_ip, "shell", "monkey", "-p", package_name,
-                "-c", "android.intent.category.LAUNCHER", "1"
-            ]
-            start_output = self._execute_command(start_cmd)
+            start = time.perf_counter()
+            provisioned = self.provisioner.provision(device_ip, package_name, permissions)
+            return {"success": True, "device_ip": device_ip, "package_name": package_name, "index": index,
+                    "elapsed_ms": int((time.perf_counter() - start) * 1000), **provisioned}
+        except Exception as e:
+            return {"success": False, "device_ip": device_ip, "package_name": package_name, "index": index, "error": str(e)}
 
-            return{"success": True,"device_ip": device_ip,"package_name": package_name,"output": f"{stop_output}\n{start_output}","index": index}
-        except subprocess.CalledProcessError as e:
-            return {"success": False,"device_ip": device_ip,"package_name": package_name,"output": e.output,"index": index}
+    @async_command
+    def snapshot_app_data_async(self, device_ip: str, package_name: str, index: int) -> dict:
+        """把应用数据目录打包保存到本地快照"""
+        try:
+            snapshot = self.snapshotter.snapshot(device_ip, package_name)
+            return {"success": True, "device_ip": device_ip, "index": index, **snapshot}
         except Exception as e:
-            return {"success": False,"device_ip": device_ip,"package_name": package_name,"output": str(e),"index": index}
+            return {"success": False, "device_ip": device_ip, "package_name": package_name, "index": index, "error": str(e)}
 
+    @async_command
+    def restore_app_data_async(self, device_ip: str, snapshot_path: str, index: int) -> dict:
+        """把本地快照写回设备上的应用数据目录"""
+        try:
+            restored = self.snapshotter.restore(device_ip, snapshot_path)
+            return {"success": True, "device_ip": device_ip, "index": index, **restored}
+        except Exception as e:
+            return {"success": False, "device_ip": device_ip, "path": snapshot_path, "index": index, "error": str(e)}
 
     @async_command
     def get_current_activity_async(self, device_ip: str, index: int = 0) -> dict:
@@ -414,16 +471,83 @@ class ADBModel(QObject):
             return {"success": False,"device_ip": device_ip,"index": index,"error": str(e)}
 
     @async_command
-    def parse_apk_info_async(self, apk_path: str) -> dict:
-        """使用 aapt 异步解析 APK 信息"""
+    def dump_ui_hierarchy_async(self, device_ip: str, index: int = 0, force: bool = False) -> dict:
+        """异步获取 UI 层级，界面未变化时直接使用缓存"""
+        start = time.perf_counter()
+        try:
+            hierarchy, cached = self.ui_cache.get(device_ip, force=force)
+            return {
+                "success": True,
+                "device_ip": device_ip,
+                "index": index,
+                "cached": cached,
+                "node_count": len(hierarchy),
+                "focused": hierarchy.focused(),
+                "interactive": hierarchy.interactive_nodes(),
+                "elapsed_ms": int((time.perf_counter() - start) * 1000)
+            }
+        except Exception as e:
+            return {"success": False, "device_ip": device_ip, "index": index, "error": str(e)}
+
+    def find_ui_elements(self, device_ip: str, resource_id: str = None, text: str = None,
+                         class_name: str = None, contains: bool = False) -> List[UiNode]:
+        """同步查找界面元素（优先使用缓存的层级）"""
+        hierarchy, _ = self.ui_cache.get(device_ip)
+        return hierarchy.find(resource_id=resource_id, text=text, class_name=class_name, contains=contains)
 
+    @async_command
+    def parse_apk_info_async(self, apk_path: str) -> dict:
+        """进程内解析 APK 信息（不依赖 aapt），结果按中央目录摘要缓存"""
+        start = time.perf_counter()
         try:
-            command = ["aapt", "dump", "badging", apk_path]
-            output = self._execute_command(command, timeout=15)
-            return {"success": True,"apk_path": apk_path,"output": output}
+            info = parse_apk(apk_path)
+            return {"success": True, "apk_path": apk_path, "info": info,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
         except Exception as e:
             return {"success": False,"apk_path": apk_path,"error": str(e)}
 
+    @async_command
+    def analyze_apk_size_async(self, apk_path: str, baseline_path: str = None) -> dict:
+        """只读中央目录统计 APK 体积构成，给出 baseline 时同时读取用于逐条目对比"""
+        start = time.perf_counter()
+        try:
+            report = analyze_apk_size(apk_path)
+            baseline = analyze_apk_size(baseline_path) if baseline_path else None
+            return {"success": True, "apk_path": apk_path, "report": report, "baseline": baseline,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}
+        except Exception as e:
+            return {"success": False, "apk_path": apk_path, "error": str(e)}
+
+    @async_command
+    def analyze_crashes_async(self, root: str) -> dict:
+        """一次流式扫描目录下的 logcat 与 tombstone，按崩溃签名聚合并写出完整报告"""
+        try:
+            result = analyze_crashes(root)
+            report_path = os.path.join(root, f"crash_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+            write_crash_report(result, report_path)
+            return {"success": True, "root": root, "report_path": report_path, **result}
+        except Exception as e:
+            return {"success": False, "root": root, "error": str(e)}
+
+    @async_command
+    def analyze_log_volume_async(self, root: str) -> dict:
+        """一次流式扫描目录下的抓取日志，按 tag / PID / 级别统计日志量并写出完整报告"""
+        try:
+            result = analyze_volume(root)
+            report_path = os.path.join(root, f"log_volume_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+            write_volume_report(result, report_path)
+            return {"success": True, "root": root, "report_path": report_path, **result}
+        except Exception as e:
+            return {"success": False, "root": root, "error": str(e)}
+
+    @async_command
+    def sample_log_volume_async(self, device_ip: str, index: int) -> dict:
+        """实时采样 logd 统计（logcat -S），得到各缓冲区写入速率、回绕周期与占用最多的来源"""
+        try:
+            return {"success": True, "device_ip": device_ip, "index": index, **sample_logd_volume(device_ip)}
+        except Exception as e:
+            return {"success": False, "device_ip": device_ip, "index": index, "error": str(e)}
+
     @async_command
     def kill_monkey_async(self, device_ip: str, index: int) -> dict:
         """Asynchronously kill the monkey test process on the device"""
@@ -434,45 +558,30 @@ class ADBModel(QObject):
             "message": ""
         }
 
+        # 查找与 kill 在同一个 shell 中完成，PID 通过 shell 变量传递
+        batch = ShellBatch(device_ip)
+        batch.add("find", "pids=$(pidof com.android.commands.monkey 2>/dev/null); "
+                          "[ -n \"$pids\" ] || pids=$(ps -A 2>/dev/null | grep '[m]onkey' | awk '{print $2}'); "
+                          "[ -n \"$pids\" ] || pids=$(ps | grep '[m]onkey' | awk '{print $2}'); "
+                          "echo $pids; [ -n \"$pids\" ]", stop_on_error=True)
+        batch.add("kill", "kill $pids")
         try:
-            cmd = ["adb", "-s", device_ip, "shell", "ps | grep monkey"]
-            output = subprocess.check_output(
-                cmd,
-                stderr=subprocess.STDOUT,
-                text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            ).strip()
-
-            if not output:
-                result["message"] = "No monkey process is running on the device"
-                return result
-
-            lines = output.splitlines()
-            for line in lines:
-                parts = line.split()
-                if len(parts) > 1:
-                    pid = parts[1]
-                    try:
-                        kill_cmd = ["adb", "-s", device_ip, "shell", "kill", pid]
-                        subprocess.check_output(
-                            kill_cmd,
-                            stderr=subprocess.STDOUT,
-                            text=True,
-                            creationflags=subprocess.CREATE_NO_WINDOW
-                        )
-                        result["success"] = True
-                        result["message"] = f"Monkey process (PID: {pid}) successfully killed"
-                        return result
-                    except subprocess.CalledProcessError as e:
-                        result["message"] = f"Failed to kill monkey process (PID: {pid}): {e.output}"
-                        return result
-
-            result["message"] = "Monkey process PID not found in the process list"
+            steps = batch.run(timeout=30)
+        except Exception as e:
+            result["message"] = f"Error executing monkey kill batch: {e}"
             return result
 
-        except subprocess.CalledProcessError as e:
-            result["message"] = f"Error executing 'ps | grep monkey': {e.output}"
-            return result
+        found = steps.get("find")
+        killed = steps.get("kill")
+        if found is None or not found.ok:
+            result["message"] = "No monkey process is running on the device"
+        elif killed is not None and killed.ok:
+            result["success"] = True
+            result["message"] = f"Monkey process (PID: {found.output}) successfully killed"
+        else:
+            error = killed.output if killed else "kill step not executed"
+            result["message"] = f"Failed to kill monkey process (PID: {found.output}): {error}"
+        return result
 
     @async_command
     def list_installed_packages_async(self, device_ip: str, index: int) -> dict:
@@ -514,12 +623,13 @@ class ADBModel(QObject):
             if android_version >= (8, 0):
                 log("🚀 Running: adb bugreport <dir> ... this may take 1-2 minutes")
                 cmd = ["adb", "-s", device_ip, "bugreport", target_dir]
+                subprocess.run(cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
             else:
-                log("🚀 Running: adb bugreport <file> ... this may take 1-2 minutes")
-                output_file = os.path.join(target_dir, f"bugreport_{device_ip}.txt")
-                cmd = ["adb", "-s", device_ip, "bugreport", output_file]
-
-            proc = subprocess.run(cmd, text=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                # 旧设备输出纯文本，设备端 gzip 压缩后传输
+                log("🚀 Running: bugreport | gzip ... this may take 1-2 minutes")
+                output_file = os.path.join(target_dir, f"bugreport_{sanitized}.txt")
+                stats = self.transfer.capture_output(device_ip, "bugreport", output_file, timeout=600)
+                log(f"📶 Transfer: {stats['summary']}")
             log("✅ Bugreport command completed")
         except Exception as e:
             return {"device_ip": device_ip, "index": index, "success": False, "message": f"Bugreport failed: {e}"}
@@ -659,6 +769,8 @@ class ADBModel(QObject):
         logcat_log_path = os.path.join(log_dir, "logcat.txt")
 
         start_time = datetime.now()
+        logcat_capture = None
+        alert_watcher = None
         result = {
             "device_ip": device_ip,
             "success": False,
@@ -679,14 +791,23 @@ class ADBModel(QObject):
                 creationflags=subprocess.CREATE_NO_WINDOW
             )
 
-            # 启动 logcat
-            log(f"📄 Starting logcat collection → {logcat_log_path}")
-            logcat_proc = subprocess.Popen(
-                ["adb", "-s", device_ip, "logcat", "-v", "time"],
-                stdout=open(logcat_log_path, "w", encoding="utf-8"),
-                stderr=subprocess.DEVNULL,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            # 预授予运行时权限，避免 Monkey 事件浪费在系统权限弹窗上
+            try:
+                provisioned = self.provisioner.provision(device_ip, package_name)
+                log(f"🔐 Pre-granted {len(provisioned['granted'])} permissions/app-ops"
+                    + (f", {len(provisioned['failed'])} failed: {', '.join(provisioned['failed'])}" if provisioned["failed"] else ""))
+            except Exception as e:
+                log(f"⚠️ Permission provisioning failed: {e}")
+
+            # 启动 logcat：分段轮转并在后台压缩，长时间压测不会堆出单个巨型文件
+            config = load_capture_config()
+            logcat_capture = LogcatCapture(device_ip, logcat_log_path, fmt="time", clock=True, **config).start()
+            log(f"📄 Starting logcat collection → {log_dir} "
+                f"({config['segment_bytes'] >> 20} MB segments, {logcat_capture.compression})")
+            # 告警读取独立的不过滤 logcat，不受抓取过滤配置影响
+            alerts = AlertEngine.from_config(lambda event: log(
+                f"🚨 {event.rule}: {event.line}" + (f" (+{event.suppressed} suppressed)" if event.suppressed else "")))
+            alert_watcher = AlertWatcher(device_ip, alerts).start()
 
             # 构造 Monkey 命令
             log(f"🧪 Launching Monkey test on {device_type}...")
@@ -718,32 +839,33 @@ class ADBModel(QObject):
             # 开始轮询监控前台应用
             log("🔁 Starting Monkey Test monitoring loop...")
             last_switch_time = 0
+            last_check_time = 0
             cooldown = 30
             interval = 15
+            seen_windows = set()  # 轮询到的不同前台窗口（pkg/Activity），用于与 D-pad 遍历对比覆盖率
 
             while monkey_proc.poll() is None:
                 try:
-                    output = subprocess.check_output(
-                        ["adb", "-s", device_ip, "shell", "dumpsys", "window"],
-                        stderr=subprocess.DEVNULL,
-                        creationflags=subprocess.CREATE_NO_WINDOW,
-                        text=True
-                    )
-                    current_app = ""
-                    for line in output.splitlines():
-                        if "mCurrentFocus" in line or "mFocusedApp" in line:
-                            current_app = line.split()[-1].split("/")[0]
-                            break
-
-                    if current_app != package_name and (time.time() - last_switch_time) > cooldown:
+                    # 窗口按 WINDOW_SAMPLE_INTERVAL 采样，前台检查仍按 interval 进行
+                    component = window_component(get_focus_window(device_ip))
+                    if component:
+                        seen_windows.add(component)
+                    now = time.time()
+                    if now - last_check_time < interval:
+                        time.sleep(WINDOW_SAMPLE_INTERVAL)
+                        continue
+                    last_check_time = now
+                    current_app = component.split("/")[0]
+
+                    if current_app != package_name and (now - last_switch_time) > cooldown:
                         log("🕹️ App in background, switching back to target app...")
-                        subprocess.run(["adb", "-s", device_ip, "shell", "am", "force-stop", package_name],
-                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                        subprocess.run(["adb", "-s", device_ip, "shell", "monkey", "-p", package_name, "1"],
-                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                        steps = self._build_restart_batch(device_ip, package_name).run(timeout=60)
+                        launch = self.launcher.result(device_ip, package_name, steps)
+                        if launch["total_ms"] is not None:
+                            log(f"⏱️ Relaunched {launch['component']} in {launch['total_ms']} ms")
                         last_switch_time = time.time()
 
-                    time.sleep(interval)
+                    time.sleep(WINDOW_SAMPLE_INTERVAL)
 
                 except Exception as e:
                     log(f"⚠️ Polling exception: {str(e)}")
@@ -756,6 +878,8 @@ class ADBModel(QObject):
             
             result["success"] = True
             result["duration"] = str(datetime.now() - start_time)
+            minutes = max((datetime.now() - start_time).total_seconds() / 60, 1e-6)
+            result["windows_per_min"] = round(len(seen_windows) / minutes, 2)
             log(f"✅ Monkey test complete for {device_ip} / ({index})")
 
         except Exception as e:
@@ -764,18 +888,39 @@ class ADBModel(QObject):
             log(f"❌ Monkey test failed: {e} | Time: {result['duration']}")
 
         finally:
-            try:
-                logcat_proc.terminate()
-                logcat_proc.wait()
-                log("🛑 logcat process terminated.")
-            except Exception as e:
-                log(f"⚠️ Failed to terminate logcat process: {e}")
+            self.ui_cache.invalidate(device_ip)  # Monkey 注入了大量事件，缓存的层级已不可信
+            if alert_watcher is not None:
+                alert_watcher.stop()
+                result["alerts"] = alert_watcher.alerts.matches
+            if logcat_capture is not None:
+                stats = logcat_capture.stop()
+                result["logcat_segments"] = stats["segments"]
+                result["logcat_bytes"] = stats["bytes"]
+                log(f"🛑 logcat stopped: {len(stats['segments'])} segments, {stats['bytes'] / (1 << 20):.1f} MB"
+                    + (f" ⚠️ {stats['error']}" if stats["error"] else ""))
 
         return result
 
 
 
 
+    @async_command
+    def run_dpad_crawl_async(self, device_ip: str, package_name: str, duration: float, index: int,
+                             stop_event=None, callback=None) -> dict:
+        """STB 遥控器系统遍历，按界面指纹去重"""
+        def log(msg):
+            if callback:
+                callback(f"[{device_ip}] {msg}")
+
+        try:
+            log(f"🧭 Starting D-pad crawl on {package_name} (max {int(duration)}s)...")
+            crawler = DpadCrawler(device_ip, package_name, self.ui_cache, launcher=self.launcher, duration=duration,
+                                  stop_event=stop_event, log=log)
+            stats = crawler.run()
+            return {"success": True, "device_ip": device_ip, "package_name": package_name, "index": index, **stats}
+        except Exception as e:
+            return {"success": False, "device_ip": device_ip, "package_name": package_name, "index": index, "error": str(e)}
+
     @async_command
     def pull_anr_files_async(self, device_ip: str, sanitized_name: str, save_dir: str, index: int) -> dict:
         """从指定设备拉取 /data/anr 文件夹"""
@@ -783,22 +928,18 @@ class ADBModel(QObject):
             device_anr_dir = os.path.join(save_dir, f"{sanitized_name}_anr")
             os.makedirs(device_anr_dir, exist_ok=True)
 
-            pull_command = ["adb", "-s", device_ip, "pull", "/data/anr", device_anr_dir]
-            subprocess.check_output(pull_command, stderr=subprocess.STDOUT, text=True, creationflags=subprocess.CREATE_NO_WINDOW)
+            stats = self.transfer.pull(device_ip, "/data/anr", device_anr_dir)
 
             return {
                 "device_ip": device_ip,
                 "success": True,
-                "message": f"ANR files saved to {device_anr_dir}",
+                "message": f"ANR files saved to {device_anr_dir} ({stats['summary']})",
                 "index": index
             }
-        except subprocess.CalledProcessError as e:
+        except Exception as e:
             return {
                 "device_ip": device_ip,
                 "success": False,
-                "message": (
-                    f"Failed to pull ANR files.\nCommand: {' '.join(e.cmd)}\n"
-                    f"Return code: {e.returncode}\nError output:\n{e.output.strip()}"
-                ),
+                "message": f"Failed to pull ANR files.\nError output:\n{str(e).strip()}",
                 "index": index
             }
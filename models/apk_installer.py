@@ -0,0 +1,479 @@
+import hashlib
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from models.compressed_transfer import MODE_GZIP, MODE_NONE, CompressedTransfer, is_compressible
+from models.shell_batch import ShellBatch
+from models.transfer_scheduler import TransferScheduler
+from utils.adb_utils import NO_WINDOW
+from utils.apk_parser import ApkInfo, central_directory_digest, parse_apk
+
+STAGING_DIR = "/data/local/tmp/adblab_stage"
+# 设备端暂存区的字节预算，超出时从最旧的开始删除（本次安装用到的文件总会保留）
+STAGING_BUDGET = 1 << 30
+# 暂存前要求 /data/local/tmp 在写入后仍保留的空闲空间
+STAGING_FREE_MARGIN = 64 << 20
+PART_MAX_AGE_MIN = 60  # 中断传输留下的 .part 文件保留时间
+BUNDLE_EXTENSIONS = (".apks", ".xapk")
+BUNDLE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "adblab_bundles")
+
+# 超时按 大小 / 预估吞吐 计算，未测量过的设备按保守值估算
+DEFAULT_THROUGHPUT = 1 << 20  # 1 MB/s
+MIN_THROUGHPUT = 128 << 10    # 估算吞吐下限
+TIMEOUT_BASE = 30
+TIMEOUT_FACTOR = 3            # 允许实际吞吐比预估慢 3 倍
+# 会话写入与提交是设备本地操作，按 4 MB/s 估算，另留 dexopt 时间
+COMMIT_TIMEOUT_BASE = 120
+COMMIT_THROUGHPUT = 4 << 20
+STREAM_CHUNK = 1 << 20
+PARALLEL_WRITES = 3
+
+_bundle_lock = threading.Lock()
+# 只认拆分包的标准命名（split_config.<abi>.apk，XAPK 中为 config.<abi>.apk），普通文件名里出现 ABI 字样不算
+_ABI_SPLIT_RE = re.compile(r"^(?:split_)?config\.(arm64_v8a|armeabi_v7a|armeabi|x86_64|x86|mips64|mips)\.apk$",
+                           re.IGNORECASE)
+
+ProgressCallback = Callable[[dict], None]
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def expand_package_files(paths: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    把用户选择的文件展开为 (APK 列表, OBB 列表)
+    - 单个或多个 .apk：作为同一个应用的拆分包
+    - .apks（bundletool 输出）：取 splits/ 下全部 APK，没有则取 standalones/
+    - .xapk：取根目录 APK 与其中的 OBB 数据包
+    包文件按中央目录摘要解压到临时目录并复用
+    """
+    apks, obbs = [], []
+    for path in paths:
+        if not path.lower().endswith(BUNDLE_EXTENSIONS):
+            apks.append(path)
+            continue
+        target = os.path.join(BUNDLE_CACHE_DIR, central_directory_digest(path))
+        with _bundle_lock, zipfile.ZipFile(path) as bundle:
+            names = [n for n in bundle.namelist() if not n.endswith("/")]
+            wanted = [n for n in names if n.startswith("splits/") and n.endswith(".apk")]
+            if not wanted:
+                wanted = [n for n in names if n.startswith("standalones/") and n.endswith(".apk")][:1]
+            if not wanted:
+                wanted = [n for n in names if "/" not in n and n.endswith(".apk")]
+            for name in wanted + [n for n in names if n.lower().endswith(".obb")]:
+                extracted = os.path.join(target, *name.split("/"))
+                if not os.path.exists(extracted):
+                    bundle.extract(name, target)
+                (obbs if name.lower().endswith(".obb") else apks).append(extracted)
+    if not apks:
+        raise ValueError("No APK found in selection")
+    return apks, obbs
+
+
+def parse_df_free(output: str) -> Optional[int]:
+    """
+    解析 df 输出中的可用字节数，无法识别时返回 None
+    toybox: "Filesystem 1K-blocks Used Available Use% Mounted on"；旧版 toolbox: "Filesystem Size Used Free Blksize"（带 K/M/G 单位）
+    """
+    lines = [line.split() for line in output.strip().splitlines() if line.strip()]
+    if len(lines) < 2:
+        return None
+    header, values = lines[0], lines[-1]
+    column = next((header.index(name) for name in ("Available", "Avail", "Free") if name in header), None)
+    if column is None or column >= len(values):
+        return None
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([KMG]?)", values[column])
+    if not match:
+        return None
+    number, unit = match.groups()
+    if not unit:
+        return int(number) * 1024 if "1K-blocks" in header else int(number)
+    return int(float(number) * {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}[unit])
+
+
+def parse_staged_listing(output: str) -> List[Tuple[str, int]]:
+    """解析暂存目录的 ls -lt 输出，返回按新到旧排列的 (设备端路径, 字节数)；toybox / toolbox 的大小都在倒数第 4 列"""
+    files = []
+    for line in output.splitlines():
+        tokens = line.split()
+        if len(tokens) >= 5 and tokens[-1].endswith(".apk") and tokens[-4].isdigit():
+            files.append((f"{STAGING_DIR}/{os.path.basename(tokens[-1])}", int(tokens[-4])))
+    return files
+
+
+def select_evictions(cached: List[Tuple[str, int]], keep: Set[str], incoming: int,
+                     budget: int = STAGING_BUDGET) -> List[Tuple[str, int]]:
+    """保留本次用到的文件，其余按新到旧累加，超出字节预算的部分返回待删除"""
+    used = incoming + sum(size for path, size in cached if path in keep)
+    evicted = []
+    for path, size in cached:
+        if path in keep:
+            continue
+        if used + size <= budget:
+            used += size
+        else:
+            evicted.append((path, size))
+    return evicted
+
+
+def filter_abi_splits(apks: List[str], device_abis: List[str]) -> List[str]:
+    """去掉设备不支持的 ABI 拆分包（只判断 split_config.<abi>.apk / config.<abi>.apk）"""
+    if not device_abis:
+        return apks
+    supported = {abi.replace("-", "_").lower() for abi in device_abis}
+    kept = []
+    for path in apks:
+        match = _ABI_SPLIT_RE.match(os.path.basename(path))
+        if match and match.group(1).lower() not in supported:
+            continue
+        kept.append(path)
+    return kept
+
+
+class ApkInstaller:
+    """
+    去重安装
+    - 设备上已安装相同 versionCode 且 base.apk 的 SHA-256 一致时直接跳过
+    - APK 按哈希暂存到 /data/local/tmp，卸载或清数据后重装无需再次传输
+    - 新文件通过 exec-in 流式写入暂存区，多个拆分包并行传输，实时上报进度
+    - 安装使用 pm install-create / install-write / install-commit 会话，
+      整个会话在一次 shell 调用中完成，支持拆分包、.apks 与 .xapk
+    - 超时按文件大小与该设备实测吞吐计算
+    - 链路基准测试选中压缩时，exec-in 写入走 gzip，adb push 走 -z <algo>
+    """
+
+    def __init__(self, scheduler: TransferScheduler = None, compression: CompressedTransfer = None):
+        self.scheduler = scheduler or TransferScheduler()
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._path_locks: Dict[str, threading.Lock] = {}
+        # 路径 -> (mtime, size, sha256)
+        self._digests: Dict[str, Tuple[float, int, str]] = {}
+        # 设备 -> 实测吞吐（字节/秒，指数滑动平均）
+        self._throughput: Dict[str, float] = {}
+        self._exec_in_supported: Dict[str, bool] = {}
+
+    def local_digest(self, path: str) -> str:
+        """本地 APK 的 SHA-256，按 (mtime, size) 缓存，多台设备并发安装时只计算一次"""
+        stat = os.stat(path)
+        with self._lock:
+            path_lock = self._path_locks.setdefault(path, threading.Lock())
+        with path_lock:
+            cached = self._digests.get(path)
+            if cached and cached[:2] == (stat.st_mtime, stat.st_size):
+                return cached[2]
+            digest = file_sha256(path)
+            self._digests[path] = (stat.st_mtime, stat.st_size, digest)
+            return digest
+
+    @staticmethod
+    def staged_path(digest: str) -> str:
+        return f"{STAGING_DIR}/{digest[:32]}.apk"
+
+    # ----- 吞吐与超时 -----
+    def throughput(self, device_ip: str) -> float:
+        with self._lock:
+            return self._throughput.get(device_ip, DEFAULT_THROUGHPUT)
+
+    def record_throughput(self, device_ip: str, size: int, seconds: float) -> None:
+        if size < (256 << 10) or seconds <= 0:
+            return  # 小文件主要受往返延迟影响，不参与估算
+        rate = size / seconds
+        with self._lock:
+            previous = self._throughput.get(device_ip)
+            self._throughput[device_ip] = rate if previous is None else previous * 0.7 + rate * 0.3
+
+    def transfer_timeout(self, device_ip: str, size: int) -> int:
+        rate = max(self.throughput(device_ip), MIN_THROUGHPUT)
+        return int(TIMEOUT_BASE + TIMEOUT_FACTOR * size / rate)
+
+    # ----- 设备状态 -----
+    def probe(self, device_ip: str, info: ApkInfo, digests: List[str]) -> dict:
+        """
+        一次往返获取：已安装 versionCode、（版本一致时）base.apk 哈希、设备 ABI、哪些文件已暂存
+        版本不一致时不在设备端计算哈希，避免无谓地读取整个 APK
+        """
+        package = info.package
+        batch = ShellBatch(device_ip)
+        batch.add("version", f"vc=$(dumpsys package {package} | grep -m1 -o 'versionCode=[0-9]*' | cut -d= -f2); echo $vc")
+        batch.add("sha", (
+            f"if [ \"$vc\" = \"{info.version_code}\" ]; then "
+            f"p=$(pm path {package} | grep -m1 'base.apk' | cut -d: -f2); [ -n \"$p\" ] || p=$(pm path {package} | head -n1 | cut -d: -f2); "
+            f"[ -n \"$p\" ] && (sha256sum \"$p\" 2>/dev/null || toybox sha256sum \"$p\") | cut -d' ' -f1; fi"
+        ))
+        batch.add("abi", "getprop ro.product.cpu.abilist; getprop ro.product.cpu.abi")
+        batch.add("staged", f"mkdir -p {STAGING_DIR}; for f in "
+                            + " ".join(self.staged_path(d) for d in digests)
+                            + "; do [ -f $f ] && echo $f; done")
+        batch.add("cache", f"ls -lt {STAGING_DIR} 2>/dev/null")
+        batch.add("free", f"df {STAGING_DIR} 2>/dev/null")
+        steps = batch.run(timeout=120)
+
+        version = steps["version"].output if "version" in steps else ""
+        abi_output = steps["abi"].output if "abi" in steps else ""
+        return {
+            "installed_version": int(version) if version.isdigit() else None,
+            "installed_sha256": steps["sha"].output.strip() if "sha" in steps else "",
+            "abis": [a for a in re.split(r"[,\s]+", abi_output) if a],
+            "staged": set(steps["staged"].output.split()) if "staged" in steps else set(),
+            "cache": parse_staged_listing(steps["cache"].output) if "cache" in steps else [],
+            "free": parse_df_free(steps["free"].output) if "free" in steps else None,
+        }
+
+    # ----- 传输 -----
+    def _mode(self, device_ip: str, local_path: str) -> str:
+        """APK 等本身已压缩的文件不走压缩，只有可压缩的文件才使用链路协商的模式"""
+        if not self.compression or not is_compressible(local_path):
+            return MODE_NONE
+        return self.compression.mode_for(device_ip)
+
+    def _push(self, device_ip: str, local_path: str, remote_path: str, timeout: int) -> None:
+        mode = self._mode(device_ip, local_path)
+        compress = ["-z", mode[5:]] if mode.startswith("sync-") else []
+        result = subprocess.run(
+            ["adb", "-s", device_ip, "push", *compress, local_path, remote_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+            timeout=timeout,
+            creationflags=NO_WINDOW
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stdout.strip() or f"adb push exit code {result.returncode}")
+
+    def _stream(self, device_ip: str, local_path: str, remote_path: str, timeout: int,
+                progress: Callable[[int], None]) -> None:
+        """
+        通过 exec-in 把文件写入设备端 stdin，超时由看门狗计时器强制结束
+        链路选中 gzip 时在主机端压缩、设备端解压，进度按原始字节上报
+        """
+        encoder = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if self._mode(device_ip, local_path) == MODE_GZIP else None
+        proc = subprocess.Popen(
+            ["adb", "-s", device_ip, "exec-in", f"gzip -d > {remote_path}" if encoder else f"cat > {remote_path}"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            creationflags=NO_WINDOW
+        )
+        watchdog = threading.Timer(timeout, proc.kill)
+        watchdog.start()
+        try:
+            with open(local_path, "rb") as f:
+                for chunk in iter(lambda: f.read(STREAM_CHUNK), b""):
+                    proc.stdin.write(encoder.compress(chunk) if encoder else chunk)
+                    progress(len(chunk))
+                if encoder:
+                    proc.stdin.write(encoder.flush())
+            proc.stdin.close()
+            output = proc.stdout.read().decode("utf-8", errors="ignore").strip()
+            code = proc.wait()
+        except OSError as e:
+            proc.kill()
+            proc.wait()
+            if not watchdog.is_alive():
+                raise TimeoutError(f"Transfer exceeded {timeout}s")
+            raise RuntimeError(f"Stream to {remote_path} interrupted: {e}")
+        finally:
+            timed_out = not watchdog.is_alive()
+            watchdog.cancel()
+        if timed_out:
+            raise TimeoutError(f"Transfer exceeded {timeout}s")
+        if code != 0:
+            raise RuntimeError(output or f"adb exec-in exit code {code}")
+
+    @staticmethod
+    def _make_room(device_ip: str, state: dict, keep: Set[str], evicted: List[Tuple[str, int]],
+                   total: int) -> List[Tuple[str, int]]:
+        """
+        空闲空间不够写入本次的文件时，先删除超预算的旧文件，仍不够再删除其余暂存文件；
+        都删掉仍不够则报错，不开始传输。返回暂存结束后仍需删除的文件
+        """
+        needed = total + STAGING_FREE_MARGIN - state["free"]
+        others = [item for item in state["cache"] if item[0] not in keep and item not in evicted]
+        # 先删超预算的，再从最旧的开始删其余文件
+        candidates = evicted + list(reversed(others))
+        removing, freed = [], 0
+        for path, size in candidates:
+            if freed >= needed:
+                break
+            removing.append(path)
+            freed += size
+        if freed < needed:
+            raise RuntimeError(f"Not enough space in {STAGING_DIR}: need {total / (1 << 20):.0f} MB, "
+                               f"{state['free'] / (1 << 20):.0f} MB free")
+        ShellBatch(device_ip).add("evict", f"rm -f {' '.join(removing)}").run(timeout=30)
+        return [item for item in evicted if item[0] not in removing]
+
+    def stage_file(self, device_ip: str, local_path: str, remote_path: str,
+                   progress: Callable[[int], None] = None, on_wait: Callable[[str], None] = None) -> float:
+        """
+        把文件写入设备暂存区的 .part 文件（由安装脚本重命名），返回耗时
+        传输前先向调度器申请所在链路的名额，避免同一 AP/Hub 上的传输互相挤占超时
+        设备首次 exec-in 失败（Android 5 之前不支持）时回退到 adb push 并记住
+        """
+        size = os.path.getsize(local_path)
+        timeout = self.transfer_timeout(device_ip, size)
+        self._mode(device_ip, local_path)  # 链路首次使用时的压缩基准测试放在申请名额之前，不占用传输名额
+        with self.scheduler.slot(device_ip, size, timeout, on_wait) as ticket:
+            def on_chunk(sent: int):
+                self.scheduler.update(ticket, sent)
+                if progress:
+                    progress(sent)
+            return self._stage_file(device_ip, local_path, remote_path, size, timeout, on_chunk)
+
+    def _stage_file(self, device_ip: str, local_path: str, remote_path: str, size: int, timeout: int,
+                    progress: Callable[[int], None]) -> float:
+        partial = f"{remote_path}.part"
+        start = time.perf_counter()
+        supported = self._exec_in_supported.get(device_ip)
+        if supported is False:
+            self._push(device_ip, local_path, partial, timeout)
+            progress(size)
+        else:
+            try:
+                self._stream(device_ip, local_path, partial, timeout, progress)
+                self._exec_in_supported[device_ip] = True
+            except RuntimeError:
+                if supported:
+                    raise
+                self._exec_in_supported[device_ip] = False
+                self._push(device_ip, local_path, partial, timeout)
+                progress(size)
+        elapsed = time.perf_counter() - start
+        self.record_throughput(device_ip, size, elapsed)
+        if self.compression:
+            mode = self._mode(device_ip, local_path)
+            if mode == MODE_GZIP and not self._exec_in_supported.get(device_ip):
+                mode = MODE_NONE  # 回退到 adb push 时不经过 gzip
+            self.compression.record(device_ip, mode, size, elapsed)
+        return elapsed
+
+    # ----- 安装 -----
+    def install(self, device_ip: str, paths, force: bool = False, progress: ProgressCallback = None) -> dict:
+        """
+        安装单个 APK、多个拆分 APK 或 .apks/.xapk 包
+        返回字典中 action 为 skipped / staged / pushed
+        """
+        start = time.perf_counter()
+        progress = progress or (lambda event: None)
+        apks, obbs = expand_package_files([paths] if isinstance(paths, str) else list(paths))
+        infos = {path: parse_apk(path) for path in apks}
+        base = next((p for p in apks if not infos[p].split), apks[0])
+        info = infos[base]
+        digests = {path: self.local_digest(path) for path in apks}
+        state = self.probe(device_ip, info, list(digests.values()))
+
+        result = {
+            "package_name": info.package,
+            "version_code": info.version_code,
+            "sha256": digests[base],
+            "installed_version": state["installed_version"],
+            "splits": len(apks),
+        }
+        if not force and state["installed_version"] == info.version_code and state["installed_sha256"] == digests[base]:
+            result.update({"action": "skipped", "output": f"{info.package} {info.version_name} ({info.version_code}) already installed",
+                           "elapsed": round(time.perf_counter() - start, 2)})
+            return result
+
+        if len(apks) > 1:
+            apks = filter_abi_splits(apks, state["abis"])
+        staged = {path: self.staged_path(digests[path]) for path in apks}
+        missing = [path for path in apks if staged[path] not in state["staged"]]
+
+        total = sum(os.path.getsize(p) for p in missing)
+        evicted = select_evictions(state["cache"], set(staged.values()), total)
+        if missing and state["free"] is not None and state["free"] < total + STAGING_FREE_MARGIN:
+            evicted = self._make_room(device_ip, state, set(staged.values()), evicted, total)
+        sent = [0]
+        sent_lock = threading.Lock()
+        last_report = [0.0]
+        transfer_start = time.perf_counter()
+
+        def on_chunk(size: int):
+            """并行写入的进度汇总，最多每秒上报一次"""
+            with sent_lock:
+                sent[0] += size
+                now = time.perf_counter()
+                if now - last_report[0] < 1.0 and sent[0] < total:
+                    return
+                last_report[0] = now
+                done = sent[0]
+            rate = done / max(now - transfer_start, 1e-6)
+            progress({"sent": done, "total": total, "rate": rate,
+                      "eta": (total - done) / rate if rate > 0 else 0,
+                      "link": self.scheduler.link_of(device_ip)})
+
+        waiting = [False]
+
+        def on_wait(link: str):
+            """链路已满需要排队时通知一次"""
+            if not waiting[0]:
+                waiting[0] = True
+                progress({"queued": True, "link": link, "sent": 0, "total": total})
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(PARALLEL_WRITES, len(missing))) as pool:
+                futures = [pool.submit(self.stage_file, device_ip, p, staged[p], on_chunk, on_wait) for p in missing]
+                for future in futures:
+                    future.result()
+            if len(missing) > 1:
+                self.record_throughput(device_ip, total, time.perf_counter() - transfer_start)
+
+        # 会话安装：重命名暂存文件、创建会话、写入各拆分、提交，在同一次 shell 调用中完成
+        batch = ShellBatch(device_ip)
+        for path in missing:
+            batch.add(f"commit-{digests[path][:8]}", f"mv {staged[path]}.part {staged[path]}", stop_on_error=True)
+        session_size = sum(os.path.getsize(p) for p in apks)
+        batch.add("create", f"sid=$(pm install-create -r -t -S {session_size} | grep -o '[0-9][0-9]*' | head -n1); "
+                            f"echo $sid; [ -n \"$sid\" ]", stop_on_error=True)
+        for i, path in enumerate(apks):
+            batch.add(f"write-{i}", f"touch {staged[path]}; "
+                                    f"pm install-write -S {os.path.getsize(path)} $sid split_{i}.apk {staged[path]}",
+                      stop_on_error=True)
+        batch.add("install", "pm install-commit $sid || { pm install-abandon $sid; false; }")
+        # 只删除探测时列出的超预算旧文件；其它安装可能正在写自己的 .part，只清理超过 PART_MAX_AGE_MIN 分钟未更新的残留
+        remove = f"rm -f {' '.join(path for path, _ in evicted)}; " if evicted else ""
+        batch.add("prune", f"{remove}find {STAGING_DIR} -name '*.part' -mmin +{PART_MAX_AGE_MIN} "
+                           f"-exec rm -f {{}} + 2>/dev/null; true")
+        steps = batch.run(timeout=COMMIT_TIMEOUT_BASE + session_size // COMMIT_THROUGHPUT)
+
+        install = steps.get("install")
+        if install is None or "Success" not in install.output:
+            if install is None and "create" in steps and steps["create"].ok:
+                ShellBatch(device_ip).add("abandon", f"pm install-abandon {steps['create'].output}").run(timeout=15)
+            failed = [s for s in steps.values() if not s.ok]
+            error = install.output if install else "; ".join(f"{s.name}: {s.output}" for s in failed)
+            raise RuntimeError(error or "pm install failed")
+
+        for obb in obbs:
+            obb_dir = f"/sdcard/Android/obb/{info.package}"
+            size = os.path.getsize(obb)
+            timeout = self.transfer_timeout(device_ip, size)
+            ShellBatch(device_ip).add("mkdir", f"mkdir -p {obb_dir}").run(timeout=15)
+            with self.scheduler.slot(device_ip, size, timeout) as ticket:
+                self._push(device_ip, obb, f"{obb_dir}/{os.path.basename(obb)}", timeout)
+                self.scheduler.update(ticket, size)
+
+        result.update({
+            "action": "pushed" if missing else "staged",
+            "output": install.output,
+            "transferred": total,
+            "throughput": round(self.throughput(device_ip) / (1 << 20), 2),
+            "elapsed": round(time.perf_counter() - start, 2),
+        })
+        return result
@@ -0,0 +1,200 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.apk_parser import ApkInfo, parse_apk
+from utils.yaml_tool import YamlTool
+
+LIBRARY_FILE = os.path.join("resources", "apk_library.yaml")
+
+
+def _parse_entry(path: str) -> Tuple[str, Optional[ApkInfo], str]:
+    """线程池中执行的解析任务"""
+    try:
+        return path, parse_apk(path, use_cache=False), ""
+    except Exception as e:
+        return path, None, str(e)
+
+
+class ApkLibrary:
+    """
+    构建目录 APK 索引
+    - 后台线程定期扫描目录，只有 (mtime, size) 变化的文件才会重新解析
+    - 解析在线程池中进行（主要是 zlib / struct / 文件 IO）；打包后的 exe 中使用进程池会重新启动入口程序
+    - 索引持久化到 resources/apk_library.yaml，重启后无需重新解析
+    """
+
+    def __init__(self, store_path: str = LIBRARY_FILE, poll_interval: float = 15.0,
+                 workers: int = None, on_updated: Callable[[int, int], None] = None):
+        self.store_path = store_path
+        self.poll_interval = poll_interval
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.on_updated = on_updated or (lambda added, failed: None)
+
+        self._lock = threading.Lock()
+        self._scan_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.directories: List[str] = []
+        # 路径 -> (mtime, size, ApkInfo)
+        self._entries: Dict[str, Tuple[float, int, ApkInfo]] = {}
+        # 路径 -> 小写检索串，搜索时只做子串匹配
+        self._search_keys: Dict[str, str] = {}
+        self._failed: Dict[str, Tuple[float, int]] = {}
+        self._load()
+
+    # ----- 持久化 -----
+    def _load(self) -> None:
+        data = YamlTool.load_yaml(self.store_path)
+        self.directories = [d for d in data.get("directories", []) if isinstance(d, str)]
+        for path, entry in (data.get("entries") or {}).items():
+            try:
+                info = ApkInfo(**entry["info"])
+                self._index(path, float(entry["mtime"]), int(entry["size"]), info)
+            except Exception:
+                continue
+
+    def save(self) -> None:
+        with self._lock:
+            entries = {
+                path: {"mtime": mtime, "size": size, "info": asdict(info)}
+                for path, (mtime, size, info) in self._entries.items()
+            }
+            directories = list(self.directories)
+        YamlTool.write_yaml(self.store_path, {"directories": directories, "entries": entries})
+
+    def _index(self, path: str, mtime: float, size: int, info: ApkInfo) -> None:
+        key = " ".join([
+            os.path.basename(path), info.package, info.label, info.version_name,
+            str(info.version_code), " ".join(info.native_abis),
+        ]).lower()
+        with self._lock:
+            self._entries[path] = (mtime, size, info)
+            self._search_keys[path] = key
+
+    # ----- 目录管理 -----
+    def add_directory(self, directory: str) -> None:
+        directory = os.path.normpath(directory)
+        with self._lock:
+            if directory in self.directories:
+                return
+            self.directories.append(directory)
+        self.save()
+        threading.Thread(target=self.scan, daemon=True).start()
+
+    def remove_directory(self, directory: str) -> None:
+        directory = os.path.normpath(directory)
+        with self._lock:
+            if directory in self.directories:
+                self.directories.remove(directory)
+            prefix = directory + os.sep
+            for path in [p for p in self._entries if p.startswith(prefix)]:
+                self._entries.pop(path, None)
+                self._search_keys.pop(path, None)
+        self.save()
+
+    # ----- 扫描 -----
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _poll_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.scan()
+            except Exception:
+                pass
+            self._stop.wait(self.poll_interval)
+
+    def _list_files(self) -> Dict[str, Tuple[float, int]]:
+        found = {}
+        with self._lock:
+            directories = list(self.directories)
+        for directory in directories:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if not name.lower().endswith(".apk"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    found[path] = (stat.st_mtime, stat.st_size)
+        return found
+
+    def scan(self) -> Tuple[int, int]:
+        """扫描一次目录，返回 (新增/更新数, 失败数)"""
+        with self._scan_lock:
+            found = self._list_files()
+            with self._lock:
+                removed = [p for p in self._entries if p not in found]
+                for path in removed:
+                    self._entries.pop(path, None)
+                    self._search_keys.pop(path, None)
+                pending = [
+                    path for path, stamp in found.items()
+                    if self._entries.get(path, (None, None))[:2] != stamp and self._failed.get(path) != stamp
+                ]
+
+            added = failed = 0
+            if pending:
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                    for path, info, error in pool.map(_parse_entry, pending):
+                        mtime, size = found[path]
+                        if info is None:
+                            self._failed[path] = (mtime, size)
+                            failed += 1
+                            continue
+                        self._index(path, mtime, size, info)
+                        added += 1
+            if pending or removed:
+                self.save()
+                self.on_updated(added, failed)
+            return added, failed
+
+    # ----- 查询 -----
+    def get(self, path: str) -> Optional[ApkInfo]:
+        """返回已索引且文件未变化的解析结果，否则返回 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(os.path.normpath(path)) or self._entries.get(path)
+        if entry and entry[0] == stat.st_mtime and entry[1] == stat.st_size:
+            return entry[2]
+        return None
+
+    def modified(self, path: str) -> Optional[float]:
+        """索引中记录的文件修改时间（不访问文件系统）"""
+        with self._lock:
+            entry = self._entries.get(path)
+        return entry[0] if entry else None
+
+    def search(self, query: str = "", limit: int = 500) -> List[ApkInfo]:
+        """
+        按包名、应用名、版本号、ABI 或文件名检索，多个关键词取交集
+        结果按文件修改时间倒序，最新构建在前
+        """
+        tokens = query.lower().split()
+        with self._lock:
+            matched = [
+                (self._entries[path][0], self._entries[path][2])
+                for path, key in self._search_keys.items()
+                if all(token in key for token in tokens)
+            ]
+        matched.sort(key=lambda item: item[0], reverse=True)
+        return [info for _, info in matched[:limit]]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,206 @@
+import gzip
+import os
+import re
+import shutil
+import subprocess
+import tarfile
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import List
+
+from models.compressed_transfer import TAR_ERROR_PATH, CompressedTransfer, read_remote_errors
+from models.shell_batch import ShellBatch
+from utils.adb_utils import NO_WINDOW
+from utils.yaml_tool import YamlTool
+
+SNAPSHOT_DIR = os.path.join("resources", "snapshots")
+# 不进入快照的目录：lib 是指向安装目录的符号链接，cache 类目录可随时重建
+EXCLUDED_ENTRIES = ("lib", "cache", "code_cache")
+STREAM_CHUNK = 1 << 20
+SNAPSHOT_TIMEOUT = 600
+# 解包先写入数据目录下的临时目录，成功后才替换原数据
+RESTORE_STAGING = ".adblab_restore"
+
+# exec-out / exec-in 不回传设备端退出码，由脚本自己输出
+_RC_RE = re.compile(r"__RC=(\d+)")
+
+
+class AppSnapshotter:
+    """
+    应用数据快照与恢复
+    - debuggable 构建用 run-as <pkg> 读写 /data/data/<pkg>，否则尝试 su 0（root 设备）
+    - 快照在设备端 tar（有 gzip 时同时压缩）后经 exec-out 流式写入本地 .tar.gz，附带 .yaml 元数据；
+      tar 的报错与退出码写入设备端临时文件，校验通过且本地归档完整才写元数据
+    - 恢复时经 exec-in 流式写回，先解包到临时目录，成功后才替换原数据；多台设备由调用方并行执行，共享链路准入
+    """
+
+    def __init__(self, transfer: CompressedTransfer = None):
+        self.transfer = transfer or CompressedTransfer()
+
+    @staticmethod
+    def _access_batch(device_ip: str, package_name: str) -> ShellBatch:
+        """一次往返：停止应用、判断读写方式、读取版本号"""
+        batch = ShellBatch(device_ip)
+        batch.add("stop", f"am force-stop {package_name}")
+        batch.add("access", f"if run-as {package_name} true >/dev/null 2>&1; then echo run-as; "
+                            f"elif su 0 true >/dev/null 2>&1; then echo su; fi")
+        batch.add("version", f"dumpsys package {package_name} | grep -m1 -o 'versionCode=[0-9]*' | cut -d= -f2")
+        return batch
+
+    @staticmethod
+    def _wrap(access: str, package_name: str, script: str) -> str:
+        """在应用数据目录中以应用身份（或 root）执行脚本"""
+        if access == "run-as":
+            return f"run-as {package_name} sh -c '{script}'"
+        return f"su 0 sh -c 'cd /data/data/{package_name} && {script}'"
+
+    @staticmethod
+    def list_snapshots(package_name: str, directory: str = SNAPSHOT_DIR) -> List[str]:
+        folder = os.path.join(directory, package_name)
+        if not os.path.isdir(folder):
+            return []
+        names = [f for f in os.listdir(folder) if f.endswith(".tar.gz")]
+        return sorted((os.path.join(folder, f) for f in names), key=os.path.getmtime, reverse=True)
+
+    def snapshot(self, device_ip: str, package_name: str, directory: str = SNAPSHOT_DIR) -> dict:
+        start = time.perf_counter()
+        steps = self._access_batch(device_ip, package_name).run(timeout=30)
+        access = steps["access"].output.strip() if "access" in steps else ""
+        if not access:
+            raise RuntimeError(f"{package_name} is not debuggable and the device has no root (run-as / su unavailable)")
+        version = steps["version"].output.strip() if "version" in steps else ""
+
+        excluded = " ".join(f"-e {name}" for name in EXCLUDED_ENTRIES)
+        script = f"tar -cf - $(ls -A | grep -v -x {excluded})"
+        compressed = self.transfer.capabilities(device_ip)["gzip"]
+        # stderr 不能混进归档字节流；run-as 下应用身份无权写 /data/local/tmp，由外层 shell 重定向
+        error_path = TAR_ERROR_PATH.format(time.time_ns())
+        command = (f"{{ {self._wrap(access, package_name, script)} 2>{error_path}; echo \"__RC=$?\" >>{error_path}; }}"
+                   + (" | gzip -1" if compressed else ""))
+
+        name = f"{package_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        folder = os.path.join(directory, package_name)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{name}.tar.gz")
+
+        proc = subprocess.Popen(
+            ["adb", "-s", device_ip, "exec-out", command],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            creationflags=NO_WINDOW
+        )
+        watchdog = threading.Timer(SNAPSHOT_TIMEOUT, proc.kill)
+        watchdog.start()
+        try:
+            # 设备端已压缩时原样落盘，否则在本地压缩
+            with open(path, "wb") if compressed else gzip.open(path, "wb", compresslevel=1) as f:
+                shutil.copyfileobj(proc.stdout, f, STREAM_CHUNK)
+            code = proc.wait()
+        finally:
+            timed_out = not watchdog.is_alive()
+            watchdog.cancel()
+            errors = read_remote_errors(device_ip, error_path)
+        size = os.path.getsize(path)
+        rc = _RC_RE.search(errors)
+        message = _RC_RE.sub("", errors).strip()
+        error = ""
+        if timed_out:
+            error = "Snapshot stream timed out"
+        elif code != 0:
+            error = f"Snapshot stream failed (adb exit code {code})"
+        elif rc is None or rc.group(1) != "0":
+            error = f"tar failed on device (exit code {rc.group(1) if rc else 'unknown'})" + (f": {message}" if message else "")
+        else:
+            error = self._verify_archive(path)
+        if error:
+            os.remove(path)
+            raise RuntimeError(error)
+
+        YamlTool.write_yaml(os.path.join(folder, f"{name}.yaml"), {
+            "package": package_name,
+            "version_code": version,
+            "source_device": device_ip,
+            "access": access,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "size": size,
+        })
+        return {"path": path, "package_name": package_name, "version_code": version, "access": access,
+                "size": size, "elapsed": round(time.perf_counter() - start, 2)}
+
+    @staticmethod
+    def _verify_archive(path: str) -> str:
+        """完整读一遍本地归档，返回错误信息（完好时为空）"""
+        try:
+            with tarfile.open(path, "r:gz") as archive:
+                for _ in archive:
+                    pass
+        except (tarfile.TarError, EOFError, OSError, zlib.error) as e:
+            return f"Snapshot archive is corrupt: {e}"
+        return ""
+
+    def restore(self, device_ip: str, snapshot_path: str) -> dict:
+        start = time.perf_counter()
+        meta = YamlTool.load_yaml(os.path.splitext(os.path.splitext(snapshot_path)[0])[0] + ".yaml")
+        package_name = meta.get("package")
+        if not package_name:
+            raise ValueError(f"Missing snapshot metadata for {snapshot_path}")
+
+        steps = self._access_batch(device_ip, package_name).run(timeout=30)
+        access = steps["access"].output.strip() if "access" in steps else ""
+        if not access:
+            raise RuntimeError(f"{package_name} is not installed as a debuggable build and the device has no root")
+        version = steps["version"].output.strip() if "version" in steps else ""
+
+        # 先解包到临时目录，成功后再清空数据目录（保留 lib 链接）并移入；解包失败时原数据不动
+        # root 恢复时把属主与 SELinux 标签改回应用
+        staging = RESTORE_STAGING
+        script = (f"rm -rf {staging} && mkdir {staging} && tar -xf - -C {staging} && "
+                  f"for f in $(ls -A); do [ \"$f\" = lib ] || [ \"$f\" = {staging} ] || rm -rf \"$f\"; done && "
+                  f"for f in $(ls -A {staging}); do mv \"{staging}/$f\" . || exit 1; done && rmdir {staging} "
+                  f"|| {{ rm -rf {staging}; exit 1; }}")
+        if access == "su":
+            script += " && { chown -R $(stat -c %u:%g .) .; restorecon -R . 2>/dev/null; true; }"
+        compressed = self.transfer.capabilities(device_ip)["gzip"]
+        command = ("gzip -d | " if compressed else "") + self._wrap(access, package_name, script) + " 2>&1; echo \"__RC=$?\""
+
+        size = os.path.getsize(snapshot_path)
+        with self.transfer.scheduler.slot(device_ip, size, SNAPSHOT_TIMEOUT) as ticket:
+            proc = subprocess.Popen(
+                ["adb", "-s", device_ip, "exec-in", command],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                creationflags=NO_WINDOW
+            )
+            watchdog = threading.Timer(SNAPSHOT_TIMEOUT, proc.kill)
+            watchdog.start()
+            try:
+                with open(snapshot_path, "rb") if compressed else gzip.open(snapshot_path, "rb") as f:
+                    for chunk in iter(lambda: f.read(STREAM_CHUNK), b""):
+                        proc.stdin.write(chunk)
+                        self.transfer.scheduler.update(ticket, len(chunk))
+                proc.stdin.close()
+                output = proc.stdout.read().decode("utf-8", errors="ignore").strip()
+                code = proc.wait()
+            except OSError as e:
+                proc.kill()
+                proc.wait()
+                raise RuntimeError(f"Restore stream interrupted: {e}")
+            finally:
+                timed_out = not watchdog.is_alive()
+                watchdog.cancel()
+        if timed_out:
+            raise TimeoutError(f"Restore exceeded {SNAPSHOT_TIMEOUT}s")
+        rc = _RC_RE.search(output)
+        output = _RC_RE.sub("", output).strip()
+        if code != 0:
+            raise RuntimeError(output or f"adb exec-in exit code {code}")
+        if rc is None or rc.group(1) != "0":
+            raise RuntimeError(f"Restore failed on device (exit code {rc.group(1) if rc else 'unknown'})"
+                               + (f": {output}" if output else ""))
+
+        return {"path": snapshot_path, "package_name": package_name, "access": access, "size": size,
+                "version_code": version, "snapshot_version": str(meta.get("version_code", "")),
+                "output": output, "elapsed": round(time.perf_counter() - start, 2)}
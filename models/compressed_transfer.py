@@ -0,0 +1,303 @@
+import os
+import re
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from models.shell_batch import ShellBatch
+from models.transfer_scheduler import TransferScheduler
+from utils.adb_utils import NO_WINDOW
+
+MODE_NONE = "none"
+MODE_GZIP = "gzip"  # 设备端 gzip，经 exec-out / exec-in 管道传输，老设备也可用
+SYNC_ALGORITHMS = ("zstd", "lz4", "brotli")  # adb 同步协议压缩（push/pull -z），需要新版 adb 与设备同时支持
+
+# 同步协议压缩从 platform-tools 31 开始提供
+MIN_SYNC_COMPRESSION_ADB = 31
+BENCH_SIZE = 1 << 20
+BENCH_PATH = "/data/local/tmp/adblab_bench.txt"
+TAR_ERROR_PATH = "/data/local/tmp/adblab_tar_{}.err"
+STREAM_CHUNK = 1 << 16
+
+_ADB_VERSION_RE = re.compile(r"Version (\d+)\.")
+# 本身已压缩的格式，再压缩只耗 CPU 不省带宽（基准测试用的是 logcat 文本，不代表这些文件）
+_INCOMPRESSIBLE = (".apk", ".apks", ".xapk", ".apex", ".zip", ".jar", ".gz", ".tgz", ".zst", ".lz4", ".br", ".xz",
+                   ".png", ".jpg", ".jpeg", ".webp", ".mp4", ".mkv", ".webm", ".mp3", ".aac", ".ogg")
+
+
+def is_compressible(path: str) -> bool:
+    """按扩展名判断文件是否值得压缩传输"""
+    return not path.lower().endswith(_INCOMPRESSIBLE)
+
+
+def _run(command: List[str], timeout: int = 30) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        timeout=timeout,
+        creationflags=NO_WINDOW
+    )
+
+
+def read_remote_errors(device_ip: str, error_path: str) -> str:
+    """读回并删除设备端的报错文件"""
+    try:
+        result = _run(["adb", "-s", device_ip, "shell", f"cat {error_path} 2>/dev/null; rm -f {error_path}"])
+    except subprocess.TimeoutExpired:
+        return ""
+    return result.stdout.decode("utf-8", errors="ignore").strip()
+
+
+class CompressedTransfer:
+    """
+    按设备能力协商的压缩传输
+    - 能力探测：adb features 中的 sendrecv_v2_<algo>、主机 adb 版本、设备端 gzip/tar
+    - 每条链路首次使用时用一段真实 logcat 样本做基准测试，选出有效吞吐最高的方式
+    - 记录每台设备每种方式的有效吞吐（按解压后字节计算），便于对比压缩前后
+    """
+
+    def __init__(self, scheduler: TransferScheduler = None):
+        self.scheduler = scheduler or TransferScheduler()
+        self._lock = threading.Lock()
+        self._bench_lock = threading.Lock()
+        self._host_sync_compression: Optional[bool] = None
+        self._capabilities: Dict[str, dict] = {}
+        self._link_modes: Dict[str, str] = {}
+        # 设备 -> {方式: 有效吞吐（字节/秒）}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    # ----- 能力探测 -----
+    def _host_supports_sync_compression(self) -> bool:
+        if self._host_sync_compression is None:
+            try:
+                output = _run(["adb", "version"], timeout=10).stdout.decode("utf-8", errors="ignore")
+                match = _ADB_VERSION_RE.search(output)
+                self._host_sync_compression = bool(match and int(match.group(1)) >= MIN_SYNC_COMPRESSION_ADB)
+            except Exception:
+                self._host_sync_compression = False
+        return self._host_sync_compression
+
+    def capabilities(self, device_ip: str) -> dict:
+        with self._lock:
+            cached = self._capabilities.get(device_ip)
+        if cached is not None:
+            return cached
+
+        features = _run(["adb", "-s", device_ip, "features"], timeout=10).stdout.decode("utf-8", errors="ignore")
+        steps = ShellBatch(device_ip).add("tools", "command -v gzip >/dev/null && echo gzip; "
+                                                   "command -v tar >/dev/null && echo tar").run(timeout=15)
+        tools = steps["tools"].output.split() if "tools" in steps else []
+        sync = [algo for algo in SYNC_ALGORITHMS if f"sendrecv_v2_{algo}" in features] \
+            if self._host_supports_sync_compression() else []
+        capabilities = {"sync": sync, "gzip": "gzip" in tools, "tar": "tar" in tools}
+        with self._lock:
+            self._capabilities[device_ip] = capabilities
+        return capabilities
+
+    def candidate_modes(self, device_ip: str) -> List[str]:
+        capabilities = self.capabilities(device_ip)
+        modes = [MODE_NONE]
+        if capabilities["gzip"]:
+            modes.append(MODE_GZIP)
+        modes.extend(f"sync-{algo}" for algo in capabilities["sync"])
+        return modes
+
+    # ----- 统计 -----
+    def record(self, device_ip: str, mode: str, size: int, seconds: float) -> None:
+        if size <= 0 or seconds <= 0:
+            return
+        rate = size / seconds
+        with self._lock:
+            stats = self._stats.setdefault(device_ip, {})
+            previous = stats.get(mode)
+            stats[mode] = rate if previous is None else previous * 0.7 + rate * 0.3
+
+    def stats(self, device_ip: str) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stats.get(device_ip, {}))
+
+    def describe(self, device_ip: str, mode: str) -> str:
+        """压缩前后有效吞吐对比，例如 'gzip 3.1 MB/s (2.6x vs none)'"""
+        stats = self.stats(device_ip)
+        rate = stats.get(mode)
+        if rate is None:
+            return mode
+        text = f"{mode} {rate / (1 << 20):.2f} MB/s"
+        baseline = stats.get(MODE_NONE)
+        if baseline and mode != MODE_NONE:
+            text += f" ({rate / baseline:.1f}x vs none)"
+        return text
+
+    # ----- 基准测试 -----
+    def benchmark(self, device_ip: str) -> Dict[str, float]:
+        """在设备上生成 1MB logcat 样本，依次用各方式拉取并计时"""
+        ShellBatch(device_ip).add("sample", (
+            f"(logcat -d -v threadtime; dumpsys meminfo; logcat -d -b events) 2>/dev/null | head -c {BENCH_SIZE} > {BENCH_PATH}"
+        )).run(timeout=60)
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode in self.candidate_modes(device_ip):
+                target = os.path.join(tmp, mode)
+                start = time.perf_counter()
+                try:
+                    size = self._pull_file(device_ip, BENCH_PATH, target, mode, timeout=60)
+                except Exception:
+                    continue
+                elapsed = time.perf_counter() - start
+                self.record(device_ip, mode, size, elapsed)
+                results[mode] = size / elapsed if elapsed > 0 else 0.0
+        ShellBatch(device_ip).add("cleanup", f"rm -f {BENCH_PATH}").run(timeout=15)
+        return results
+
+    def mode_for(self, device_ip: str) -> str:
+        """返回该设备所在链路的最佳方式；链路首次使用时做一次基准测试"""
+        link = self.scheduler.link_of(device_ip)
+        with self._bench_lock:
+            mode = self._link_modes.get(link)
+            if mode is None:
+                results = self.benchmark(device_ip)
+                mode = max(results, key=results.get) if results else MODE_NONE
+                self._link_modes[link] = mode
+        # 同一链路上的设备能力可能不同，不支持时退回该设备可用的最佳方式
+        candidates = self.candidate_modes(device_ip)
+        if mode in candidates:
+            return mode
+        return MODE_GZIP if MODE_GZIP in candidates else MODE_NONE
+
+    # ----- 传输 -----
+    def _pull_file(self, device_ip: str, remote: str, local: str, mode: str, timeout: int) -> int:
+        if mode == MODE_GZIP:
+            return self._capture(device_ip, f"gzip -1 -c {remote}", local, compressed=True, timeout=timeout)
+        command = ["adb", "-s", device_ip, "pull"]
+        if mode.startswith("sync-"):
+            command += ["-z", mode[5:]]
+        result = _run(command + [remote, local], timeout=timeout)
+        if result.returncode != 0:
+            raise RuntimeError(result.stdout.decode("utf-8", errors="ignore").strip())
+        return os.path.getsize(local)
+
+    def _capture(self, device_ip: str, shell_command: str, local: str, compressed: bool, timeout: int) -> int:
+        """exec-out 流式读取命令输出写入本地文件，compressed 时边读边解压 gzip"""
+        proc = subprocess.Popen(
+            ["adb", "-s", device_ip, "exec-out", shell_command],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            creationflags=NO_WINDOW
+        )
+        watchdog = threading.Timer(timeout, proc.kill)
+        watchdog.start()
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if compressed else None
+        written = 0
+        try:
+            with open(local, "wb") as f:
+                for chunk in iter(lambda: proc.stdout.read(STREAM_CHUNK), b""):
+                    data = decoder.decompress(chunk) if decoder else chunk
+                    f.write(data)
+                    written += len(data)
+                if decoder:
+                    tail = decoder.flush()
+                    f.write(tail)
+                    written += len(tail)
+            code = proc.wait()
+        finally:
+            timed_out = not watchdog.is_alive()
+            watchdog.cancel()
+        if timed_out:
+            raise TimeoutError(f"Transfer exceeded {timeout}s")
+        if code != 0:
+            raise RuntimeError(f"adb exec-out exit code {code}")
+        return written
+
+    def capture_output(self, device_ip: str, shell_command: str, local: str, timeout: int = 300) -> dict:
+        """
+        把设备命令输出保存到本地（如 logcat -d），设备有 gzip 时在设备端压缩后传输
+        """
+        mode = MODE_GZIP if self.capabilities(device_ip)["gzip"] else MODE_NONE
+        command = f"{shell_command} | gzip -1" if mode == MODE_GZIP else shell_command
+        start = time.perf_counter()
+        size = self._capture(device_ip, command, local, compressed=mode == MODE_GZIP, timeout=timeout)
+        elapsed = time.perf_counter() - start
+        self.record(device_ip, mode, size, elapsed)
+        return {"mode": mode, "bytes": size, "elapsed": round(elapsed, 2), "summary": self.describe(device_ip, mode)}
+
+    def pull(self, device_ip: str, remote: str, local_dir: str, timeout: int = 600) -> dict:
+        """
+        拉取文件或目录到 local_dir
+        - 选中 gzip 且设备有 tar：tar | gzip 经 exec-out 传输，本地流式解包
+        - 选中同步压缩：adb pull -z <algo>
+        - 否则普通 adb pull
+        """
+        mode = self.mode_for(device_ip)
+        os.makedirs(local_dir, exist_ok=True)
+        start = time.perf_counter()
+        if mode == MODE_GZIP and self.capabilities(device_ip)["tar"]:
+            size = self._pull_tar(device_ip, remote, local_dir, timeout)
+        else:
+            if mode == MODE_GZIP:
+                mode = MODE_NONE
+            command = ["adb", "-s", device_ip, "pull"]
+            if mode.startswith("sync-"):
+                command += ["-z", mode[5:]]
+            result = _run(command + [remote, local_dir], timeout=timeout)
+            if result.returncode != 0:
+                raise RuntimeError(result.stdout.decode("utf-8", errors="ignore").strip())
+            size = sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, files in os.walk(os.path.join(local_dir, os.path.basename(remote.rstrip("/"))))
+                for name in files
+            ) or os.path.getsize(os.path.join(local_dir, os.path.basename(remote.rstrip("/"))))
+        elapsed = time.perf_counter() - start
+        self.record(device_ip, mode, size, elapsed)
+        return {"mode": mode, "bytes": size, "elapsed": round(elapsed, 2), "summary": self.describe(device_ip, mode)}
+
+    def _pull_tar(self, device_ip: str, remote: str, local_dir: str, timeout: int) -> int:
+        """
+        设备端 tar | gzip 经 exec-out 拉取目录
+        tar 的报错与退出码写入设备端临时文件，传输结束后读回；有任何报错即视为失败（与 adb pull 一致）
+        """
+        remote = remote.rstrip("/")
+        parent, name = os.path.dirname(remote) or "/", os.path.basename(remote)
+        error_path = TAR_ERROR_PATH.format(time.time_ns())
+        proc = subprocess.Popen(
+            ["adb", "-s", device_ip, "exec-out",
+             f"{{ tar -cf - -C {parent} {name} 2>{error_path} || echo \"tar exit code $?\" >>{error_path}; }} | gzip -1"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=NO_WINDOW
+        )
+        watchdog = threading.Timer(timeout, proc.kill)
+        watchdog.start()
+        size = 0
+        try:
+            with tarfile.open(fileobj=proc.stdout, mode="r|gz") as archive:
+                for member in archive:
+                    # 只解出普通文件与目录，防止路径穿越
+                    if not (member.isfile() or member.isdir()) or member.name.startswith(("/", "..")) or "/../" in member.name:
+                        continue
+                    if hasattr(tarfile, "data_filter"):
+                        archive.extract(member, local_dir, filter="data")
+                    else:
+                        archive.extract(member, local_dir)
+                    size += member.size
+            stderr = proc.stderr.read().decode("utf-8", errors="ignore").strip()
+            code = proc.wait()
+        except (tarfile.TarError, EOFError, OSError) as e:
+            proc.kill()
+            proc.wait()
+            if watchdog.is_alive():
+                raise RuntimeError(f"tar stream from {remote} broken: {e}")
+            code, stderr = None, ""
+        finally:
+            timed_out = not watchdog.is_alive()
+            watchdog.cancel()
+            errors = read_remote_errors(device_ip, error_path)
+        if timed_out:
+            raise TimeoutError(f"Transfer exceeded {timeout}s")
+        if code != 0 or errors:
+            raise RuntimeError(errors or stderr or f"adb exec-out exit code {code}")
+        return size
@@ -0,0 +1,345 @@
+import hashlib
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from models.device_clock import offset_at
+from models.log_timeline import DeviceLog, DeviceStream, discover_logs
+from utils.logcat_index import split_line
+
+JAVA_TAG = "AndroidRuntime"
+NATIVE_TAG = "DEBUG"   # crash_dump / debuggerd 输出的 tag
+SIGNATURE_FRAMES = 6   # 参与签名的栈帧数
+SAMPLE_LINES = 60      # 每个签名保留的首次崩溃原文行数
+TOMBSTONE_PATTERN = re.compile(r"^tombstone_\d+(\.txt)?$")
+# 同一次 native 崩溃会同时出现在 logcat（DEBUG）与 tombstone 中：同设备、同 PID、同信号且时间相差不超过该值视为同一次
+NATIVE_DEDUP_WINDOW = 60.0
+
+_JAVA_FRAME = re.compile(r"^\s*at\s+([^\s(]+)")
+_JAVA_EXCEPTION = re.compile(r"^(?:Caused by: |Suppressed: )?([A-Za-z_$][\w$]*(?:\.[\w$]+)+)(?::|\s*$)")
+# 函数名本身可能带括号（Foo::bar(int)），取到 BuildId 或行尾之前的最后一个 ")"
+_NATIVE_FRAME = re.compile(r"^\s*#\d+ pc [0-9a-fA-F]+\s+(\S+)(?:\s+\(offset 0x[0-9a-fA-F]+\))?"
+                           r"(?:\s+\((.+?)\)(?=\s+\(BuildId|\s*$))?")
+_NATIVE_PROCESS = re.compile(r">>> (\S+) <<<")
+_NATIVE_SIGNAL = re.compile(r"^signal \d+ \((\w+)\)(?:, code -?\d+ \((\w+)\))?")
+_NATIVE_OFFSET = re.compile(r"\+\d+$")
+_TOMBSTONE_TIME = re.compile(r"^Timestamp: (\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)(?:\.\d+)?([+-]\d{4})?")
+
+# 归一化：去掉 lambda / 合成类后缀、地址与行号，使同一缺陷在不同构建、不同进程中得到相同签名
+_NORMALIZE = (
+    (re.compile(r"\$\$ExternalSynthetic\w*?\d+"), "$$Lambda"),
+    (re.compile(r"\$\$Lambda\$[\w$]*(?:/0x[0-9a-fA-F]+)?"), "$$Lambda"),
+    (re.compile(r"\$r8\$lambda\$[\w-]+"), "$r8$lambda"),
+    (re.compile(r"(lambda\$\w+?)\$\d+"), r"\1"),
+    (re.compile(r"\$\$Nest\$\w+"), "$$Nest"),
+    (re.compile(r"0x[0-9a-fA-F]+"), "0x?"),
+    (re.compile(r"@[0-9a-fA-F]{6,}"), "@?"),
+)
+
+
+def normalize_frame(frame: str) -> str:
+    for pattern, replacement in _NORMALIZE:
+        frame = pattern.sub(replacement, frame)
+    return frame
+
+
+def normalize_native_frame(library: str, function: Optional[str]) -> str:
+    """libfoo.so (Foo::bar(int)+24) (BuildId: ...) → libfoo.so!Foo::bar(int)"""
+    name = os.path.basename(library)
+    if function and not function.startswith("BuildId"):
+        return f"{name}!{_NATIVE_OFFSET.sub('', function)}"
+    return f"{name}!?"
+
+
+@dataclass
+class CrashRecord:
+    """一次崩溃：已归一化的签名要素及原文"""
+    kind: str                 # java / native
+    device: str
+    time: float
+    process: str = ""
+    pid: str = ""
+    exceptions: List[str] = field(default_factory=list)   # Java: 异常类（含 Caused by）；native: 信号
+    sections: List[List[str]] = field(default_factory=list)  # 每段异常对应的栈帧
+    lines: List[str] = field(default_factory=list)
+
+    def signature_parts(self) -> List[str]:
+        # 取最深一层有栈帧的 cause 作为根因（"... N more" 的段没有自己的帧）
+        frames = next((s for s in reversed(self.sections) if s), [])
+        head = [self.exceptions[0], self.exceptions[-1]] if self.exceptions else ["?"]
+        return [self.kind, *head, *frames[:SIGNATURE_FRAMES]]
+
+    @property
+    def signature(self) -> str:
+        return hashlib.sha1("\n".join(self.signature_parts()).encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def title(self) -> str:
+        frames = next((s for s in reversed(self.sections) if s), [])
+        cause = self.exceptions[-1] if self.exceptions else "unknown"
+        return f"{cause} at {frames[0]}" if frames else cause
+
+
+@dataclass
+class CrashCluster:
+    signature: str
+    kind: str
+    title: str
+    count: int = 0
+    first_seen: float = 0.0
+    first_device: str = ""
+    devices: Set[str] = field(default_factory=set)
+    processes: Set[str] = field(default_factory=set)
+    sample: List[str] = field(default_factory=list)
+
+
+class CrashCollector:
+    """
+    单次流式扫描中提取崩溃并按签名聚合
+    - Java：AndroidRuntime 的 FATAL EXCEPTION 块（按 PID 区分交错的输出）
+    - native：DEBUG（crash_dump）输出或 tombstone 文件中崩溃线程的 backtrace；两处来源的同一次崩溃只计一次
+    """
+
+    def __init__(self):
+        self.clusters: Dict[str, CrashCluster] = {}
+        self.crashes = 0
+        self.duplicates = 0
+        self._native_seen: Dict[Tuple[str, str, str], List[float]] = {}  # (设备, PID, 信号) -> 崩溃时间
+        self._open: Dict[Tuple[str, str, str], CrashRecord] = {}
+        self._java_pid: Dict[str, str] = {}  # 每台设备最近一行 AndroidRuntime 的 PID
+
+    # ----- 聚合 -----
+    def _is_duplicate(self, record: CrashRecord) -> bool:
+        if record.kind != "native" or not record.pid:
+            return False
+        times = self._native_seen.setdefault((record.device, record.pid.strip(), record.exceptions[0]), [])
+        if any(abs(record.time - seen) <= NATIVE_DEDUP_WINDOW for seen in times):
+            return True
+        times.append(record.time)
+        return False
+
+    def _finish(self, record: CrashRecord) -> None:
+        if not record.exceptions:
+            return
+        if self._is_duplicate(record):
+            self.duplicates += 1
+            return
+        signature = record.signature
+        cluster = self.clusters.get(signature)
+        if cluster is None:
+            cluster = self.clusters[signature] = CrashCluster(signature, record.kind, record.title,
+                                                              first_seen=record.time, first_device=record.device,
+                                                              sample=record.lines[:SAMPLE_LINES])
+        elif record.time < cluster.first_seen:
+            cluster.first_seen, cluster.first_device = record.time, record.device
+            cluster.sample = record.lines[:SAMPLE_LINES]
+        cluster.count += 1
+        cluster.devices.add(record.device)
+        if record.process:
+            cluster.processes.add(record.process)
+        self.crashes += 1
+
+    def _close(self, key: Tuple[str, str, str]) -> None:
+        record = self._open.pop(key, None)
+        if record:
+            self._finish(record)
+
+    def flush(self, device: str = None) -> None:
+        for key in [k for k in self._open if device is None or k[0] == device]:
+            self._close(key)
+
+    # ----- Java -----
+    def _java_line(self, device: str, pid: str, when: float, message: str, raw: str) -> None:
+        """
+        崩溃块只在同一 PID 出现新的 FATAL EXCEPTION、该设备的 AndroidRuntime 输出换了 PID 或日志结束时关闭；
+        异常头之后、第一个栈帧之前的非 at 行是多行异常消息，不参与签名
+        """
+        key = (device, "java", pid)
+        previous = self._java_pid.get(device)
+        if previous is not None and previous != pid:
+            self._close((device, "java", previous))
+        self._java_pid[device] = pid
+        if message.startswith("FATAL EXCEPTION"):
+            self._close(key)
+            self._open[key] = CrashRecord("java", device, when, pid=pid, lines=[raw])
+            return
+        record = self._open.get(key)
+        if record is None:
+            return
+        if len(record.lines) < SAMPLE_LINES:
+            record.lines.append(raw)
+        frame = _JAVA_FRAME.match(message)
+        if frame:
+            if record.sections:
+                record.sections[-1].append(normalize_frame(frame.group(1)))
+        elif message.startswith("Process: "):
+            record.process = message[9:].split(",")[0].strip()
+        elif not record.exceptions or message.startswith(("Caused by: ", "Suppressed: ")):
+            exception = _JAVA_EXCEPTION.match(message)
+            if exception:
+                record.exceptions.append(normalize_frame(exception.group(1)))
+                record.sections.append([])
+
+    # ----- native -----
+    def _native_line(self, device: str, key_id: str, when: float, message: str, raw: str) -> None:
+        key = (device, "native", key_id)
+        if message.startswith("*** *** ***"):
+            self._close(key)
+            self._open[key] = CrashRecord("native", device, when, lines=[raw])
+            return
+        record = self._open.get(key)
+        if record is None:
+            return
+        if len(record.lines) < SAMPLE_LINES:
+            record.lines.append(raw)
+        stripped = message.strip()
+        frame = _NATIVE_FRAME.match(stripped)
+        if frame and record.sections:
+            record.sections[-1].append(normalize_native_frame(frame.group(1), frame.group(2)))
+        elif record.sections and record.sections[-1]:
+            self._close(key)  # 崩溃线程的 backtrace 结束
+        elif stripped.startswith("pid: "):
+            process = _NATIVE_PROCESS.search(stripped)
+            record.process = process.group(1) if process else record.process
+            record.pid = stripped[5:].split(",")[0]
+        elif stripped.startswith("signal "):
+            signal = _NATIVE_SIGNAL.match(stripped)
+            if signal:
+                record.exceptions.append(" ".join(filter(None, signal.groups())))
+        elif stripped.startswith("Abort message:") and not record.exceptions:
+            record.exceptions.append("SIGABRT")
+        elif stripped == "backtrace:":
+            record.sections.append([])
+
+    # ----- 输入 -----
+    def feed_logcat(self, device: str, when: float, line: bytes) -> None:
+        if b"AndroidRuntime" not in line and b"DEBUG" not in line:
+            return  # 预筛，绝大多数行不需要解析
+        parsed = split_line(line)
+        if not parsed:
+            return
+        _, _, tag, pid, message = parsed
+        text = message.decode("utf-8", errors="replace")
+        raw = line.decode("utf-8", errors="replace").rstrip("\r\n")
+        if tag == JAVA_TAG:
+            self._java_line(device, pid, when, text, raw)
+        elif tag == NATIVE_TAG:
+            self._native_line(device, pid, when, text, raw)
+
+    def feed_tombstone(self, device: str, path: str, clock: Optional[dict] = None) -> None:
+        """
+        tombstone 只解析崩溃线程，backtrace 结束后不再读取其余线程与内存信息
+        clock 为同一设备抓取时测得的时钟偏移，用于把设备时间换算到与 logcat 相同的主机时间轴
+        """
+        key = (device, "native", path)
+        when = os.path.getmtime(path)
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                stamp = _TOMBSTONE_TIME.match(line)
+                if stamp and key in self._open:
+                    device_time = _tombstone_time(stamp.group(1), stamp.group(2), None)
+                    if device_time is not None:
+                        when = device_time - (offset_at(clock, device_time) if clock else 0.0)
+                        self._open[key].time = when
+                started = key in self._open
+                self._native_line(device, path, when, line, line)
+                if started and key not in self._open:
+                    return
+        self._close(key)
+
+    def ranked(self) -> List[CrashCluster]:
+        return sorted(self.clusters.values(), key=lambda c: (-c.count, -len(c.devices), c.first_seen))
+
+
+def _tombstone_time(text: str, zone: Optional[str], default: Optional[float]) -> Optional[float]:
+    try:
+        moment = datetime.strptime(text + (zone or ""), "%Y-%m-%d %H:%M:%S" + ("%z" if zone else ""))
+    except ValueError:
+        return default
+    return moment.timestamp()
+
+
+def _tombstone_device(folder: str, root: str, logs: List[DeviceLog]) -> Tuple[str, Optional[dict]]:
+    """
+    tombstone 所属设备：优先按目录名中的设备地址（{ip}_anr、{ip}_monkey_...）匹配抓取日志的 device_ip，
+    其次取最近一层上级目录下唯一的那台设备；都无法确定时退回目录名。返回 (设备, 时钟)
+    """
+    relative = os.path.relpath(folder, root)
+    parts = [] if relative == "." else relative.split(os.sep)
+    devices = {log.label: log.clock for log in logs}
+    for label, clock in devices.items():
+        sanitized = re.sub(r"\W+", "_", label)
+        if any(part == sanitized or part.startswith(sanitized + "_") for part in parts):
+            return label, clock
+    current = folder
+    while True:
+        prefix = os.path.join(current, "")
+        nearby = {log.label for log in logs if any(p.startswith(prefix) for p in log.paths)}
+        if len(nearby) == 1:
+            label = nearby.pop()
+            return label, devices[label]
+        if nearby or os.path.normpath(current) == os.path.normpath(root):
+            break
+        current = os.path.dirname(current)
+    return relative, None
+
+
+def analyze_crashes(root: str) -> dict:
+    """
+    一次顺序扫描目录下所有抓取日志（时间按设备时钟偏移修正）与 tombstone，返回按出现次数排序的崩溃签名
+    """
+    started = time.perf_counter()
+    collector = CrashCollector()
+    logs = discover_logs(root)
+    lines = 0
+    for log in logs:
+        for when, device, line in DeviceStream(log):
+            collector.feed_logcat(device, when, line)
+            lines += 1
+        collector.flush(log.label)
+
+    tombstones = 0
+    for folder, _, names in os.walk(root):
+        for name in sorted(names):
+            if TOMBSTONE_PATTERN.match(name):
+                device, clock = _tombstone_device(folder, root, logs)
+                collector.feed_tombstone(device, os.path.join(folder, name), clock)
+                tombstones += 1
+    return {
+        "clusters": collector.ranked(),
+        "crashes": collector.crashes,
+        "duplicates": collector.duplicates,
+        "logs": len(logs),
+        "tombstones": tombstones,
+        "lines": lines,
+        "elapsed": round(time.perf_counter() - started, 2),
+    }
+
+
+def format_crash_table(clusters: List[CrashCluster], limit: int = None) -> List[str]:
+    """排名表：次数、设备数、首次出现时间与设备、签名与标题"""
+    rows = [f"{'#':>3} {'count':>6} {'devices':>7}  {'first seen':<19} {'kind':<6} {'signature':<12}  title"]
+    for rank, cluster in enumerate(clusters[:limit], 1):
+        first = time.strftime("%m-%d %H:%M:%S", time.localtime(cluster.first_seen))
+        rows.append(f"{rank:>3} {cluster.count:>6} {len(cluster.devices):>7}  {first:<19} {cluster.kind:<6} "
+                    f"{cluster.signature:<12}  {cluster.title}")
+    return rows
+
+
+def write_crash_report(result: dict, path: str) -> None:
+    """完整报告：排名表 + 每个签名的进程、设备与首次崩溃原文"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{result['crashes']} crashes, {len(result['clusters'])} signatures "
+                f"({result['logs']} logcat captures, {result['tombstones']} tombstones, "
+                f"{result['duplicates']} native crashes seen in both merged)\n\n")
+        f.write("\n".join(format_crash_table(result["clusters"])) + "\n")
+        for cluster in result["clusters"]:
+            f.write(f"\n=== {cluster.signature} [{cluster.kind}] x{cluster.count}: {cluster.title}\n")
+            f.write(f"processes: {', '.join(sorted(cluster.processes)) or '-'}\n")
+            f.write(f"devices: {', '.join(sorted(cluster.devices))}\n")
+            f.write(f"first seen on {cluster.first_device}:\n")
+            f.write("\n".join(cluster.sample) + "\n")
@@ -0,0 +1,82 @@
+import os
+import re
+import subprocess
+import time
+from typing import List, Optional
+
+from utils.adb_utils import NO_WINDOW
+from utils.logcat_binary import parse_utc_offset
+from utils.yaml_tool import YamlTool
+
+CLOCK_SUFFIX = ".clock.yaml"
+CLOCK_SAMPLES = 5
+# 抓取分段与压缩后缀：logcat_001.txt.gz → logcat
+_SEGMENT_STEM = re.compile(r"^(logcat.*?)(_\d{3})?\.txt(\.gz|\.zst)?$")
+_LOG_STEM = re.compile(r"\.txt(\.gz|\.zst)?$")
+
+
+def measure_clock(device_ip: str, samples: int = CLOCK_SAMPLES) -> dict:
+    """
+    测量设备时钟相对主机的偏移（NTP 式）：记录 adb 往返前后的主机时间，
+    设备时间对齐到往返中点，取往返最短的一次，误差不超过半个往返
+    返回 {host_time, offset, rtt, utc_offset, precision}；offset = 设备时间 - 主机时间（秒）
+    """
+    best = None
+    for _ in range(samples):
+        sent = time.time()
+        output = subprocess.run(
+            ["adb", "-s", device_ip, "shell", "date +%s.%N%z"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=10,
+            creationflags=NO_WINDOW
+        ).stdout.strip()
+        received = time.time()
+        match = re.fullmatch(r"(\d+)\.(\S*?)([+-]\d{4})", output)
+        if not match:
+            raise RuntimeError(f"Unexpected device date output: {output!r}")
+        seconds, fraction, zone = match.groups()
+        # 旧版 date 不支持 %N（原样输出 N 或 %N），只能得到秒级精度
+        precise = fraction.isdigit()
+        device_time = int(seconds) + (float(f"0.{fraction}") if precise else 0.5)
+        rtt = received - sent
+        midpoint = (sent + received) / 2
+        sample = {
+            "host_time": round(midpoint, 6),
+            "offset": round(device_time - midpoint, 6),
+            "rtt": round(rtt, 6),
+            "utc_offset": parse_utc_offset(zone),
+            "precision": round(rtt / 2, 6) if precise else 0.5 + rtt / 2,
+        }
+        if best is None or sample["rtt"] < best["rtt"]:
+            best = sample
+    return best
+
+
+def clock_path(log_path: str) -> str:
+    """日志（含轮转分段与压缩文件）对应的时钟文件：logcat_001.txt.gz → logcat.clock.yaml"""
+    folder, name = os.path.split(log_path)
+    match = _SEGMENT_STEM.match(name)
+    stem = match.group(1) if match else _LOG_STEM.sub("", name)
+    return os.path.join(folder, stem + CLOCK_SUFFIX)
+
+
+def save_clock(log_path: str, device_ip: str, samples: List[dict]) -> None:
+    YamlTool.write_yaml(clock_path(log_path), {"device_ip": device_ip, "samples": samples})
+
+
+def load_clock(log_path: str) -> Optional[dict]:
+    data = YamlTool.load_yaml(clock_path(log_path))
+    return data if data.get("samples") else None
+
+
+def offset_at(clock: dict, host_time: float) -> float:
+    """抓取开始与结束各测一次时，按时间线性插值，修正长时间抓取中的时钟漂移"""
+    samples = sorted(clock["samples"], key=lambda s: s["host_time"])
+    first, last = samples[0], samples[-1]
+    if len(samples) == 1 or last["host_time"] <= first["host_time"]:
+        return first["offset"]
+    ratio = (host_time - first["host_time"]) / (last["host_time"] - first["host_time"])
+    ratio = min(max(ratio, 0.0), 1.0)
+    return first["offset"] + ratio * (last["offset"] - first["offset"])
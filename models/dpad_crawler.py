@@ -0,0 +1,152 @@
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.launch_resolver import LaunchResolver
+from models.ui_hierarchy import WINDOW_SAMPLE_INTERVAL, UiHierarchy, UiHierarchyCache, window_component
+from utils.adb_utils import NO_WINDOW
+
+# 遥控器按键 -> Android keycode，BACK 放最后，优先向界面深处探索
+DPAD_ACTIONS: Dict[str, int] = {
+    "DOWN": 20,
+    "RIGHT": 22,
+    "ENTER": 23,
+    "UP": 19,
+    "LEFT": 21,
+    "BACK": 4,
+}
+
+# (界面指纹, 焦点位置)：同一界面焦点不同，ENTER 的结果也不同
+CrawlState = Tuple[str, str]
+
+
+class DpadCrawler:
+    """
+    STB 遥控器系统遍历
+    - 每个界面按归一化 UI 层级求指纹
+    - 维护状态图，每个 (状态, 按键) 只探索一次
+    - 当前状态探索完毕时，沿状态图走最短路径到还有未探索按键的状态
+    """
+
+    def __init__(self, device_ip: str, package_name: str, ui_cache: UiHierarchyCache,
+                 launcher: LaunchResolver = None, duration: float = 600, settle: float = 0.6,
+                 stop_event: threading.Event = None, log: Callable[[str], None] = None):
+        self.device_ip = device_ip
+        self.package_name = package_name
+        self.ui_cache = ui_cache
+        self.launcher = launcher or LaunchResolver()
+        self.duration = duration
+        self.settle = settle
+        self.stop_event = stop_event or threading.Event()
+        self.log = log or (lambda msg: None)
+
+        self.graph: Dict[CrawlState, Dict[str, CrawlState]] = {}
+        self.untried: Dict[CrawlState, List[str]] = {}
+        self.screens = set()
+        self.windows = set()
+        self._sampled_at = 0.0
+        self.actions = 0
+        self.relaunches = 0
+
+    # ----- 设备交互 -----
+    def _press(self, action: str) -> None:
+        subprocess.run(
+            ["adb", "-s", self.device_ip, "shell", "input", "keyevent", str(DPAD_ACTIONS[action])],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=15,
+            creationflags=NO_WINDOW
+        )
+        self.actions += 1
+        self.ui_cache.invalidate(self.device_ip)
+        time.sleep(self.settle)
+
+    def _launch(self) -> None:
+        self.launcher.launch(self.device_ip, self.package_name, wait=False)
+        self.relaunches += 1
+        self.ui_cache.invalidate(self.device_ip)
+        time.sleep(self.settle * 3)
+
+    def _observe(self) -> Tuple[Optional[CrawlState], UiHierarchy]:
+        hierarchy, _ = self.ui_cache.get(self.device_ip, force=True)
+        now = time.monotonic()
+        if now - self._sampled_at >= WINDOW_SAMPLE_INTERVAL:
+            # 与 Monkey 轮询相同的节奏与归一化（pkg/Activity），重建的同一窗口不会重复计数
+            self._sampled_at = now
+            component = window_component(self.ui_cache.focus_of(self.device_ip))
+            if component:
+                self.windows.add(component)
+        if hierarchy.package != self.package_name:
+            return None, hierarchy
+
+        screen = hierarchy.fingerprint()
+        focused = hierarchy.focused()
+        focus_key = f"{focused.resource_id}|{focused.class_name}|{focused.bounds}" if focused else ""
+        state = (screen, focus_key)
+        if screen not in self.screens:
+            self.screens.add(screen)
+            self.log(f"🧭 New screen #{len(self.screens)} ({screen}) after {self.actions} actions")
+        if state not in self.graph:
+            self.graph[state] = {}
+            self.untried[state] = list(DPAD_ACTIONS)
+        return state, hierarchy
+
+    # ----- 路径规划 -----
+    def _path_to_frontier(self, start: CrawlState) -> List[str]:
+        """BFS 寻找到最近的“仍有未探索按键”的状态的按键路径"""
+        visited = {start}
+        queue = deque([(start, [])])
+        while queue:
+            state, path = queue.popleft()
+            if path and self.untried.get(state):
+                return path
+            for action, target in self.graph.get(state, {}).items():
+                if target not in visited:
+                    visited.add(target)
+                    queue.append((target, path + [action]))
+        return []
+
+    def run(self) -> dict:
+        start = time.monotonic()
+        deadline = start + self.duration
+        self._launch()
+        state, _ = self._observe()
+
+        while time.monotonic() < deadline and not self.stop_event.is_set():
+            if state is None:
+                # 离开了目标应用：先尝试返回，仍不在则重新拉起
+                self._press("BACK")
+                state, _ = self._observe()
+                if state is None:
+                    self._launch()
+                    state, _ = self._observe()
+                continue
+
+            if self.untried[state]:
+                action = self.untried[state].pop(0)
+            else:
+                path = self._path_to_frontier(state)
+                if not path:
+                    self.log("🏁 State graph fully explored")
+                    break
+                action = path[0]
+
+            self._press(action)
+            next_state, _ = self._observe()
+            if next_state is not None:
+                self.graph[state][action] = next_state
+            state = next_state
+
+        minutes = max((time.monotonic() - start) / 60, 1e-6)
+        return {
+            "screens": len(self.screens),
+            "states": len(self.graph),
+            "windows": len(self.windows),
+            "actions": self.actions,
+            "relaunches": self.relaunches,
+            "duration": round(minutes * 60, 1),
+            "screens_per_min": round(len(self.screens) / minutes, 2),
+            "windows_per_min": round(len(self.windows) / minutes, 2),
+        }
@@ -0,0 +1,251 @@
+import os
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from models.shell_batch import ShellBatch
+from utils.adb_utils import NO_WINDOW
+from utils.yaml_tool import YamlTool
+
+MACRO_DIR = os.path.join("resources", "macros")
+
+EV_SYN = 0
+# 单次 sendevent 进程的耗时，回放时从帧间等待中扣除；按设备实测，测量失败时用这个默认值
+SENDEVENT_COST = 0.002
+# 测量 sendevent 耗时时连续执行的次数（/proc/uptime 精度 10 ms）
+COST_PROBE_CALLS = 50
+# 小于该值的帧间隔直接合并，不再插入 sleep
+MIN_SLEEP = 0.005
+
+_EVENT_RE = re.compile(r"^\[\s*(\d+\.\d+)\]\s+(/dev/input/event\d+):\s+([0-9a-fA-F]+)\s+([0-9a-fA-F]+)\s+([0-9a-fA-F]+)")
+_ADD_DEVICE_RE = re.compile(r"^add device \d+:\s+(/dev/input/event\d+)")
+_NAME_RE = re.compile(r'^\s+name:\s+"(.*)"')
+
+# (相对时间秒, 设备节点, type, code, value)
+MacroEvent = Tuple[float, str, int, int, int]
+
+
+@dataclass
+class InputMacro:
+    """录制的原始输入事件序列"""
+    name: str
+    source_device: str = ""
+    input_devices: Dict[str, str] = field(default_factory=dict)  # 节点路径 -> 输入设备名
+    events: List[MacroEvent] = field(default_factory=list)
+
+    @property
+    def duration(self) -> float:
+        return self.events[-1][0] if self.events else 0.0
+
+    def save(self, directory: str = MACRO_DIR) -> str:
+        path = os.path.join(directory, f"{self.name}.yaml")
+        written = YamlTool.write_yaml(path, {
+            "name": self.name,
+            "source_device": self.source_device,
+            "input_devices": self.input_devices,
+            "events": [list(e) for e in self.events],
+        })
+        if not written:
+            raise OSError(f"Failed to write macro file: {path}")
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "InputMacro":
+        data = YamlTool.load_yaml(path)
+        if not data.get("events"):
+            raise ValueError(f"No events in macro file: {path}")
+        return cls(
+            name=data.get("name", os.path.splitext(os.path.basename(path))[0]),
+            source_device=data.get("source_device", ""),
+            input_devices=data.get("input_devices", {}),
+            events=[(float(t), str(p), int(ty), int(c), int(v)) for t, p, ty, c, v in data["events"]],
+        )
+
+    def compile_script(self, path_map: Dict[str, str] = None, sendevent_cost: float = SENDEVENT_COST) -> str:
+        """
+        编译为 sendevent 脚本，按 EV_SYN 分帧，帧间插入 sleep 保持原始节奏
+        path_map: 录制设备节点 -> 目标设备节点
+        sendevent_cost: 目标设备上单次 sendevent 的耗时
+        """
+        path_map = path_map or {}
+        lines = []
+        clock = 0.0  # 设备端预计已经过的时间
+        frame_events = 0
+        for ts, path, ev_type, code, value in self.events:
+            if frame_events == 0:
+                delay = ts - clock
+                if delay >= MIN_SLEEP:
+                    lines.append(f"sleep {delay:.3f}")
+                    clock = ts
+            lines.append(f"sendevent {path_map.get(path, path)} {ev_type} {code} {value}")
+            clock += sendevent_cost
+            frame_events = 0 if ev_type == EV_SYN else frame_events + 1
+        lines.append("echo __MACRO_DONE__")
+        return "\n".join(lines) + "\n"
+
+
+def parse_input_devices(output: str) -> Dict[str, str]:
+    """解析 getevent 输出中的 add device / name 段，返回 节点路径 -> 设备名"""
+    devices = {}
+    current = None
+    for line in output.splitlines():
+        added = _ADD_DEVICE_RE.match(line)
+        if added:
+            current = added.group(1)
+            continue
+        named = _NAME_RE.match(line)
+        if named and current:
+            devices[current] = named.group(1)
+            current = None
+    return devices
+
+
+class MacroRecorder:
+    """
+    在单台设备上通过 getevent 录制原始输入
+    使用数字格式 (getevent -t)，sendevent 回放需要的正是数字 type/code/value
+    """
+
+    def __init__(self, device_ip: str, name: str):
+        self.device_ip = device_ip
+        self.macro = InputMacro(name=name, source_device=device_ip)
+        self._proc: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+        self._header_lines: List[str] = []
+
+    def start(self) -> None:
+        self._proc = subprocess.Popen(
+            ["adb", "-s", self.device_ip, "shell", "getevent", "-t"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+            creationflags=NO_WINDOW
+        )
+        self._thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._thread.start()
+
+    def _read_loop(self) -> None:
+        base_time = None
+        events = self.macro.events
+        for line in self._proc.stdout:
+            match = _EVENT_RE.match(line)
+            if not match:
+                self._header_lines.append(line.rstrip("\n"))
+                continue
+            ts = float(match.group(1))
+            if base_time is None:
+                base_time = ts
+            events.append((
+                round(ts - base_time, 6),
+                match.group(2),
+                int(match.group(3), 16),
+                int(match.group(4), 16),
+                int(match.group(5), 16),
+            ))
+
+    def stop(self) -> InputMacro:
+        """停止录制并返回宏"""
+        if self._proc:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.macro.input_devices = parse_input_devices("\n".join(self._header_lines))
+        # 丢弃末尾不完整的帧
+        while self.macro.events and self.macro.events[-1][2] != EV_SYN:
+            self.macro.events.pop()
+        return self.macro
+
+
+class MacroPlayer:
+    """在一个常驻 shell 中批量执行 sendevent，每台设备一次 adb 调用"""
+
+    def __init__(self):
+        self._device_nodes: Dict[str, Dict[str, str]] = {}
+        self._sendevent_cost: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _resolve_path_map(self, device_ip: str, macro: InputMacro) -> Dict[str, str]:
+        """按输入设备名把录制设备的节点映射到目标设备的节点"""
+        if not macro.input_devices:
+            return {}
+        with self._lock:
+            nodes = self._device_nodes.get(device_ip)
+        if nodes is None:
+            output = subprocess.run(
+                ["adb", "-s", device_ip, "shell", "getevent", "-p"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding="utf-8",
+                errors="ignore",
+                timeout=15,
+                creationflags=NO_WINDOW
+            ).stdout
+            nodes = parse_input_devices(output)
+            with self._lock:
+                self._device_nodes[device_ip] = nodes
+
+        by_name = {name: path for path, name in nodes.items()}
+        return {
+            path: by_name[name]
+            for path, name in macro.input_devices.items()
+            if name in by_name
+        }
+
+    def _measure_sendevent_cost(self, device_ip: str, node: str) -> float:
+        """
+        在设备上连续执行 COST_PROBE_CALLS 次 sendevent（空的 EV_SYN，不产生输入），
+        用前后两次 /proc/uptime 计算单次耗时，结果按设备缓存
+        """
+        with self._lock:
+            cached = self._sendevent_cost.get(device_ip)
+        if cached is not None:
+            return cached
+        batch = ShellBatch(device_ip).add("before", "cat /proc/uptime")
+        batch.add("probe", "\n".join([f"sendevent {node} 0 0 0"] * COST_PROBE_CALLS))
+        batch.add("after", "cat /proc/uptime")
+        try:
+            steps = batch.run(timeout=30)
+            elapsed = float(steps["after"].output.split()[0]) - float(steps["before"].output.split()[0])
+            cost = max(elapsed / COST_PROBE_CALLS, 0.0) if steps["probe"].ok else SENDEVENT_COST
+        except (KeyError, IndexError, ValueError, RuntimeError, subprocess.TimeoutExpired):
+            return SENDEVENT_COST  # 测量失败不缓存，下次再试
+        with self._lock:
+            self._sendevent_cost[device_ip] = cost
+        return cost
+
+    def replay(self, device_ip: str, macro: InputMacro) -> dict:
+        """
+        在单台设备上回放，整个脚本在同一个 shell 中执行
+        经 ShellBatch 下发：旧设备（无 shell_v2）不从 stdin 传脚本，避免等不到 EOF 一直阻塞到超时
+        """
+        start = time.perf_counter()
+        try:
+            path_map = self._resolve_path_map(device_ip, macro)
+            first_node = path_map.get(macro.events[0][1], macro.events[0][1]) if macro.events else ""
+            cost = self._measure_sendevent_cost(device_ip, first_node) if first_node else SENDEVENT_COST
+            script = macro.compile_script(path_map, cost)
+            steps = ShellBatch(device_ip).add("replay", script).run(timeout=int(macro.duration) + 60)
+            output = steps["replay"].output if "replay" in steps else ""
+            success = "__MACRO_DONE__" in output
+            return {
+                "success": success,
+                "device_ip": device_ip,
+                "macro": macro.name,
+                "events": len(macro.events),
+                "sendevent_ms": round(cost * 1000, 2),
+                "elapsed": round(time.perf_counter() - start, 3),
+                "output": output.replace("__MACRO_DONE__", "").strip()
+            }
+        except Exception as e:
+            return {"success": False, "device_ip": device_ip, "macro": macro.name, "error": str(e),
+                    "elapsed": round(time.perf_counter() - start, 3)}
@@ -0,0 +1,82 @@
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from models.shell_batch import ShellBatch, StepResult
+
+LAUNCHER = "android.intent.category.LAUNCHER"
+LEANBACK_LAUNCHER = "android.intent.category.LEANBACK_LAUNCHER"
+
+_TIMING_RE = re.compile(r"^(ThisTime|TotalTime|WaitTime):\s*(\d+)", re.MULTILINE)
+_RESOLVED_RE = re.compile(r"^(vc|component|cached)=(.*)$", re.MULTILINE)
+
+
+class LaunchResolver:
+    """
+    启动组件解析缓存
+    - 每台设备每个包用 cmd package resolve-activity 解析一次启动 Activity，
+      TV 设备优先 LEANBACK_LAUNCHER，其余优先 LAUNCHER
+    - 缓存按 versionCode 失效：版本检查与启动在同一次 shell 调用中完成，命中时不再解析
+    - 用 am start -W -n 直接启动，不再为发一个 Intent 拉起 monkey，并返回启动耗时
+    - 解析不到组件（Android 7 之前没有 resolve-activity）时回退到 monkey
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (设备, 包名) -> (versionCode, 组件)
+        self._cache: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+    def cached(self, device_ip: str, package_name: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            return self._cache.get((device_ip, package_name))
+
+    def invalidate(self, device_ip: str, package_name: str = None) -> None:
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == device_ip and package_name in (None, k[1])]:
+                self._cache.pop(key, None)
+
+    def add_launch(self, batch: ShellBatch, package_name: str, wait: bool = True) -> ShellBatch:
+        """向批处理追加 resolve 与 launch 两个步骤"""
+        version, component = self.cached(batch.device_ip, package_name) or ("", "")
+        batch.add("resolve", (
+            f"vc=$(cmd package list packages --show-versioncode {package_name} 2>/dev/null"
+            f" | grep -m1 '^package:{package_name} ' | sed 's/.*versionCode://'); "
+            f"[ -n \"$vc\" ] || vc=$(dumpsys package {package_name} | grep -m1 -o 'versionCode=[0-9]*' | cut -d= -f2); "
+            f"echo vc=$vc; "
+            f"if [ -n \"$vc\" ] && [ \"$vc\" = \"{version}\" ]; then comp='{component}'; echo cached=1; else "
+            f"case \"$(getprop ro.build.characteristics)\" in *tv*) cats=\"{LEANBACK_LAUNCHER} {LAUNCHER}\";; "
+            f"*) cats=\"{LAUNCHER} {LEANBACK_LAUNCHER}\";; esac; comp=; "
+            f"for c in $cats; do [ -n \"$comp\" ] && break; "
+            f"comp=$(cmd package resolve-activity --brief -a android.intent.action.MAIN -c $c {package_name} 2>/dev/null"
+            f" | tail -n1 | grep /); done; fi; "
+            f"echo component=$comp"
+        ))
+        flags = "-W " if wait else ""
+        batch.add("launch", (
+            f"if [ -n \"$comp\" ]; then out=$(am start {flags}-n $comp 2>&1); echo \"$out\"; "
+            f"case \"$out\" in *Error*) false;; esac; "
+            f"else monkey -p {package_name} -c {LAUNCHER} 1; fi"
+        ))
+        return batch
+
+    def result(self, device_ip: str, package_name: str, steps: Dict[str, StepResult]) -> dict:
+        """解析批处理结果并更新缓存，返回组件与启动耗时"""
+        resolved = dict(_RESOLVED_RE.findall(steps["resolve"].output)) if "resolve" in steps else {}
+        version, component = resolved.get("vc", "").strip(), resolved.get("component", "").strip()
+        if version and component:
+            with self._lock:
+                self._cache[(device_ip, package_name)] = (version, component)
+        launch = steps["launch"].output if "launch" in steps else ""
+        timing = {name: int(value) for name, value in _TIMING_RE.findall(launch)}
+        return {
+            "component": component,
+            "cached": resolved.get("cached") == "1",
+            "method": "am start" if component else "monkey",
+            "total_ms": timing.get("TotalTime", timing.get("ThisTime")),
+            "wait_ms": timing.get("WaitTime"),
+        }
+
+    def launch(self, device_ip: str, package_name: str, wait: bool = True, timeout: int = 30) -> dict:
+        """单独启动应用（一次 adb 往返）"""
+        steps = self.add_launch(ShellBatch(device_ip), package_name, wait).run(timeout=timeout)
+        return {"success": "launch" in steps and steps["launch"].ok, **self.result(device_ip, package_name, steps)}
@@ -0,0 +1,282 @@
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from utils.yaml_tool import YamlTool
+
+try:
+    import ahocorasick
+except ImportError:  # 可选依赖，未安装时用合并的字面量正则做预筛
+    ahocorasick = None
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+ALERT_RULES_FILE = os.path.join("resources", "alert_rules.yaml")
+DEFAULT_COOLDOWN = 30.0
+MIN_KEYWORD = 3
+
+# resources/alert_rules.yaml 不存在时的默认规则
+DEFAULT_RULES = [
+    {"name": "ANR", "pattern": r"ANR in (\S+)"},
+    {"name": "Java crash", "pattern": r"FATAL EXCEPTION"},
+    {"name": "Native crash", "pattern": r"Fatal signal \d+ \(SIG\w+\)"},
+    {"name": "Out of memory", "pattern": r"OutOfMemoryError|Out of memory", "ignore_case": True},
+    {"name": "Low memory kill", "pattern": r"lowmemorykiller.*Kill|Killing \d+:\S+ .*(?:lmk|low mem)"},
+    {"name": "Watchdog", "pattern": r"WATCHDOG KILLING SYSTEM PROCESS|Blocked in handler on"},
+]
+
+
+class AlertEvent(NamedTuple):
+    rule: str
+    device_ip: str
+    line: str
+    time: float
+    suppressed: int   # 冷却期内被合并、未单独上报的次数
+
+
+@dataclass
+class AlertRule:
+    """
+    告警规则：pattern 为正则，tags / levels 限定 tag 与级别
+    keywords 为预筛字面量（任一出现才做正则确认），不填时从 pattern 自动提取
+    """
+    name: str
+    pattern: str = ""
+    keywords: List[str] = field(default_factory=list)
+    tags: List[str] = field(default_factory=list)
+    levels: str = ""
+    ignore_case: bool = False
+    cooldown: float = DEFAULT_COOLDOWN
+    regex: Optional[re.Pattern] = None
+    header: Optional[re.Pattern] = None
+
+    def __post_init__(self):
+        if self.pattern:
+            self.regex = re.compile(self.pattern, re.IGNORECASE if self.ignore_case else 0)
+        if self.tags or self.levels:
+            # 直接匹配 time / threadtime 行头中的级别与 tag，无需完整解析
+            levels = f"[{re.escape(self.levels)}]" if self.levels else "[VDIWEFS]"
+            tags = "|".join(re.escape(t) for t in self.tags) if self.tags else "[^:(]*?"
+            self.header = re.compile(rf"^\d\d-\d\d \S+ +(?:\d+ +\d+ {levels} (?:{tags}) *: |{levels}/(?:{tags}) *\( *\d+\): )")
+        if not self.keywords:
+            self.keywords = list(self.tags) or extract_keywords(self.pattern)
+
+    def confirm(self, line: str) -> bool:
+        if self.header is not None and not self.header.match(line):
+            return False
+        return self.regex is None or self.regex.search(line) is not None
+
+
+def _literal_runs(parsed) -> List[str]:
+    """正则序列中必然出现的连续字面量片段（分支、重复、字符集等处断开，不进入分支内部）"""
+    runs, current = [], []
+    for op, value in parsed:
+        if op is sre_parse.LITERAL:
+            current.append(chr(value))
+            continue
+        if current:
+            runs.append("".join(current))
+            current = []
+        if op is sre_parse.SUBPATTERN:
+            runs.extend(_literal_runs(value[-1]))
+    if current:
+        runs.append("".join(current))
+    return runs
+
+
+def _split_branches(pattern: str) -> List[str]:
+    """按顶层 | 拆分正则（括号、字符集与转义内的 | 不拆）"""
+    branches, depth, start, i = [], 0, 0, 0
+    in_class = False
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            branches.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    branches.append(pattern[start:])
+    return branches
+
+
+def extract_keywords(pattern: str) -> List[str]:
+    """
+    从正则中提取预筛字面量：顶层为 A|B|C 时每个分支取一个最长字面量，否则取整体最长字面量
+    任一分支提取不到足够长的字面量时返回空（该规则对每行都做正则确认）
+    """
+    if not pattern:
+        return []
+    keywords = []
+    for branch in _split_branches(pattern):
+        try:
+            parsed = sre_parse.parse(branch)
+        except Exception:
+            return []
+        runs = _literal_runs(parsed)
+        best = max(runs, key=len, default="")
+        if len(best) < MIN_KEYWORD:
+            return []
+        keywords.append(best)
+    return keywords
+
+
+def _trie_pattern(words: List[str]) -> str:
+    """把字面量合并成前缀树形状的正则，避免 re 在每个位置逐个尝试所有分支"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return (body if len(branches) > 1 else f"(?:{body})") + "?"
+        return body
+
+    return build(trie)
+
+
+def load_alert_rules(path: str = ALERT_RULES_FILE) -> List[AlertRule]:
+    """
+    读取告警规则，resources/alert_rules.yaml 示例:
+        rules:
+          - name: ANR
+            pattern: 'ANR in (\\S+)'
+          - name: MyApp errors
+            tags: [MyApp, MyAppNet]
+            levels: EF
+            cooldown: 10
+    """
+    config = YamlTool.load_yaml(path)
+    rules = config.get("rules") or DEFAULT_RULES
+    return [AlertRule(
+        name=str(rule["name"]),
+        pattern=str(rule.get("pattern", "")),
+        keywords=[str(k) for k in rule.get("keywords") or []],
+        tags=[str(t) for t in rule.get("tags") or []],
+        levels=str(rule.get("levels", "")),
+        ignore_case=bool(rule.get("ignore_case", False)),
+        cooldown=float(rule.get("cooldown", DEFAULT_COOLDOWN)),
+    ) for rule in rules]
+
+
+class AlertEngine:
+    """
+    多模式日志告警
+    - 所有规则的预筛字面量合并为一个匹配器（有 pyahocorasick 时用 Aho-Corasick 自动机，否则用合并正则），
+      每行只扫描一次；命中的少量行再按对应规则做正则 / tag / 级别确认
+    - 按 (规则, 设备) 冷却限流，冷却期内的重复命中只计数，随下一次告警一起上报
+    - feed 可在多个读取线程中并发调用
+    """
+
+    def __init__(self, rules: List[AlertRule], on_alert: Callable[[AlertEvent], None] = None):
+        self.rules = rules
+        self.on_alert = on_alert or (lambda event: None)
+        self.lines = 0
+        self.matches = 0
+        self._last: Dict[Tuple[int, str], float] = {}
+        self._suppressed: Dict[Tuple[int, str], int] = {}
+        self._lock = threading.Lock()
+
+        # 没有可用字面量的规则每行都需要确认
+        self._always = [i for i, rule in enumerate(rules) if not rule.keywords]
+        self._by_keyword: Dict[str, List[int]] = {}
+        for i, rule in enumerate(rules):
+            for keyword in rule.keywords:
+                self._by_keyword.setdefault(keyword.lower(), []).append(i)
+
+        self._automaton = None
+        self._prefilter = None
+        if self._by_keyword and ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, indexes in self._by_keyword.items():
+                self._automaton.add_word(keyword, indexes)
+            self._automaton.make_automaton()
+        elif self._by_keyword:
+            self._prefilter = re.compile(_trie_pattern(list(self._by_keyword)))
+
+    @classmethod
+    def from_config(cls, on_alert: Callable[[AlertEvent], None] = None, path: str = ALERT_RULES_FILE) -> "AlertEngine":
+        return cls(load_alert_rules(path), on_alert)
+
+    def candidates(self, line: str) -> List[int]:
+        """预筛：返回可能命中的规则下标（大小写不敏感的超集，由 confirm 精确判断）"""
+        hits = list(self._always)
+        lowered = line.lower()
+        if self._automaton is not None:
+            for _, indexes in self._automaton.iter(lowered):
+                hits.extend(indexes)
+        elif self._prefilter is not None and self._prefilter.search(lowered):
+            for keyword, indexes in self._by_keyword.items():
+                if keyword in lowered:
+                    hits.extend(indexes)
+        return hits
+
+    def match(self, line: str) -> List[AlertRule]:
+        """不限流地返回命中的规则（用于测试与离线扫描）"""
+        seen = set()
+        matched = []
+        for index in self.candidates(line):
+            if index not in seen:
+                seen.add(index)
+                if self.rules[index].confirm(line):
+                    matched.append(self.rules[index])
+        return matched
+
+    def feed(self, device_ip: str, line: str, now: float = None) -> None:
+        self.lines += 1
+        candidates = self.candidates(line)
+        if not candidates:
+            return
+        now = time.monotonic() if now is None else now
+        for index in set(candidates):
+            rule = self.rules[index]
+            if not rule.confirm(line):
+                continue
+            self.matches += 1
+            key = (index, device_ip)
+            with self._lock:
+                last = self._last.get(key)
+                if last is not None and now - last < rule.cooldown:
+                    self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                    continue
+                self._last[key] = now
+                suppressed = self._suppressed.pop(key, 0)
+            self.on_alert(AlertEvent(rule.name, device_ip, line, time.time(), suppressed))
+
+
+def benchmark(engine: AlertEngine, lines: int = 500000) -> float:
+    """用合成的 threadtime 日志测量吞吐（行/秒），约 0.1% 的行会命中规则"""
+    sample = [
+        f"10-18 02:00:{i % 60:02d}.{i % 1000:03d}  {1000 + i % 50:5d}  {2000 + i % 50:5d} "
+        f"{'DIWE'[i % 4]} {('ActivityManager', 'WindowManager', 'chatty', 'MyApp')[i % 4]:<8}: "
+        f"event {i} ordinary log message with some payload text"
+        for i in range(1000)
+    ]
+    sample[500] = "10-18 02:00:00.000  1000  1000 E ActivityManager: ANR in com.example.app (com.example/.Main)"
+    counting = AlertEngine(engine.rules)
+    started = time.perf_counter()
+    for i in range(lines):
+        counting.feed("bench", sample[i % 1000], now=0.0)
+    return lines / (time.perf_counter() - started)
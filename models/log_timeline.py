@@ -0,0 +1,147 @@
+import calendar
+import gzip
+import heapq
+import io
+import os
+import time
+from operator import itemgetter
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from models.device_clock import CLOCK_SUFFIX, clock_path, load_clock, offset_at
+from utils.logcat_index import LOG_FILE_PATTERN, parse_line
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时无法读取 .zst 分段
+    zstandard = None
+
+WRITE_BUFFER = 1 << 20
+READ_BUFFER = 1 << 20
+# 首行时间允许晚于抓取开始时刻的范围（秒），超出则按上一年的日志处理
+FUTURE_TOLERANCE = 86400
+
+
+class DeviceLog(NamedTuple):
+    """一台设备的一次抓取：按顺序排列的分段文件及抓取时测得的时钟偏移"""
+    label: str
+    paths: List[str]
+    clock: Optional[dict]
+
+
+def discover_logs(root: str) -> List[DeviceLog]:
+    """按时钟文件归组目录下的日志（同一次抓取的轮转分段共用一个时钟文件）"""
+    groups = {}
+    for folder, _, names in os.walk(root):
+        for name in sorted(names):
+            if LOG_FILE_PATTERN.match(name):
+                path = os.path.join(folder, name)
+                groups.setdefault(clock_path(path), []).append(path)
+    logs = []
+    for key, paths in sorted(groups.items()):
+        clock = load_clock(paths[0])
+        label = (clock or {}).get("device_ip") or _fallback_label(key, root)
+        logs.append(DeviceLog(label, paths, clock))
+    return logs
+
+
+def _fallback_label(clock_file: str, root: str) -> str:
+    """没有时钟文件（旧日志）时用所在目录命名；同一目录下的多个拉取日志再加上文件名区分"""
+    stem = os.path.relpath(clock_file[:-len(CLOCK_SUFFIX)], root)
+    folder, name = os.path.split(stem)
+    return (folder or name) if name == "logcat" else stem
+
+
+def open_log_lines(path: str):
+    """以二进制行迭代打开明文 / gzip / zstd 日志，流式读取"""
+    if path.endswith(".gz"):
+        # GzipFile 逐行读取开销较大，外面再套一层大缓冲
+        return io.BufferedReader(gzip.open(path, "rb"), READ_BUFFER)
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is not installed, cannot read {path}")
+        raw = open(path, "rb")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True),
+                                 READ_BUFFER)
+    return open(path, "rb", buffering=READ_BUFFER)
+
+
+class DeviceStream:
+    """
+    把一台设备的日志转换为 (主机时间, 行) 序列
+    设备本地时间 → UTC（设备时区）→ 减去时钟偏移得到主机时间；没有年份的时间戳按抓取时的年份补全，跨年时自动进位
+    首行按抓取年份算出的时间比抓取时刻晚一天以上时（如 1 月初 dump 出的 12 月日志），起始年份取抓取年份的前一年
+    """
+
+    def __init__(self, log: DeviceLog):
+        self.log = log
+        clock = log.clock
+        if clock:
+            sample = clock["samples"][0]
+            self.utc_offset = sample["utc_offset"] or 0
+            device_now = sample["host_time"] + sample["offset"]
+        else:
+            # 没有时钟信息时按主机时区、零偏移处理
+            self.utc_offset = -time.timezone if not time.localtime().tm_isdst else -time.altzone
+            device_now = time.time()
+        self._capture_local = device_now + self.utc_offset
+        self.year = time.gmtime(self._capture_local).tm_year
+        self._month = 0
+        self._cached_key = b""
+        self._cached_epoch = 0.0
+
+    def _host_time(self, stamp: bytes) -> float:
+        key = stamp[:14]  # "MM-DD HH:MM:SS"
+        if key != self._cached_key:
+            month = int(key[0:2])
+            fields = (month, int(key[3:5]), int(key[6:8]), int(key[9:11]), int(key[12:14]), 0, 0, 0)
+            if self._month == 0 and calendar.timegm((self.year, *fields)) > self._capture_local + FUTURE_TOLERANCE:
+                self.year -= 1  # 首行不会晚于抓取时刻太多，只能是上一年的日志
+            elif month < self._month:
+                self.year += 1
+            self._month = month
+            device_epoch = calendar.timegm((self.year, *fields)) - self.utc_offset
+            offset = offset_at(self.log.clock, device_epoch) if self.log.clock else 0.0
+            self._cached_key = key
+            self._cached_epoch = device_epoch - offset
+        return self._cached_epoch + int(stamp[15:18]) / 1000
+
+    def __iter__(self) -> Iterator[Tuple[float, str, bytes]]:
+        label = self.log.label
+        last = 0.0
+        for path in self.log.paths:
+            with open_log_lines(path) as f:
+                for line in f:
+                    if line.startswith(b"--------- "):
+                        continue
+                    # 续行（无时间戳）沿用上一行的时间，保持在原位置
+                    if parse_line(line):
+                        last = self._host_time(line[:18])
+                    yield last, label, line
+
+
+def merge_timeline(root: str, output_path: str) -> dict:
+    """
+    把目录下多台设备的日志按修正后的主机时间 k 路归并为一条时间线
+    每台设备只保留当前行，内存占用与设备数成正比，与日志大小无关
+    """
+    started = time.perf_counter()
+    logs = discover_logs(root)
+    streams = [iter(DeviceStream(log)) for log in logs]
+    lines = 0
+    cached_sec, cached_text = -1, ""
+    with open(output_path, "wb", buffering=WRITE_BUFFER) as out:
+        for host_time, label, line in heapq.merge(*streams, key=itemgetter(0)):
+            sec, ms = divmod(int(host_time * 1000 + 0.5), 1000)
+            if sec != cached_sec:
+                cached_sec, cached_text = sec, time.strftime("%m-%d %H:%M:%S", time.localtime(sec))
+            prefix = f"{cached_text}.{ms:03d} [{label}] "
+            out.write(prefix.encode("utf-8") + line.rstrip(b"\r\n") + b"\n")
+            lines += 1
+    return {
+        "output": output_path,
+        "devices": [log.label for log in logs],
+        "uncorrected": [log.label for log in logs if not log.clock],
+        "offsets": {log.label: log.clock["samples"][0]["offset"] for log in logs if log.clock},
+        "lines": lines,
+        "elapsed": round(time.perf_counter() - started, 2),
+    }
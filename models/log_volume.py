@@ -0,0 +1,319 @@
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from models.log_timeline import discover_logs, open_log_lines
+from models.shell_batch import ShellBatch
+from utils.logcat_index import raw_header
+
+MAX_KEYS = 50000     # 每个维度最多跟踪的 key 数，超出的归入 OTHER，保证内存有上界
+WINDOW_TOP = 3       # 每个时间窗口保留的最吵 tag 数
+OTHER = b"(other)"
+LIVE_SAMPLES = 3
+LIVE_INTERVAL = 5.0
+
+# logcat -S：表头 "size/num main system ..."，各缓冲区的 Total / Now 行为 "字节/行数"
+_STATS_HEADER = re.compile(r"^size/num\s+(.+)$")
+_STATS_TOTALS = re.compile(r"^(Total|Now)\s+(.+)$")
+_CHATTIEST = re.compile(r"^Chattiest (\w+?)s? in (\w+) log buffer:")
+# 各节标题下一行是列名行（"UID   PACKAGE   BYTES   NUM"），各行的字节数与 BYTES 列右对齐，
+# 其后的 +/-（占比变化，如 "+1.2%"、"3X"）与 Pruned（丢弃行数）列只在开启裁剪的缓冲区出现，可能缺省
+_COLUMN_BYTES = re.compile(r"\b(?:BYTES|Size)\b")
+_TOKEN = re.compile(r"\S+")
+_CHANGE = re.compile(r"^[-+]?\d+(?:\.\d+)?[%X]$")
+# logcat -g："main: ring buffer is 2 MiB (254 KiB consumed), ..." / 旧版 "256Kb (253Kb consumed)"
+_RING = re.compile(r"^(\w+): ring buffer is (\d+(?:\.\d+)?)\s*([KMG]?)i?[Bb]\b")
+_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+class VolumeCounter:
+    """
+    按 tag / PID / 级别累计行数与字节数，并按分钟窗口记录总量与窗口内最吵的 tag
+    - 逐行只在当前窗口的 (级别, tag, PID) 组合表里做一次查找，窗口关闭时再折叠进各维度，
+      key 为行头原始字节（输出时才解码）
+    - 计数用 [行数, 字节] 两元列表，各维度 key 数超过 MAX_KEYS 后新 key 归入 OTHER
+    - 窗口只保留前 WINDOW_TOP 个 tag，内存与日志大小无关
+    """
+
+    def __init__(self):
+        self.lines = 0
+        self.bytes = 0
+        self.tags: Dict[bytes, List[int]] = {}
+        self.pids: Dict[bytes, List[int]] = {}
+        self.levels: Dict[bytes, List[int]] = {}
+        self.pid_tags: Dict[bytes, bytes] = {}   # PID 首次出现时的 tag，用于标识进程
+        self.windows: Dict[bytes, Tuple[int, int, List[Tuple[bytes, int]]]] = {}
+        self._window = b""
+        self._pending: Dict[Tuple[bytes, bytes, bytes], List[int]] = {}
+        self._last: Optional[List[int]] = None
+
+    def add(self, window: bytes, level: bytes, tag: bytes, pid: bytes, size: int) -> None:
+        if window != self._window:
+            self.close_window()
+            self._window = window
+        key = (level, tag, pid)
+        counts = self._pending.get(key)
+        if counts is None:
+            if len(self._pending) >= MAX_KEYS:
+                self._fold()
+            counts = self._pending[key] = [0, 0]
+        counts[0] += 1
+        counts[1] += size
+        self._last = counts
+
+    def add_continuation(self, size: int) -> None:
+        """续行（无行头，如堆栈）只计字节，归属上一行的级别 / tag / PID"""
+        if self._last is not None:
+            self._last[1] += size
+
+    @staticmethod
+    def _add(table: Dict[bytes, List[int]], key: bytes, lines: int, size: int) -> None:
+        counts = table.get(key)
+        if counts is None:
+            if len(table) >= MAX_KEYS:
+                key = OTHER
+            counts = table.setdefault(key, [0, 0])
+        counts[0] += lines
+        counts[1] += size
+
+    def _fold(self) -> None:
+        """把当前窗口的组合计数折叠进各维度与窗口统计"""
+        window_lines = window_bytes = 0
+        window_tags: Dict[bytes, int] = {}
+        for (level, tag, pid), (lines, size) in self._pending.items():
+            window_lines += lines
+            window_bytes += size
+            window_tags[tag] = window_tags.get(tag, 0) + size
+            self._add(self.tags, tag, lines, size)
+            self._add(self.levels, level, lines, size)
+            if pid not in self.pids and len(self.pids) < MAX_KEYS:
+                self.pid_tags[pid] = tag
+            self._add(self.pids, pid, lines, size)
+        self.lines += window_lines
+        self.bytes += window_bytes
+        if self._window and window_lines:
+            lines, size, tags = self.windows.get(self._window, (0, 0, []))
+            for tag, tag_bytes in tags:
+                window_tags[tag] = window_tags.get(tag, 0) + tag_bytes
+            top = sorted(window_tags.items(), key=lambda item: -item[1])[:WINDOW_TOP]
+            self.windows[self._window] = (lines + window_lines, size + window_bytes, top)
+        self._pending = {}
+        self._last = None
+
+    def close_window(self) -> None:
+        self._fold()
+        self._window = b""
+
+    def merge(self, other: "VolumeCounter") -> None:
+        """合并另一台设备的 tag / 级别计数（PID 在设备间不可比，不合并）"""
+        self.lines += other.lines
+        self.bytes += other.bytes
+        for table, source in ((self.tags, other.tags), (self.levels, other.levels)):
+            for key, (lines, size) in source.items():
+                counts = table.setdefault(key, [0, 0])
+                counts[0] += lines
+                counts[1] += size
+
+    def ranked(self, dimension: str, limit: int = None) -> List[Tuple[str, int, int]]:
+        """按字节数排序的 (名称, 行数, 字节)；dimension 为 tags / pids / levels，PID 附带其首个 tag"""
+        table = getattr(self, dimension)
+        rows = sorted(table.items(), key=lambda item: -item[1][1])[:limit]
+        ranked = []
+        for key, (lines, size) in rows:
+            name = _decode(key)
+            if dimension == "pids" and key in self.pid_tags:
+                name = f"{name} ({_decode(self.pid_tags[key])})"
+            ranked.append((name, lines, size))
+        return ranked
+
+    def peak_windows(self, limit: int = 5) -> List[Tuple[str, int, int, List[Tuple[str, int]]]]:
+        """字节最多的分钟窗口：(MM-DD HH:MM, 行数, 字节, [(tag, 字节)])"""
+        self.close_window()
+        rows = sorted(self.windows.items(), key=lambda item: -item[1][1])[:limit]
+        return [(_decode(window), lines, size, [(_decode(tag), tag_bytes) for tag, tag_bytes in tags])
+                for window, (lines, size, tags) in rows]
+
+
+def _decode(key: bytes) -> str:
+    return key.decode("utf-8", errors="replace")
+
+
+def count_log(paths: List[str], counter: VolumeCounter = None) -> VolumeCounter:
+    """单次顺序扫描一台设备的日志分段（明文 / gz / zst）"""
+    counter = counter or VolumeCounter()
+    for path in paths:
+        with open_log_lines(path) as f:
+            for line in f:
+                if line.startswith(b"--------- "):
+                    continue
+                parsed = raw_header(line)
+                if parsed:
+                    stamp, level, tag, pid = parsed
+                    counter.add(stamp[:11], level, tag, pid, len(line))
+                else:
+                    counter.add_continuation(len(line))
+    counter.close_window()
+    return counter
+
+
+def analyze_volume(root: str) -> dict:
+    """统计目录下每台设备的日志量，并汇总整个设备群按 tag / 级别的排名"""
+    started = time.perf_counter()
+    fleet = VolumeCounter()
+    devices = {}
+    files = 0
+    for log in discover_logs(root):
+        counter = count_log(log.paths, devices.get(log.label))
+        devices[log.label] = counter
+        files += len(log.paths)
+    for counter in devices.values():
+        fleet.merge(counter)
+    return {
+        "devices": dict(sorted(devices.items(), key=lambda item: -item[1].bytes)),
+        "fleet": fleet,
+        "files": files,
+        "lines": fleet.lines,
+        "bytes": fleet.bytes,
+        "elapsed": round(time.perf_counter() - started, 2),
+    }
+
+
+def _share(size: int, total: int) -> str:
+    return f"{size * 100 / total:5.1f}%" if total else "    -"
+
+
+def format_volume_table(counter: VolumeCounter, dimension: str = "tags", limit: int = 10) -> List[str]:
+    """排名表：字节占比、字节、行数、平均行长与 key"""
+    label = {"tags": "tag", "pids": "pid", "levels": "level"}[dimension]
+    rows = [f"{'#':>3} {'share':>6} {'KB':>10} {'lines':>9} {'avg':>5}  {label}"]
+    for rank, (name, lines, size) in enumerate(counter.ranked(dimension, limit), 1):
+        rows.append(f"{rank:>3} {_share(size, counter.bytes)} {size / 1024:>10.1f} {lines:>9} "
+                    f"{size // max(lines, 1):>5}  {name}")
+    return rows
+
+
+def write_volume_report(result: dict, path: str, limit: int = 30) -> None:
+    """完整报告：设备群排名 + 每台设备按 tag / PID / 级别的排名与最吵的分钟"""
+    fleet = result["fleet"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{result['lines']} lines, {result['bytes'] / 1048576:.1f} MB in {result['files']} files "
+                f"from {len(result['devices'])} devices\n")
+        f.write("\n=== Fleet: noisiest tags\n")
+        f.write("\n".join(format_volume_table(fleet, "tags", limit)) + "\n")
+        f.write("\n=== Fleet: levels\n")
+        f.write("\n".join(format_volume_table(fleet, "levels")) + "\n")
+        for label, counter in result["devices"].items():
+            f.write(f"\n=== {label}: {counter.lines} lines, {counter.bytes / 1048576:.1f} MB\n")
+            for dimension in ("tags", "pids", "levels"):
+                f.write(f"-- by {dimension[:-1]}\n")
+                f.write("\n".join(format_volume_table(counter, dimension, limit)) + "\n")
+            f.write("-- busiest minutes\n")
+            for window, lines, size, tags in counter.peak_windows():
+                top = ", ".join(f"{tag} {tag_bytes / 1024:.0f} KB" for tag, tag_bytes in tags)
+                f.write(f"{window}  {lines:>8} lines {size / 1024:>9.1f} KB  {top}\n")
+
+
+def parse_logd_stats(output: str) -> dict:
+    """
+    解析 logcat -S：返回 {"totals": {缓冲区: 累计字节}, "now": {缓冲区: 当前字节},
+    "sources": {(缓冲区, 类别, 来源): 当前占用字节}}；类别为 UID / PID / TID / TAG
+    """
+    buffers: List[str] = []
+    stats = {"totals": {}, "now": {}, "sources": {}}
+    section: Optional[Tuple[str, str]] = None
+    bytes_end: Optional[int] = None  # 列名行中 BYTES 列的结束位置
+    for line in output.splitlines():
+        header = _STATS_HEADER.match(line)
+        if header:
+            buffers = header.group(1).split()
+            continue
+        totals = _STATS_TOTALS.match(line)
+        if totals and buffers:
+            target = stats["totals" if totals.group(1) == "Total" else "now"]
+            for name, value in zip(buffers, totals.group(2).split()):
+                if name != "Total" and "/" in value:
+                    target[name] = int(value.split("/")[0])
+            continue
+        chattiest = _CHATTIEST.match(line)
+        if chattiest:
+            section = (chattiest.group(2), chattiest.group(1).upper())
+            bytes_end = None
+            continue
+        if not line.strip():
+            section = None
+            continue
+        if section:
+            column = _COLUMN_BYTES.search(line) if bytes_end is None else None
+            if column:
+                bytes_end = column.end()
+                continue
+            row = _parse_chattiest_row(line, bytes_end)
+            if row:
+                stats["sources"][(*section, row[0])] = row[1]
+    return stats
+
+
+def _parse_chattiest_row(line: str, bytes_end: Optional[int]) -> Optional[Tuple[str, int]]:
+    """拆出 (来源, 字节数)：先去掉 BYTES 列右侧的 +/- 与 Pruned 列，剩下的最后一列即字节数"""
+    tokens = list(_TOKEN.finditer(line))
+    while len(tokens) > 2 and (_CHANGE.match(tokens[-1].group()) or (
+            bytes_end is not None and tokens[-1].end() > bytes_end
+            and (tokens[-2].group().isdigit() or _CHANGE.match(tokens[-2].group())))):
+        tokens.pop()
+    if len(tokens) < 2 or not tokens[-1].group().isdigit():
+        return None
+    return " ".join(t.group() for t in tokens[:-1]), int(tokens[-1].group())
+
+
+def parse_ring_sizes(output: str) -> Dict[str, int]:
+    """解析 logcat -g，返回 {缓冲区: 环形缓冲区字节数}"""
+    sizes = {}
+    for line in output.splitlines():
+        match = _RING.match(line.strip())
+        if match:
+            name, value, unit = match.groups()
+            sizes[name] = int(float(value) * _UNITS[unit.upper()])
+    return sizes
+
+
+def sample_logd_volume(device_ip: str, samples: int = LIVE_SAMPLES, interval: float = LIVE_INTERVAL) -> dict:
+    """
+    实时采样：间隔 interval 秒多次读取 logd 自带的统计（logcat -S，一次往返同时取 -g 的缓冲区大小）
+    - 各缓冲区写入速率 = 两次采样间累计字节之差 / 时间，回绕周期 = 缓冲区大小 / 写入速率
+    - 来源排名按各次采样中占用缓冲区字节的平均值
+    返回 {rates, wrap, ring, sources: [(缓冲区, 类别, 来源, 平均字节, 占比)], samples}
+    """
+    snapshots = []
+    ring = {}
+    for i in range(samples):
+        if i:
+            time.sleep(interval)
+        steps = ShellBatch(device_ip).add("stats", "logcat -S").add("ring", "logcat -g").run(timeout=30)
+        stats = parse_logd_stats(steps["stats"].output) if "stats" in steps else None
+        if not stats or not (stats["totals"] or stats["sources"]):
+            raise RuntimeError("logcat -S returned no statistics (logd statistics may be disabled on this build)")
+        snapshots.append((time.monotonic(), stats))
+        if "ring" in steps:
+            ring = parse_ring_sizes(steps["ring"].output) or ring
+
+    rates, wrap = {}, {}
+    if len(snapshots) > 1:
+        (first_time, first), (last_time, last) = snapshots[0], snapshots[-1]
+        for name, total in last["totals"].items():
+            if name in first["totals"]:
+                rate = max(total - first["totals"][name], 0) / (last_time - first_time)
+                rates[name] = rate
+                if rate and ring.get(name):
+                    wrap[name] = ring[name] / rate
+
+    sums: Dict[Tuple[str, str, str], int] = {}
+    for _, stats in snapshots:
+        for key, size in stats["sources"].items():
+            sums[key] = sums.get(key, 0) + size
+    now = snapshots[-1][1]["now"]
+    sources = []
+    for (buffer, kind, source), total in sorted(sums.items(), key=lambda item: -item[1]):
+        average = total // len(snapshots)
+        share = average / now[buffer] if now.get(buffer) else 0.0
+        sources.append((buffer, kind, source, average, share))
+    return {"rates": rates, "wrap": wrap, "ring": ring, "sources": sources, "samples": len(snapshots)}
@@ -0,0 +1,333 @@
+import gzip
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import zlib
+from typing import Callable, Iterator, List, Optional
+
+from models.device_clock import measure_clock, save_clock
+from utils.adb_utils import NO_WINDOW
+from utils.logcat_binary import BinaryLogDecoder, LogFormatter, parse_utc_offset
+from utils.logcat_index import build_index
+from utils.yaml_tool import YamlTool
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时使用 gzip
+    zstandard = None
+
+CAPTURE_CONFIG_FILE = os.path.join("resources", "logcat_capture.yaml")
+DEFAULT_SEGMENT_BYTES = 64 << 20
+READ_CHUNK = 1 << 16
+COPY_CHUNK = 1 << 20
+
+
+def load_capture_config(path: str = CAPTURE_CONFIG_FILE) -> dict:
+    """
+    读取长时间抓取的默认参数，resources/logcat_capture.yaml 示例:
+        filterspecs: ["*:I", "chatty:S"]
+        buffers: [main, system, crash]
+        segment_mb: 64
+        segment_minutes: 30
+        compression: zstd
+        binary: false     # true 时以 logcat -B 传输、本地解析，CPU 开销大，长时间抓取不建议开启
+        index: true
+    """
+    config = YamlTool.load_yaml(path)
+    return {
+        "filterspecs": [str(s) for s in config.get("filterspecs") or []],
+        "buffers": [str(b) for b in config.get("buffers") or []],
+        "segment_bytes": int(float(config.get("segment_mb", DEFAULT_SEGMENT_BYTES >> 20)) * (1 << 20)),
+        "segment_seconds": float(config["segment_minutes"]) * 60 if config.get("segment_minutes") else None,
+        "compression": str(config.get("compression", "gzip")),
+        "binary": bool(config.get("binary", False)),
+        "index": bool(config.get("index", True)),
+    }
+
+
+def compress_segment(path: str, codec: str) -> str:
+    """流式压缩分段文件并删除原文件，返回压缩后的路径"""
+    if codec == "zstd" and zstandard is not None:
+        target = path + ".zst"
+        with open(path, "rb") as src, open(target, "wb") as dst:
+            zstandard.ZstdCompressor(level=3).copy_stream(src, dst, read_size=COPY_CHUNK)
+    elif codec in ("gzip", "zstd"):
+        target = path + ".gz"
+        with open(path, "rb") as src, gzip.open(target, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, COPY_CHUNK)
+    else:
+        return path
+    os.remove(path)
+    return target
+
+
+class LogcatCapture:
+    """
+    logcat 抓取引擎
+    - 按块读取 adb 输出直接写盘，内存占用与日志量无关
+    - 按大小或时间轮转分段，只在行边界切分；关闭的分段由后台线程压缩（zstd 可用时优先，否则 gzip）
+    - filterspecs / buffers 作为 logcat 参数在设备端过滤，减少传输量
+    - dump 模式（logcat -d）在设备支持 gzip 时压缩后传输，本地边读边解压
+    - binary 模式以 logcat -B 传输，本地解析后按 fmt 渲染为文本（时间按设备时区）
+    - exec-out（binary / wire_gzip）在设备不支持时（Android 5 之前）回退到 adb logcat 文本输出
+    - adb 的 stderr 写入临时文件；没有抓到任何输出时把它作为错误返回，不会静默留下空日志
+    - index 模式在分段关闭时建立旁路索引并按块压缩，之后可按时间 / tag / PID 只读取命中的块
+    - clock 模式在开始与结束时测量设备时钟偏移并写入 <日志>.clock.yaml，供多设备时间线对齐
+    """
+
+    def __init__(self, device_ip: str, path: str, fmt: str = "threadtime", filterspecs: List[str] = None,
+                 buffers: List[str] = None, dump: bool = False, segment_bytes: Optional[int] = None,
+                 segment_seconds: Optional[float] = None, compression: str = "none",
+                 wire_gzip: bool = False, binary: bool = False, index: bool = False,
+                 clock: bool = False, on_segment: Callable[[str], None] = None):
+        self.device_ip = device_ip
+        self.path = path
+        self.fmt = fmt
+        self.filterspecs = filterspecs or []
+        self.buffers = buffers or []
+        self.dump = dump
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.compression = "zstd" if compression == "zstd" and zstandard is not None else compression
+        self.wire_gzip = wire_gzip and dump
+        self.binary = binary
+        self.index = index
+        self.clock = clock
+        self.clock_samples: List[dict] = []
+        self.on_segment = on_segment or (lambda path: None)
+
+        self.segments: List[str] = []
+        self.bytes_written = 0
+        self.wire_bytes = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error = ""
+        self._stopping = False
+        self._proc: Optional[subprocess.Popen] = None
+        self._stderr = None
+        self._reader: Optional[threading.Thread] = None
+        self._compress_queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._compressor: Optional[threading.Thread] = None
+        self._segments_lock = threading.Lock()
+
+    # ----- 命令与分段 -----
+    def _logcat_args(self) -> List[str]:
+        args = ["logcat", "-B"] if self.binary else ["logcat", "-v", self.fmt]
+        if self.dump:
+            args.append("-d")
+        for buffer in self.buffers:
+            args += ["-b", buffer]
+        return args + self.filterspecs
+
+    @property
+    def _exec_out(self) -> bool:
+        return self.binary or self.wire_gzip
+
+    def _command(self) -> List[str]:
+        if self.binary:
+            # 二进制流必须走 exec-out（shell 的 pty 会改写 \n）；首行输出设备时区
+            script = f"date +%z; {' '.join(self._logcat_args())}"
+            if self.wire_gzip:
+                script = f"{{ {script}; }} | gzip -1"
+            return ["adb", "-s", self.device_ip, "exec-out", script]
+        if self.wire_gzip:
+            return ["adb", "-s", self.device_ip, "exec-out", " ".join(self._logcat_args()) + " | gzip -1"]
+        return ["adb", "-s", self.device_ip, *self._logcat_args()]
+
+    @property
+    def rotating(self) -> bool:
+        return bool(self.segment_bytes or self.segment_seconds)
+
+    def _segment_path(self, number: int) -> str:
+        if not self.rotating:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}_{number:03d}{ext or '.txt'}"
+
+    # ----- 生命周期 -----
+    def _measure_clock(self) -> None:
+        """时钟测量失败不影响抓取，只是时间线无法修正该设备"""
+        try:
+            self.clock_samples.append(measure_clock(self.device_ip))
+            save_clock(self.path, self.device_ip, self.clock_samples)
+        except Exception:
+            pass
+
+    def start(self) -> "LogcatCapture":
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if self.clock:
+            self._measure_clock()
+        self.started_at = time.monotonic()
+        self._spawn()
+        self._compressor = threading.Thread(target=self._compress_loop, daemon=True)
+        self._compressor.start()
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+        return self
+
+    def _spawn(self) -> None:
+        if self._stderr is not None:
+            self._stderr.close()
+        # stderr 写临时文件而不是管道，长时间抓取不会因管道写满而阻塞
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(
+            self._command(),
+            stdout=subprocess.PIPE,
+            stderr=self._stderr,
+            creationflags=NO_WINDOW
+        )
+
+    def _stderr_text(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode("utf-8", errors="ignore").strip()
+
+    def stop(self, timeout: float = 30) -> dict:
+        """结束 logcat 进程，等待最后一个分段写完并压缩"""
+        self._stopping = True
+        if self._proc and self._proc.poll() is None:
+            self._proc.terminate()
+        return self.wait(timeout)
+
+    def wait(self, timeout: float = None) -> dict:
+        """等待抓取结束（dump 模式下 logcat 自行退出），返回统计"""
+        if self._reader:
+            self._reader.join(timeout)
+            if self._reader.is_alive() and self._proc:
+                self._proc.kill()
+                self._reader.join(5)
+        if self._compressor:
+            self._compressor.join(timeout)
+        if self._proc:
+            try:
+                self._proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        if self.clock and len(self.clock_samples) == 1:
+            self._measure_clock()
+        return self.stats()
+
+    def stats(self) -> dict:
+        end = self.finished_at or time.monotonic()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        with self._segments_lock:
+            segments = list(self.segments)
+        return {
+            "segments": segments,
+            "bytes": self.bytes_written,
+            "elapsed": round(elapsed, 2),
+            "rate": self.bytes_written / elapsed if elapsed > 0 else 0.0,
+            "compression": self.compression,
+            "wire": "gzip" if self.wire_gzip else "none",
+            "wire_bytes": self.wire_bytes,
+            "format": "binary" if self.binary else "text",
+            "clock_offset": self.clock_samples[0]["offset"] if self.clock_samples else None,
+            "error": self.error,
+        }
+
+    # ----- 读取与轮转 -----
+    def _split_point(self, data: bytes, current_size: int, opened_at: float) -> int:
+        """需要轮转时返回本段最后一个字节的下标（总在换行处），否则返回 -1"""
+        if self.segment_bytes and current_size + len(data) > self.segment_bytes:
+            cut = data.rfind(b"\n", 0, max(self.segment_bytes - current_size, 0))
+            # 上限内没有行尾时在下一个行尾切分，分段最多超出一行
+            return cut if cut >= 0 else data.find(b"\n")
+        if self.segment_seconds and time.monotonic() - opened_at >= self.segment_seconds:
+            return data.rfind(b"\n")
+        return -1
+
+    def _read_chunks(self) -> Iterator[bytes]:
+        """adb 输出 → （解压）→（二进制解析并渲染）后的文本块"""
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if self.wire_gzip else None
+        binary = BinaryLogDecoder() if self.binary else None
+        formatter = None
+        header = b""
+        for chunk in iter(lambda: self._proc.stdout.read1(READ_CHUNK), b""):
+            self.wire_bytes += len(chunk)
+            data = decoder.decompress(chunk) if decoder else chunk
+            if binary is None:
+                yield data
+                continue
+            if formatter is None:
+                # 首行是 date +%z 的输出
+                header += data
+                newline = header.find(b"\n")
+                if newline < 0:
+                    continue
+                offset = parse_utc_offset(header[:newline].decode("ascii", errors="replace"))
+                formatter = LogFormatter(self.fmt, offset)
+                data, header = header[newline + 1:], b""
+            entries = binary.feed(data)
+            if entries:
+                yield formatter.render(entries)
+        if decoder:
+            tail = decoder.flush()
+            if binary is None:
+                yield tail
+            elif formatter is not None:
+                yield formatter.render(binary.feed(tail))
+        if binary is not None and binary.pending_bytes and self.dump:
+            self.error = f"Binary logcat stream ended inside an entry ({binary.pending_bytes} bytes left)"
+
+    def _read_stream(self) -> Iterator[bytes]:
+        """读取输出；exec-out 一个字节都没收到就退出时，按不支持 exec-out 处理并改用文本模式重新抓取"""
+        yield from self._read_chunks()
+        if self.wire_bytes or not self._exec_out or self._stopping or self._proc.wait() == 0:
+            return
+        self.binary = self.wire_gzip = False
+        self._spawn()
+        yield from self._read_chunks()
+
+    def _read_loop(self) -> None:
+        number = 1
+        current = open(self._segment_path(number), "wb")
+        current_size = 0
+        opened_at = time.monotonic()
+        try:
+            for data in self._read_stream():
+                while data:
+                    cut = self._split_point(data, current_size, opened_at)
+                    head, data = (data, b"") if cut < 0 else (data[:cut + 1], data[cut + 1:])
+                    current.write(head)
+                    current_size += len(head)
+                    self.bytes_written += len(head)
+                    if cut >= 0:
+                        current.close()
+                        self._compress_queue.put(current.name)
+                        number += 1
+                        current = open(self._segment_path(number), "wb")
+                        current_size = 0
+                        opened_at = time.monotonic()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            current.close()
+            self.finished_at = time.monotonic()
+            if not self.wire_bytes and not self.error:
+                self._proc.wait()
+                self.error = self._stderr_text() or f"logcat produced no output (adb exit code {self._proc.returncode})"
+            if current_size == 0 and number > 1:
+                os.remove(current.name)  # 轮转后没有新数据的空分段
+            else:
+                self._compress_queue.put(current.name)
+            self._compress_queue.put(None)
+
+    def _compress_loop(self) -> None:
+        while True:
+            path = self._compress_queue.get()
+            if path is None:
+                return
+            try:
+                if self.index:
+                    final = build_index(path, self.compression)
+                else:
+                    final = compress_segment(path, self.compression)
+            except Exception as e:
+                self.error = f"Compression failed for {path}: {e}"
+                final = path
+            with self._segments_lock:
+                self.segments.append(final)
+            self.on_segment(final)
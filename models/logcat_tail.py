@@ -0,0 +1,257 @@
+import re
+import subprocess
+import threading
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from models.log_alerts import AlertEngine
+from models.shell_batch import ShellBatch
+from utils.adb_utils import NO_WINDOW
+
+# 每台设备待显示行的上限，界面跟不上时丢弃最旧的行并计数
+TAIL_QUEUE_LINES = 2000
+PID_POLL_INTERVAL = 2.0
+# logcat --pid 与 -e 从 Android 7.0（API 24）开始支持
+PUSHDOWN_MIN_SDK = 24
+
+
+class TailFilter(NamedTuple):
+    """实时日志过滤条件"""
+    package: str = ""          # 只看该包进程（设备端 --pid，自动跟随重启）
+    specs: Tuple[str, ...] = ()  # tag:level 过滤，如 ActivityManager:I *:W
+    regex: str = ""            # 设备端 -e 正则，旧设备退回主机端
+    text: str = ""             # 主机端子串过滤，可随时修改
+
+
+class LogcatTail:
+    """
+    单台设备的实时 logcat
+    - 能下推的过滤在设备端完成（--pid、tag:level、-e），其余在读取线程中过滤，GUI 线程只取结果
+    - 后台轮询目标包 PID，进程重启后自动用新 PID 重开 logcat
+    - 有界队列：界面消费不及时时丢弃最旧的行，丢弃数在下次取出时汇总
+    """
+
+    def __init__(self, device_ip: str, tail_filter: TailFilter, max_lines: int = TAIL_QUEUE_LINES):
+        self.device_ip = device_ip
+        self.filter = tail_filter
+        self.host_text = tail_filter.text
+        self.max_lines = max_lines
+        self.status = "starting"
+        self.received = 0
+
+        self._lines: deque = deque()
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._proc: Optional[subprocess.Popen] = None
+        self._pid = ""
+        self._thread: Optional[threading.Thread] = None
+
+    # ----- 生命周期 -----
+    def start(self) -> "LogcatTail":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        proc = self._proc
+        if proc and proc.poll() is None:
+            proc.kill()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    # ----- 队列 -----
+    def _push(self, line: str) -> None:
+        with self._lock:
+            if len(self._lines) >= self.max_lines:
+                self._lines.popleft()
+                self._dropped += 1
+            self._lines.append(line)
+
+    def drain(self, limit: int) -> Tuple[List[str], int]:
+        """取出最多 limit 行，返回 (行, 自上次取出后丢弃的行数)"""
+        with self._lock:
+            count = min(limit, len(self._lines))
+            lines = [self._lines.popleft() for _ in range(count)]
+            dropped, self._dropped = self._dropped, 0
+        return lines, dropped
+
+    # ----- 设备交互 -----
+    def _probe(self) -> int:
+        steps = ShellBatch(self.device_ip).add("sdk", "getprop ro.build.version.sdk").run(timeout=15)
+        sdk = steps["sdk"].output.strip() if "sdk" in steps else ""
+        return int(sdk) if sdk.isdigit() else 0
+
+    def _current_pid(self) -> str:
+        """
+        pidof 在 Android 6 之前（toolbox）不存在，回退到 ps 在主机端解析：最后一列等于包名的行，PID 在第 2 列
+        """
+        package = self.filter.package
+        try:
+            output = subprocess.run(
+                ["adb", "-s", self.device_ip, "shell", f"pidof {package} 2>/dev/null || ps"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                timeout=10,
+                creationflags=NO_WINDOW
+            ).stdout
+        except Exception:
+            return self._pid
+        lines = output.strip().splitlines()
+        if len(lines) == 1 and all(token.isdigit() for token in lines[0].split()):
+            return lines[0].split()[0]
+        for line in lines:
+            columns = line.split()
+            if len(columns) > 2 and columns[-1] == package and columns[1].isdigit():
+                return columns[1]
+        return ""
+
+    def _watch_pid(self, pid: str) -> None:
+        """目标进程 PID 变化时结束当前 logcat，由主循环用新 PID 重开"""
+        while not self._stop.wait(PID_POLL_INTERVAL):
+            proc = self._proc
+            if proc is None or proc.poll() is not None:
+                return
+            if self._current_pid() != pid:
+                proc.kill()
+                return
+
+    def _run(self) -> None:
+        sdk = self._probe()
+        pushdown = sdk >= PUSHDOWN_MIN_SDK
+        host_regex = re.compile(self.filter.regex) if self.filter.regex and not pushdown else None
+
+        while not self._stop.is_set():
+            command = ["adb", "-s", self.device_ip, "logcat", "-v", "threadtime", "-T", "1"]
+            pid = ""
+            if self.filter.package:
+                pid = self._current_pid()
+                if not pid:
+                    self.status = f"waiting for {self.filter.package}"
+                    self._stop.wait(PID_POLL_INTERVAL)
+                    continue
+                if pid != self._pid:
+                    if self._pid:
+                        self._push(f"──── {self.filter.package} restarted: pid {self._pid} → {pid} ────")
+                    self._pid = pid
+                if pushdown:
+                    command += ["--pid", pid]
+            if self.filter.regex and pushdown:
+                command += ["-e", self.filter.regex]
+            command += list(self.filter.specs)
+
+            self._proc = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                creationflags=NO_WINDOW
+            )
+            self.status = f"tailing pid {pid}" if pid else "tailing"
+            if pid:
+                threading.Thread(target=self._watch_pid, args=(pid,), daemon=True).start()
+
+            # 旧设备不支持 --pid 时按 threadtime 第 3 列过滤
+            pid_column = pid if pid and not pushdown else ""
+            for raw in self._proc.stdout:
+                line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                self.received += 1
+                if pid_column:
+                    fields = line.split(None, 3)
+                    if len(fields) < 3 or fields[2] != pid_column:
+                        continue
+                if host_regex and not host_regex.search(line):
+                    continue
+                text = self.host_text
+                if text and text not in line:
+                    continue
+                self._push(line)
+            self._proc.wait()
+            if not self._stop.is_set() and not self.filter.package:
+                # 无包过滤时 logcat 退出说明设备断开，稍后重试
+                self.status = "disconnected, retrying"
+                self._stop.wait(PID_POLL_INTERVAL)
+        self.status = "stopped"
+
+
+class AlertWatcher:
+    """
+    告警专用的设备端不过滤 logcat（所有缓冲区的新行）
+    实时视图按包 / tag / 正则在设备端过滤，system_server 的 ANR、lmkd 查杀、watchdog 等行到不了视图，
+    因此告警单独读取一路完整日志；adb 断开后自动重连
+    """
+
+    def __init__(self, device_ip: str, alerts: AlertEngine):
+        self.device_ip = device_ip
+        self.alerts = alerts
+        self._stop = threading.Event()
+        self._proc: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "AlertWatcher":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        proc = self._proc
+        if proc and proc.poll() is None:
+            proc.kill()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._proc = subprocess.Popen(
+                ["adb", "-s", self.device_ip, "logcat", "-v", "threadtime", "-T", "1"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                creationflags=NO_WINDOW
+            )
+            for raw in self._proc.stdout:
+                self.alerts.feed(self.device_ip, raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+            self._proc.wait()
+            self._stop.wait(PID_POLL_INTERVAL)
+
+
+class LogcatTailManager:
+    """多设备实时日志：统一启动、停止，并按轮询节拍汇总各设备的新行"""
+
+    def __init__(self, max_lines: int = TAIL_QUEUE_LINES, alerts: Optional[AlertEngine] = None):
+        self.max_lines = max_lines
+        self.alerts = alerts
+        self.tails: Dict[str, LogcatTail] = {}
+        self.watchers: Dict[str, AlertWatcher] = {}
+
+    def start(self, devices: List[str], tail_filter: TailFilter) -> None:
+        self.stop()
+        self.tails = {d: LogcatTail(d, tail_filter, self.max_lines).start() for d in devices}
+        if self.alerts is not None:
+            self.watchers = {d: AlertWatcher(d, self.alerts).start() for d in devices}
+
+    def stop(self) -> None:
+        for tail in self.tails.values():
+            tail.stop()
+        for watcher in self.watchers.values():
+            watcher.stop()
+        self.watchers = {}
+
+    def set_host_text(self, text: str) -> None:
+        for tail in self.tails.values():
+            tail.host_text = text
+
+    def drain(self, per_device: int) -> Tuple[List[str], int]:
+        """每台设备最多取 per_device 行，带设备前缀；返回 (行, 本次汇总的丢弃数)"""
+        output, dropped_total = [], 0
+        for device_ip, tail in self.tails.items():
+            lines, dropped = tail.drain(per_device)
+            if dropped:
+                dropped_total += dropped
+                output.append(f"[{device_ip}] … {dropped} lines dropped (view could not keep up)")
+            output.extend(f"[{device_ip}] {line}" for line in lines)
+        return output, dropped_total
+
+    def status(self) -> Dict[str, str]:
+        return {device_ip: tail.status for device_ip, tail in self.tails.items()}
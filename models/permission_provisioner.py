@@ -0,0 +1,98 @@
+import os
+import re
+from typing import Dict, List, Optional
+
+from models.shell_batch import ShellBatch
+from utils.yaml_tool import YamlTool
+
+PROVISIONING_FILE = os.path.join("resources", "provisioning.yaml")
+
+# AOSP 运行时（dangerous）权限，只有这些可以用 pm grant 授予
+DANGEROUS_PERMISSIONS = frozenset(f"android.permission.{name}" for name in (
+    "READ_CALENDAR", "WRITE_CALENDAR",
+    "CAMERA",
+    "READ_CONTACTS", "WRITE_CONTACTS", "GET_ACCOUNTS",
+    "ACCESS_FINE_LOCATION", "ACCESS_COARSE_LOCATION", "ACCESS_BACKGROUND_LOCATION", "ACCESS_MEDIA_LOCATION",
+    "RECORD_AUDIO",
+    "READ_PHONE_STATE", "READ_PHONE_NUMBERS", "CALL_PHONE", "ANSWER_PHONE_CALLS", "ADD_VOICEMAIL", "USE_SIP",
+    "PROCESS_OUTGOING_CALLS", "ACCEPT_HANDOVER", "READ_CALL_LOG", "WRITE_CALL_LOG",
+    "BODY_SENSORS", "BODY_SENSORS_BACKGROUND", "ACTIVITY_RECOGNITION",
+    "SEND_SMS", "RECEIVE_SMS", "READ_SMS", "RECEIVE_WAP_PUSH", "RECEIVE_MMS",
+    "READ_EXTERNAL_STORAGE", "WRITE_EXTERNAL_STORAGE",
+    "READ_MEDIA_IMAGES", "READ_MEDIA_VIDEO", "READ_MEDIA_AUDIO", "READ_MEDIA_VISUAL_USER_SELECTED",
+    "BLUETOOTH_SCAN", "BLUETOOTH_CONNECT", "BLUETOOTH_ADVERTISE",
+    "NEARBY_WIFI_DEVICES", "UWB_RANGING",
+    "POST_NOTIFICATIONS",
+))
+
+_RESULT_RE = re.compile(r"^([+-])(\S+)$", re.MULTILINE)
+
+
+def dangerous_permissions(permissions: List[str]) -> List[str]:
+    """从声明的权限中筛出运行时权限"""
+    return [p for p in permissions if p in DANGEROUS_PERMISSIONS]
+
+
+class PermissionProvisioner:
+    """
+    运行时权限与 app-ops 预授权
+    - 每台设备所有 pm grant / appops set 编译成一个批处理，一次 adb 往返
+    - 未给出权限列表时在设备端读取包的 requested permissions，与运行时权限取交集
+    - resources/provisioning.yaml 可配置额外的 app-ops 与通知设置，按包名覆盖默认值:
+        default:
+          appops: {SYSTEM_ALERT_WINDOW: allow}
+          notifications: true
+        packages:
+          com.example.app:
+            appops: {REQUEST_INSTALL_PACKAGES: allow}
+            skip: [android.permission.ACCESS_BACKGROUND_LOCATION]
+    """
+
+    def __init__(self, config_path: str = PROVISIONING_FILE):
+        self.config_path = config_path
+
+    def settings(self, package_name: str) -> dict:
+        """合并默认配置与包级配置"""
+        config = YamlTool.load_yaml(self.config_path)
+        default = config.get("default") or {}
+        override = (config.get("packages") or {}).get(package_name) or {}
+        return {
+            "appops": {**(default.get("appops") or {}), **(override.get("appops") or {})},
+            "notifications": bool(override.get("notifications", default.get("notifications", True))),
+            "skip": set(default.get("skip") or []) | set(override.get("skip") or []),
+        }
+
+    def build_batch(self, device_ip: str, package_name: str, permissions: Optional[List[str]] = None) -> ShellBatch:
+        settings = self.settings(package_name)
+        batch = ShellBatch(device_ip)
+        if permissions is None:
+            # 设备端解析 requested permissions，只保留运行时权限
+            wanted = " ".join(f"-e {p}" for p in sorted(DANGEROUS_PERMISSIONS - settings["skip"]))
+            batch.add("requested", (
+                f"perms=$(dumpsys package {package_name} | sed -n '/requested permissions:/,/permissions:/p'"
+                f" | grep -o 'android\\.permission\\.[A-Z_]*' | sort -u | grep -x {wanted}); echo $perms"
+            ))
+        else:
+            perms = [p for p in dangerous_permissions(permissions) if p not in settings["skip"]]
+            batch.add("requested", f"perms=\"{' '.join(perms)}\"; echo $perms")
+        batch.add("grant", f"for p in $perms; do pm grant {package_name} $p >/dev/null 2>&1 && echo +$p || echo -$p; done")
+
+        appops: Dict[str, str] = dict(settings["appops"])
+        if settings["notifications"]:
+            appops.setdefault("POST_NOTIFICATION", "allow")
+        if appops:
+            batch.add("appops", "; ".join(
+                f"appops set {package_name} {op} {mode} >/dev/null 2>&1 && echo +{op} || echo -{op}"
+                for op, mode in appops.items()
+            ))
+        return batch
+
+    def provision(self, device_ip: str, package_name: str, permissions: Optional[List[str]] = None) -> dict:
+        """授予权限并设置 app-ops，返回成功与失败的条目"""
+        steps = self.build_batch(device_ip, package_name, permissions).run(timeout=60)
+        granted, failed = [], []
+        for name in ("grant", "appops"):
+            if name in steps:
+                for sign, item in _RESULT_RE.findall(steps[name].output):
+                    (granted if sign == "+" else failed).append(item.replace("android.permission.", ""))
+        return {"granted": granted, "failed": failed}
@@ -0,0 +1,161 @@
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import uuid
+from typing import Dict, List, NamedTuple, Tuple
+
+from utils.adb_utils import NO_WINDOW
+
+# 没有 shell_v2 的旧 adbd（Android 7 之前，STB 上很常见）命令长度上限约 4 KB（含服务前缀）
+LEGACY_COMMAND_MAX = 3072
+REMOTE_SCRIPT_DIR = "/data/local/tmp"
+
+_shell_v2: Dict[str, bool] = {}
+_shell_v2_lock = threading.Lock()
+
+
+def supports_shell_v2(device_ip: str) -> bool:
+    """
+    设备 adbd 是否支持 shell_v2（adb features），结果按设备缓存
+    不支持时 adb shell 不会把 stdin 的 EOF 传给设备端，从 stdin 喂脚本会一直阻塞到超时
+    """
+    with _shell_v2_lock:
+        cached = _shell_v2.get(device_ip)
+    if cached is not None:
+        return cached
+    try:
+        output = subprocess.run(
+            ["adb", "-s", device_ip, "features"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            timeout=10,
+            creationflags=NO_WINDOW
+        ).stdout
+    except Exception:
+        return False  # 探测失败不缓存，下次再试
+    supported = re.search(r"\bshell_v2\b", output) is not None
+    with _shell_v2_lock:
+        _shell_v2[device_ip] = supported
+    return supported
+
+
+class StepResult(NamedTuple):
+    """批处理中单个步骤的执行结果"""
+    name: str
+    exit_code: int
+    output: str
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+
+class ShellBatch:
+    """
+    把多个设备端命令编译成一个脚本，通过 stdin 交给同一个 `adb shell sh` 执行
+    - 整个批次只有一次 adb 往返，高延迟的无线设备上收益明显
+    - 支持 shell_v2 的设备从 stdin 传脚本；旧设备改为命令行参数传入，脚本过长时先 push 到设备再执行
+    - 各步骤在同一个 shell 中顺序执行，可以通过 shell 变量传递中间结果
+    - 每步输出用随机标记分隔，回来后按步骤拆分并带上退出码
+    """
+
+    def __init__(self, device_ip: str):
+        self.device_ip = device_ip
+        self._steps: List[Tuple[str, str, bool]] = []
+        self._token = uuid.uuid4().hex[:12]
+
+    def add(self, name: str, command: str, stop_on_error: bool = False) -> "ShellBatch":
+        """
+        追加一个步骤
+        参数:
+            name: 步骤名，用于取回结果
+            command: 设备端 sh 命令
+            stop_on_error: 该步骤失败时跳过后续步骤
+        """
+        self._steps.append((name, command, stop_on_error))
+        return self
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def compile(self) -> str:
+        begin, end = f"__ADBLAB_BEGIN_{self._token}__", f"__ADBLAB_END_{self._token}__"
+        script = []
+        for name, command, stop_on_error in self._steps:
+            script.append(f"echo {begin} {name}")
+            script.append(f"{{ {command}\n}} 2>&1")
+            script.append("rc=$?")
+            script.append(f"echo {end} {name} $rc")
+            if stop_on_error:
+                script.append("[ $rc -eq 0 ] || exit 0")
+        return "\n".join(script) + "\n"
+
+    def parse(self, output: str) -> Dict[str, StepResult]:
+        """按标记拆分输出；未执行到的步骤不会出现在结果中"""
+        begin, end = f"__ADBLAB_BEGIN_{self._token}__", f"__ADBLAB_END_{self._token}__"
+        results: Dict[str, StepResult] = {}
+        current, buffer = None, []
+        for line in output.splitlines():
+            if line.startswith(begin):
+                current, buffer = line[len(begin):].strip(), []
+            elif line.startswith(end) and current is not None:
+                parts = line[len(end):].split()
+                code = int(parts[-1]) if parts and parts[-1].lstrip("-").isdigit() else -1
+                results[current] = StepResult(current, code, "\n".join(buffer).strip())
+                current = None
+            elif current is not None:
+                buffer.append(line.rstrip("\r"))
+        return results
+
+    def run(self, timeout: int = 60) -> Dict[str, StepResult]:
+        """一次 adb 调用执行全部步骤"""
+        script = self.compile()
+        if supports_shell_v2(self.device_ip):
+            result = self._adb(["shell", "sh"], timeout, script)
+        elif len(script) <= LEGACY_COMMAND_MAX:
+            # 旧版 adb shell 把参数原样交给设备端 sh -c，多行脚本可以直接执行
+            result = self._adb(["shell", script], timeout)
+        else:
+            result = self._run_pushed(script, timeout)
+        steps = self.parse(result.stdout)
+        if not steps and result.returncode != 0:
+            raise RuntimeError(result.stdout.strip() or f"exit code {result.returncode}")
+        return steps
+
+    def _adb(self, args: List[str], timeout: int, script: str = None) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            ["adb", "-s", self.device_ip, *args],
+            input=script,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+            timeout=timeout,
+            creationflags=NO_WINDOW
+        )
+
+    def _run_pushed(self, script: str, timeout: int) -> subprocess.CompletedProcess:
+        """超出旧版命令长度上限的脚本：push 为设备端临时文件执行后删除"""
+        remote = f"{REMOTE_SCRIPT_DIR}/adblab_{self._token}.sh"
+        with tempfile.NamedTemporaryFile("w", suffix=".sh", delete=False, encoding="utf-8", newline="\n") as f:
+            f.write(script)
+            local = f.name
+        try:
+            pushed = self._adb(["push", local, remote], timeout)
+            if pushed.returncode != 0:
+                raise RuntimeError(f"Failed to push batch script: {pushed.stdout.strip()}")
+        finally:
+            os.remove(local)
+        return self._adb(["shell", f"sh {remote}; rm -f {remote}"], timeout)
+
+
+def format_steps(steps: Dict[str, StepResult]) -> str:
+    """把步骤结果拼成日志输出"""
+    return "\n".join(
+        f"[{step.name}] {'ok' if step.ok else f'exit {step.exit_code}'}" + (f": {step.output}" if step.output else "")
+        for step in steps.values()
+    )
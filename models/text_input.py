@@ -0,0 +1,136 @@
+import base64
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from models.shell_batch import ShellBatch
+
+ADB_KEYBOARD_IME = "com.android.adbkeyboard/.AdbIME"
+CLIPPER_PACKAGE = "ca.zgrs.clipper"
+KEYCODE_PASTE = 279
+
+# input text 每次注入的字符数，过长的参数在部分 ROM 上会被截断
+INPUT_CHUNK_SIZE = 64
+# 广播方式单次发送的字符数
+BROADCAST_CHUNK_SIZE = 1000
+# ime set 是异步生效的：每 0.1 秒检查一次 default_input_method，最多检查的次数
+IME_ACTIVATE_POLLS = 50
+
+METHOD_IME = "ime"
+METHOD_CLIPBOARD = "clipboard"
+METHOD_INPUT = "input"
+
+
+def shell_quote(text: str) -> str:
+    """设备端 sh 单引号转义"""
+    return "'" + text.replace("'", "'\\''") + "'"
+
+
+def escape_input_text(text: str) -> str:
+    """input text 参数转义：空格写作 %s，再整体单引号包裹"""
+    return shell_quote(text.replace(" ", "%s"))
+
+
+def encode_text_b64(text: str) -> str:
+    """ADBKeyboard 的 ADB_INPUT_B64 广播使用 UTF-8 Base64，可携带任意字符"""
+    return base64.b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def chunk_text(text: str, size: int) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TextInjector:
+    """
+    多通道文本注入
+    - 已安装 ADBKeyboard：Base64 广播，支持中文/表情等任意字符
+    - 已安装 Clipper：写剪贴板后发送粘贴键
+    - 否则回退到 input text（仅 ASCII），分块后在同一个 shell 中执行
+    """
+
+    def __init__(self):
+        self._capabilities: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _run_script(device_ip: str, script: str, timeout: int = 60) -> str:
+        """经 ShellBatch 执行（旧设备没有 shell_v2 时不走 stdin），失败时抛出 RuntimeError"""
+        steps = ShellBatch(device_ip).add("script", script).run(timeout=timeout)
+        step = steps.get("script")
+        if step is None or not step.ok:
+            raise RuntimeError(step.output if step and step.output else
+                               f"exit code {step.exit_code if step else 'unknown'}")
+        return step.output
+
+    def probe(self, device_ip: str, refresh: bool = False) -> dict:
+        """一次 shell 调用探测可用的快速通道，结果按设备缓存"""
+        with self._lock:
+            if not refresh and device_ip in self._capabilities:
+                return self._capabilities[device_ip]
+
+        output = self._run_script(device_ip, (
+            "ime list -s 2>/dev/null; echo __SEP__; "
+            "settings get secure default_input_method; echo __SEP__; "
+            f"pm path {CLIPPER_PACKAGE} 2>/dev/null\n"
+        ), timeout=20)
+        parts = (output.split("__SEP__") + ["", "", ""])[:3]
+        capabilities = {
+            "ime": ADB_KEYBOARD_IME in parts[0],
+            "default_ime": parts[1].strip(),
+            "clipboard": "package:" in parts[2],
+        }
+        with self._lock:
+            self._capabilities[device_ip] = capabilities
+        return capabilities
+
+    def build_script(self, text: str, capabilities: dict) -> Tuple[str, str]:
+        """按设备能力生成注入脚本，返回 (通道, 脚本)"""
+        if capabilities.get("ime"):
+            previous = capabilities.get("default_ime", "")
+            switch = previous and previous != ADB_KEYBOARD_IME and previous != "null"
+            # am broadcast 会阻塞到接收方处理完毕，之后再恢复原输入法
+            broadcasts = [f"am broadcast -a ADB_INPUT_B64 --es msg {encode_text_b64(chunk)} >/dev/null"
+                          for chunk in chunk_text(text, BROADCAST_CHUNK_SIZE)]
+            if not switch:
+                return METHOD_IME, "\n".join(broadcasts) + "\n"
+            # 等 ADBKeyboard 真正成为当前输入法再广播，否则广播没有接收方，文本静默丢失
+            lines = [
+                f"ime set {ADB_KEYBOARD_IME} >/dev/null",
+                "n=0",
+                f"while [ \"$(settings get secure default_input_method)\" != \"{ADB_KEYBOARD_IME}\" ] "
+                f"&& [ $n -le {IME_ACTIVATE_POLLS} ]; do",
+                "  n=$((n+1)); sleep 0.1 2>/dev/null || sleep 1",
+                "done",
+                f"if [ $n -gt {IME_ACTIVATE_POLLS} ]; then",
+                f"  ime set {previous} >/dev/null; echo 'ADBKeyboard did not become the active IME'; false",
+                "else",
+                *(f"  {line}" for line in broadcasts),
+                f"  ime set {previous} >/dev/null",
+                "fi",
+            ]
+            return METHOD_IME, "\n".join(lines) + "\n"
+
+        if capabilities.get("clipboard"):
+            lines = []
+            for chunk in chunk_text(text, BROADCAST_CHUNK_SIZE):
+                lines.append(f"am broadcast -a clipper.set -e text {shell_quote(chunk)} >/dev/null")
+                lines.append(f"input keyevent {KEYCODE_PASTE}")
+            return METHOD_CLIPBOARD, "\n".join(lines) + "\n"
+
+        if not text.isascii():
+            raise ValueError("Non-ASCII text requires ADBKeyboard (com.android.adbkeyboard) on the device")
+        lines = [f"input text {escape_input_text(chunk)}" for chunk in chunk_text(text, INPUT_CHUNK_SIZE)]
+        return METHOD_INPUT, "\n".join(lines) + "\n"
+
+    def inject(self, device_ip: str, text: str) -> dict:
+        """向单台设备注入文本，整个过程只占一次 adb shell 调用（首次额外探测一次）"""
+        start = time.perf_counter()
+        capabilities = self.probe(device_ip)
+        method, script = self.build_script(text, capabilities)
+        output = self._run_script(device_ip, script, timeout=30 + len(text) // 10)
+        return {
+            "method": method,
+            "chunks": script.count("am broadcast") or script.count("input text"),
+            "output": output,
+            "elapsed_ms": int((time.perf_counter() - start) * 1000),
+        }
@@ -0,0 +1,297 @@
+import ipaddress
+import os
+import re
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from utils.adb_utils import NO_WINDOW
+from utils.yaml_tool import YamlTool
+
+LINKS_FILE = os.path.join("resources", "transfer_links.yaml")
+
+DEFAULT_START_SLOTS = 2
+DEFAULT_MAX_SLOTS = 8
+# 并发数提升后聚合吞吐至少提高 10% 才继续加，下降 5% 以上则回退
+GROW_RATIO = 1.10
+SHRINK_RATIO = 0.95
+# 传输预计耗时超过超时预算的该比例时，立即收紧并发
+TIMEOUT_GUARD = 0.7
+# 两次并发调整之间至少间隔的秒数，让吞吐样本稳定下来
+ADAPT_INTERVAL = 2.0
+# 聚合吞吐的采样窗口（秒），窗口内并发数变化时丢弃该样本
+SAMPLE_WINDOW = 1.0
+
+_USB_RE = re.compile(r"\busb:(\S+)")
+
+
+class TransferTicket:
+    """单个传输的实时状态"""
+
+    def __init__(self, device_ip: str, link: str, size: int, timeout: float):
+        self.device_ip = device_ip
+        self.link = link
+        self.size = size
+        self.timeout = timeout
+        self.queued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.sent = 0
+
+    def update(self, sent_delta: int) -> None:
+        self.sent += sent_delta
+
+    @property
+    def rate(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return self.sent / max(time.monotonic() - self.started_at, 1e-6)
+
+    @property
+    def eta(self) -> float:
+        rate = self.rate
+        return (self.size - self.sent) / rate if rate > 0 else float("inf")
+
+    def at_risk(self) -> bool:
+        """按当前速度预计会用掉大部分超时预算"""
+        if self.started_at is None or self.sent < self.size * 0.05:
+            return False
+        projected = time.monotonic() - self.started_at + self.eta
+        return projected > self.timeout * TIMEOUT_GUARD
+
+
+class LinkState:
+    """共享同一物理链路（同一 AP/网段或同一 USB Hub）的设备组"""
+
+    def __init__(self, name: str, start_slots: int, max_slots: int):
+        self.name = name
+        self.slots = start_slots
+        self.max_slots = max_slots
+        self.active: List[TransferTicket] = []
+        self.waiting = 0
+        # 并发数 -> 该并发下聚合吞吐的滑动平均（字节/秒）
+        self.rate_by_level: Dict[int, float] = {}
+        self.transferred = 0
+        self.busy_time = 0.0
+        self._busy_since: Optional[float] = None
+        self._last_adapt = 0.0
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_level = 0
+        self.current_rate = 0.0
+
+    def aggregate_rate(self) -> float:
+        return self.current_rate if self.active else 0.0
+
+    def record(self, sent: int) -> None:
+        """累计窗口字节数，窗口结束时按当时的并发数记录一个聚合吞吐样本"""
+        self._window_bytes += sent
+        now = time.monotonic()
+        age = now - self._window_start
+        if age < SAMPLE_WINDOW:
+            return
+        self.current_rate = self._window_bytes / age
+        level = len(self.active)
+        if level and level == self._window_level:
+            previous = self.rate_by_level.get(level)
+            self.rate_by_level[level] = self.current_rate if previous is None else previous * 0.7 + self.current_rate * 0.3
+        self.reset_window(now)
+
+    def reset_window(self, now: float) -> None:
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_level = len(self.active)
+
+    def adapt(self) -> None:
+        """爬山法调整并发：更多并发带来更高聚合吞吐就继续加，否则回退"""
+        now = time.monotonic()
+        if now - self._last_adapt < ADAPT_INTERVAL:
+            return
+        self._last_adapt = now
+        if any(t.at_risk() for t in self.active):
+            self.slots = max(1, min(self.slots, len(self.active)) - 1)
+            return
+        current = self.rate_by_level.get(self.slots)
+        lower = self.rate_by_level.get(self.slots - 1)
+        if current is None:
+            return
+        if lower is not None and current < lower * SHRINK_RATIO:
+            self.slots = max(1, self.slots - 1)
+        elif (lower is None or current > lower * GROW_RATIO) and self.slots < self.max_slots:
+            self.slots += 1
+
+    def mark_busy(self, now: float) -> None:
+        if self.active and self._busy_since is None:
+            self._busy_since = now
+        elif not self.active and self._busy_since is not None:
+            self.busy_time += now - self._busy_since
+            self._busy_since = None
+
+
+class TransferScheduler:
+    """
+    按链路分组的传输准入控制
+    - 设备按配置（网段 / USB Hub）归入链路，未配置时无线设备按 /24 网段、USB 设备按 Hub 分组
+    - 每条链路维护一个并发窗口，按实测聚合吞吐自适应增减，有传输可能超时时立即收紧
+    - 提供每台设备的实时吞吐与 ETA，以及每条链路的聚合吞吐
+    resources/transfer_links.yaml 示例:
+        links:
+          lab-ap-1: {match: ["192.168.10.0/24"], max_concurrent: 6}
+          usb-hub-a: {match: ["usb:1-1"], max_concurrent: 3}
+    """
+
+    def __init__(self, config_path: str = LINKS_FILE):
+        self._cond = threading.Condition()
+        self._links: Dict[str, LinkState] = {}
+        self._tickets: Dict[str, TransferTicket] = {}
+        self._device_links: Dict[str, str] = {}
+        self._usb_paths: Dict[str, str] = {}
+        self._config = YamlTool.load_yaml(config_path).get("links") or {}
+
+    # ----- 链路归属 -----
+    def _refresh_usb_paths(self) -> None:
+        output = subprocess.run(
+            ["adb", "devices", "-l"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            errors="ignore",
+            timeout=10,
+            creationflags=NO_WINDOW
+        ).stdout
+        for line in output.splitlines()[1:]:
+            match = _USB_RE.search(line)
+            if match and line.split():
+                self._usb_paths[line.split()[0]] = match.group(1)
+
+    def link_of(self, device_ip: str) -> str:
+        """设备所属链路名，结果缓存"""
+        link = self._device_links.get(device_ip)
+        if link:
+            return link
+
+        host = device_ip.rsplit(":", 1)[0]
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            address = None
+        if address is None and device_ip not in self._usb_paths:
+            try:
+                self._refresh_usb_paths()
+            except Exception:
+                pass
+        usb_path = self._usb_paths.get(device_ip, "")
+
+        for name, spec in self._config.items():
+            for rule in (spec or {}).get("match", []):
+                rule = str(rule)
+                if rule.startswith("usb:"):
+                    if usb_path and usb_path.startswith(rule[4:]):
+                        link = name
+                elif address is not None:
+                    try:
+                        if address in ipaddress.ip_network(rule, strict=False):
+                            link = name
+                    except ValueError:
+                        continue
+                if link:
+                    break
+            if link:
+                break
+
+        if not link:
+            if address is not None:
+                link = f"net:{ipaddress.ip_network(f'{host}/24', strict=False)}"
+            else:
+                # USB 端口路径形如 1-1.3，去掉最后一级端口即为所在 Hub
+                link = f"usb:{usb_path.rsplit('.', 1)[0]}" if usb_path else "usb"
+        self._device_links[device_ip] = link
+        return link
+
+    def _link_state(self, name: str) -> LinkState:
+        state = self._links.get(name)
+        if state is None:
+            spec = self._config.get(name) or {}
+            max_slots = int(spec.get("max_concurrent", DEFAULT_MAX_SLOTS))
+            state = LinkState(name, min(DEFAULT_START_SLOTS, max_slots), max_slots)
+            self._links[name] = state
+        return state
+
+    # ----- 准入 -----
+    @contextmanager
+    def slot(self, device_ip: str, size: int, timeout: float, on_wait: Callable[[str], None] = None):
+        """
+        获取链路上的传输名额，阻塞直到准入；超时预算从准入后开始计算
+        用法:
+            with scheduler.slot(device, size, timeout) as ticket:
+                ... 每写入一块调用 scheduler.update(ticket, n)
+        """
+        link = self.link_of(device_ip)
+        ticket = TransferTicket(device_ip, link, size, timeout)
+        with self._cond:
+            state = self._link_state(link)
+            self._tickets[device_ip] = ticket
+            state.waiting += 1
+            if len(state.active) >= state.slots and on_wait:
+                on_wait(link)
+            while len(state.active) >= state.slots:
+                self._cond.wait(timeout=1.0)
+                slots = state.slots
+                state.adapt()
+                if state.slots > slots:
+                    self._cond.notify_all()
+            state.waiting -= 1
+            ticket.started_at = time.monotonic()
+            state.active.append(ticket)
+            state.reset_window(ticket.started_at)
+            state.mark_busy(ticket.started_at)
+        try:
+            yield ticket
+        finally:
+            with self._cond:
+                state.adapt()
+                state.active.remove(ticket)
+                state.reset_window(time.monotonic())
+                state.transferred += ticket.sent
+                state.mark_busy(time.monotonic())
+                self._cond.notify_all()
+
+    def update(self, ticket: TransferTicket, sent_delta: int) -> None:
+        ticket.update(sent_delta)
+        with self._cond:
+            state = self._links.get(ticket.link)
+            if state is not None:
+                state.record(sent_delta)
+
+    # ----- 统计 -----
+    def device_status(self, device_ip: str) -> dict:
+        """设备当前（或最近一次）传输的吞吐与 ETA"""
+        ticket = self._tickets.get(device_ip)
+        if ticket is None:
+            return {}
+        return {
+            "link": ticket.link,
+            "queued": ticket.started_at is None,
+            "sent": ticket.sent,
+            "total": ticket.size,
+            "rate": ticket.rate,
+            "eta": ticket.eta if ticket.started_at is not None else None,
+        }
+
+    def link_stats(self) -> Dict[str, dict]:
+        """每条链路的并发窗口、排队数与聚合吞吐"""
+        with self._cond:
+            stats = {}
+            for name, state in self._links.items():
+                busy = state.busy_time + (time.monotonic() - state._busy_since if state._busy_since else 0)
+                stats[name] = {
+                    "slots": state.slots,
+                    "active": len(state.active),
+                    "waiting": state.waiting,
+                    "rate": state.aggregate_rate(),
+                    "average_rate": state.transferred / busy if busy > 0 else 0.0,
+                    "transferred": state.transferred,
+                }
+            return stats
@@ -0,0 +1,299 @@
+import hashlib
+import io
+import re
+import subprocess
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils.adb_utils import NO_WINDOW, run_adb_bytes
+
+# 节点布尔属性压缩为位标记
+FLAG_CLICKABLE = 1 << 0
+FLAG_FOCUSABLE = 1 << 1
+FLAG_FOCUSED = 1 << 2
+FLAG_SELECTED = 1 << 3
+FLAG_ENABLED = 1 << 4
+FLAG_CHECKED = 1 << 5
+FLAG_SCROLLABLE = 1 << 6
+
+_FLAG_ATTRS = (
+    ("clickable", FLAG_CLICKABLE),
+    ("focusable", FLAG_FOCUSABLE),
+    ("focused", FLAG_FOCUSED),
+    ("selected", FLAG_SELECTED),
+    ("enabled", FLAG_ENABLED),
+    ("checked", FLAG_CHECKED),
+    ("scrollable", FLAG_SCROLLABLE),
+)
+_BOUNDS_RE = re.compile(r"\[(-?\d+),(-?\d+)\]\[(-?\d+),(-?\d+)\]")
+_DEVICE_XML_PATH = "/data/local/tmp/adblab_ui.xml"
+_DIGITS_RE = re.compile(r"\d+")
+_COMPONENT_RE = re.compile(r"([A-Za-z][\w.]*)/([\w.$]+)")
+
+# 前台窗口采样间隔（秒）：Monkey 轮询与 D-pad 遍历按同一节奏统计窗口覆盖率，结果才可比
+WINDOW_SAMPLE_INTERVAL = 2.0
+
+
+class UiNode(NamedTuple):
+    """UI 层级中的单个节点（紧凑元组存储）"""
+    index: int
+    parent: int
+    depth: int
+    resource_id: str
+    text: str
+    class_name: str
+    package: str
+    content_desc: str
+    bounds: Tuple[int, int, int, int]
+    flags: int
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        left, top, right, bottom = self.bounds
+        return (left + right) // 2, (top + bottom) // 2
+
+    def has(self, flag: int) -> bool:
+        return bool(self.flags & flag)
+
+
+class UiHierarchy:
+    """uiautomator dump 结果的节点表，按 resource-id / text / class 建立索引"""
+
+    def __init__(self, nodes: List[UiNode]):
+        self.nodes = nodes
+        self._by_id: Dict[str, List[int]] = {}
+        self._by_short_id: Dict[str, List[int]] = {}
+        self._by_text: Dict[str, List[int]] = {}
+        self._by_class: Dict[str, List[int]] = {}
+        for node in nodes:
+            if node.resource_id:
+                self._by_id.setdefault(node.resource_id, []).append(node.index)
+                short_id = node.resource_id.rsplit("/", 1)[-1]
+                self._by_short_id.setdefault(short_id, []).append(node.index)
+            if node.text:
+                self._by_text.setdefault(node.text, []).append(node.index)
+            self._by_class.setdefault(node.class_name, []).append(node.index)
+
+    @classmethod
+    def from_xml(cls, xml_bytes: bytes) -> "UiHierarchy":
+        """增量解析 XML，边解析边释放元素，内存只保留节点表"""
+        nodes: List[UiNode] = []
+        stack: List[int] = []
+        for event, elem in ET.iterparse(io.BytesIO(xml_bytes), events=("start", "end")):
+            if elem.tag != "node":
+                continue
+            if event == "end":
+                stack.pop()
+                elem.clear()
+                continue
+
+            attrib = elem.attrib
+            flags = 0
+            for name, flag in _FLAG_ATTRS:
+                if attrib.get(name) == "true":
+                    flags |= flag
+            match = _BOUNDS_RE.match(attrib.get("bounds", ""))
+            bounds = tuple(int(v) for v in match.groups()) if match else (0, 0, 0, 0)
+            index = len(nodes)
+            nodes.append(UiNode(
+                index=index,
+                parent=stack[-1] if stack else -1,
+                depth=len(stack),
+                resource_id=sys.intern(attrib.get("resource-id", "")),
+                text=attrib.get("text", ""),
+                class_name=sys.intern(attrib.get("class", "")),
+                package=sys.intern(attrib.get("package", "")),
+                content_desc=attrib.get("content-desc", ""),
+                bounds=bounds,
+                flags=flags,
+            ))
+            stack.append(index)
+        return cls(nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def find(self, resource_id: str = None, text: str = None, class_name: str = None,
+             contains: bool = False) -> List[UiNode]:
+        """
+        按条件查找节点，多个条件取交集
+        参数:
+            resource_id: 完整 id（pkg:id/name）或短 id（name）
+            text: 节点文本
+            class_name: 控件类名
+            contains: text 是否按包含匹配
+        """
+        candidates: Optional[set] = None
+
+        def narrow(indexes):
+            nonlocal candidates
+            found = set(indexes)
+            candidates = found if candidates is None else candidates & found
+
+        if resource_id:
+            index_map = self._by_id if ":id/" in resource_id else self._by_short_id
+            narrow(index_map.get(resource_id, ()))
+        if text:
+            if contains:
+                narrow(i for key, ids in self._by_text.items() if text in key for i in ids)
+            else:
+                narrow(self._by_text.get(text, ()))
+        if class_name:
+            narrow(self._by_class.get(class_name, ()))
+
+        if candidates is None:
+            return []
+        return [self.nodes[i] for i in sorted(candidates)]
+
+    def find_one(self, **kwargs) -> Optional[UiNode]:
+        found = self.find(**kwargs)
+        return found[0] if found else None
+
+    def focused(self) -> Optional[UiNode]:
+        """返回当前获得焦点的节点（STB 遥控操作的关键信息）"""
+        for node in self.nodes:
+            if node.flags & FLAG_FOCUSED:
+                return node
+        return None
+
+    def fingerprint(self) -> str:
+        """
+        界面指纹：只取结构、类名、短 id 和归一化文本
+        忽略焦点、选中状态和坐标，数字统一替换，避免时钟/进度条导致同一界面被重复计数
+        """
+        digest = hashlib.blake2b(digest_size=8)
+        for node in self.nodes:
+            text = _DIGITS_RE.sub("#", node.text)[:32]
+            short_id = node.resource_id.rsplit("/", 1)[-1]
+            digest.update(f"{node.depth}|{node.class_name}|{short_id}|{text}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    @property
+    def package(self) -> str:
+        """根节点所属包名"""
+        return self.nodes[0].package if self.nodes else ""
+
+    def interactive_nodes(self) -> List[UiNode]:
+        """返回可点击或可获得焦点的节点"""
+        return [n for n in self.nodes if n.flags & (FLAG_CLICKABLE | FLAG_FOCUSABLE)]
+
+
+def dump_ui_xml(device_ip: str, timeout: int = 20) -> bytes:
+    """
+    通过 exec-out 直接获取 uiautomator dump 的 XML，不落地 /sdcard 也不 pull
+    部分设备不支持写 /dev/tty，此时在同一次 shell 中写临时文件再 cat 回来
+    """
+    raw = run_adb_bytes(["adb", "-s", device_ip, "exec-out", "uiautomator", "dump", "/dev/tty"], timeout=timeout)
+    if b"</hierarchy>" not in raw:
+        raw = run_adb_bytes(
+            ["adb", "-s", device_ip, "exec-out",
+             f"uiautomator dump {_DEVICE_XML_PATH} >/dev/null && cat {_DEVICE_XML_PATH}"],
+            timeout=timeout
+        )
+    start = raw.find(b"<?xml")
+    if start == -1:
+        start = raw.find(b"<hierarchy")
+    end = raw.rfind(b"</hierarchy>")
+    if start == -1 or end == -1:
+        raise ValueError(f"Invalid uiautomator output: {raw[:200]!r}")
+    return raw[start:end + len(b"</hierarchy>")]
+
+
+def get_focus_window(device_ip: str, timeout: int = 10) -> str:
+    """获取 mCurrentFocus 行，作为界面是否切换的轻量判断依据"""
+    output = subprocess.run(
+        ["adb", "-s", device_ip, "shell", "dumpsys window | grep mCurrentFocus"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        encoding="utf-8",
+        errors="ignore",
+        timeout=timeout,
+        creationflags=NO_WINDOW
+    ).stdout
+    return output.strip().splitlines()[0].strip() if output.strip() else ""
+
+
+def get_screen_state(device_ip: str, timeout: int = 10) -> Tuple[str, str]:
+    """
+    一次 shell 调用返回 (mCurrentFocus 行, 焦点应用已渲染的帧数)
+    帧数是廉价的内容指纹：窗口不变但界面内容刷新（列表滚动、异步加载、外部输入）时也会变化
+    """
+    output = subprocess.run(
+        ["adb", "-s", device_ip, "shell",
+         "f=$(dumpsys window | grep -m1 mCurrentFocus); echo \"$f\"; p=${f##* }; "
+         "dumpsys gfxinfo \"${p%%/*}\" | grep -m1 'Total frames rendered'"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        encoding="utf-8",
+        errors="ignore",
+        timeout=timeout,
+        creationflags=NO_WINDOW
+    ).stdout
+    lines = [line.strip() for line in output.strip().splitlines()] + ["", ""]
+    return lines[0], lines[1]
+
+
+def window_component(focus_line: str) -> str:
+    """
+    把 mCurrentFocus / mFocusedApp 行归一化为 pkg/Activity（.Activity 简写补全包名）
+    窗口 hash、用户号、任务号不参与比较；非 Activity 窗口（状态栏、弹窗等）返回空串
+    """
+    match = _COMPONENT_RE.search(focus_line)
+    if not match:
+        return ""
+    package, activity = match.groups()
+    return f"{package}/{package}{activity}" if activity.startswith(".") else f"{package}/{activity}"
+
+
+class UiHierarchyCache:
+    """
+    按设备缓存 UI 层级
+    - max_age 内的重复查询直接命中缓存，不做任何 adb 调用（只覆盖同一次操作中的连续查找）
+    - 超过 max_age 后检查一次焦点窗口与已渲染帧数，两者都未变化才继续复用
+    - 主动注入按键/输入、启动或重启应用后应调用 invalidate()
+    """
+
+    def __init__(self, max_age: float = 0.5):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Tuple[str, str], UiHierarchy, float]] = {}
+
+    def get(self, device_ip: str, force: bool = False) -> Tuple[UiHierarchy, bool]:
+        """返回 (层级, 是否命中缓存)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(device_ip)
+
+        if entry and not force:
+            state, hierarchy, checked_at = entry
+            if now - checked_at < self.max_age:
+                return hierarchy, True
+            # 取不到帧数（系统窗口、老设备）时无法判断内容是否变化，不复用
+            if state[1] and get_screen_state(device_ip) == state:
+                with self._lock:
+                    self._entries[device_ip] = (state, hierarchy, time.monotonic())
+                return hierarchy, True
+
+        state = get_screen_state(device_ip)
+        hierarchy = UiHierarchy.from_xml(dump_ui_xml(device_ip))
+        with self._lock:
+            self._entries[device_ip] = (state, hierarchy, time.monotonic())
+        return hierarchy, False
+
+    def focus_of(self, device_ip: str) -> str:
+        """返回缓存条目对应的焦点窗口"""
+        with self._lock:
+            entry = self._entries.get(device_ip)
+        return entry[0][0] if entry else ""
+
+    def invalidate(self, device_ip: str = None) -> None:
+        with self._lock:
+            if device_ip is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(device_ip, None)
@@ -1,5 +1,10 @@
+import os
 import subprocess
 
+# Windows 下隐藏子进程控制台窗口，其它平台不需要该标志
+NO_WINDOW = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
+
+
 def execute_adb_command(command):
     """
     执行 adb 命令并返回输出字符串
@@ -11,3 +16,26 @@ def execute_adb_command(command):
         return output.strip()
     except subprocess.CalledProcessError as e:
         return f"Error: {e.output.strip()}"
+
+
+def run_adb_bytes(command: list, timeout: int = 30, input_data: bytes = None) -> bytes:
+    """
+    执行 adb 命令并返回原始字节输出（用于 exec-out 等二进制流场景）
+    :param command: adb 命令参数列表
+    :param timeout: 超时时间（秒）
+    :param input_data: 写入子进程 stdin 的数据
+    :return: stdout 原始字节
+    :raises subprocess.CalledProcessError: 命令返回非 0
+    :raises subprocess.TimeoutExpired: 命令超时
+    """
+    result = subprocess.run(
+        command,
+        input=input_data,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        timeout=timeout,
+        creationflags=NO_WINDOW
+    )
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, command, output=result.stdout, stderr=result.stderr)
+    return result.stdout
@@ -0,0 +1,432 @@
+import hashlib
+import os
+import struct
+import threading
+import zipfile
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+# ----- 二进制资源块类型（frameworks/base/libs/androidfw/ResourceTypes.h） -----
+RES_STRING_POOL_TYPE = 0x0001
+RES_TABLE_TYPE = 0x0002
+RES_XML_TYPE = 0x0003
+RES_XML_START_NAMESPACE_TYPE = 0x0100
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_END_ELEMENT_TYPE = 0x0103
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+RES_TABLE_PACKAGE_TYPE = 0x0200
+RES_TABLE_TYPE_TYPE = 0x0201
+
+UTF8_FLAG = 1 << 8
+NO_INDEX = 0xFFFFFFFF
+
+TYPE_REFERENCE = 0x01
+TYPE_STRING = 0x03
+TYPE_FLOAT = 0x04
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+TYPE_INT_BOOLEAN = 0x12
+
+ENTRY_FLAG_COMPLEX = 0x0001
+ENTRY_FLAG_COMPACT = 0x0008
+TYPE_FLAG_SPARSE = 0x01
+TYPE_FLAG_OFFSET16 = 0x02
+
+# 混淆过的 APK 会去掉属性名字符串，只能通过资源 ID 识别
+ATTR_IDS = {
+    0x01010001: "label",
+    0x01010002: "icon",
+    0x01010003: "name",
+    0x0101020c: "minSdkVersion",
+    0x0101021b: "versionCode",
+    0x0101021c: "versionName",
+    0x01010270: "targetSdkVersion",
+    0x01010271: "maxSdkVersion",
+    0x01010281: "glEsVersion",
+    0x0101028e: "required",
+    0x01010572: "compileSdkVersion",
+    0x01010573: "compileSdkVersionCodename",
+}
+
+ACTION_MAIN = "android.intent.action.MAIN"
+CATEGORY_LAUNCHER = "android.intent.category.LAUNCHER"
+CATEGORY_LEANBACK = "android.intent.category.LEANBACK_LAUNCHER"
+
+_CACHE_SIZE = 64
+_cache: "OrderedDict[str, ApkInfo]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+@dataclass
+class ApkInfo:
+    """APK 清单与资源中解析出的关键信息"""
+    path: str
+    package: str = ""
+    version_code: int = 0
+    version_name: str = ""
+    min_sdk: int = 0
+    target_sdk: int = 0
+    compile_sdk: int = 0
+    platform_build: str = ""
+    label: str = ""
+    icon: str = ""
+    split: str = ""
+    launchable_activity: str = ""
+    leanback_activity: str = ""
+    permissions: List[str] = field(default_factory=list)
+    features: List[str] = field(default_factory=list)
+    native_abis: List[str] = field(default_factory=list)
+    file_size: int = 0
+    digest: str = ""
+
+
+class StringPool:
+    """ResStringPool，字符串按需解码并缓存"""
+
+    def __init__(self, data: bytes, offset: int):
+        _, header_size, size = struct.unpack_from("<HHI", data, offset)
+        count, _, flags, strings_start, _ = struct.unpack_from("<IIIII", data, offset + 8)
+        self._data = data
+        self._utf8 = bool(flags & UTF8_FLAG)
+        self._base = offset + strings_start
+        self._offsets = struct.unpack_from(f"<{count}I", data, offset + header_size)
+        self._decoded: Dict[int, str] = {}
+        self.size = size
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def get(self, index: int) -> str:
+        if index == NO_INDEX or index >= len(self._offsets):
+            return ""
+        cached = self._decoded.get(index)
+        if cached is not None:
+            return cached
+
+        data = self._data
+        pos = self._base + self._offsets[index]
+        if self._utf8:
+            # 先是 UTF-16 字符数，再是 UTF-8 字节数，各占 1~2 字节
+            pos += 2 if data[pos] & 0x80 else 1
+            length = data[pos]
+            if length & 0x80:
+                length = ((length & 0x7F) << 8) | data[pos + 1]
+                pos += 2
+            else:
+                pos += 1
+            value = data[pos:pos + length].decode("utf-8", errors="replace")
+        else:
+            length = struct.unpack_from("<H", data, pos)[0]
+            if length & 0x8000:
+                length = ((length & 0x7FFF) << 16) | struct.unpack_from("<H", data, pos + 2)[0]
+                pos += 4
+            else:
+                pos += 2
+            value = data[pos:pos + length * 2].decode("utf-16-le", errors="replace")
+        self._decoded[index] = value
+        return value
+
+
+class ResourceTable:
+    """
+    resources.arsc 解析
+    只建立 (包, 类型) -> 类型块偏移 的索引，查询时才解析具体条目
+    """
+
+    def __init__(self, data: bytes):
+        self._data = data
+        chunk_type, header_size, _ = struct.unpack_from("<HHI", data, 0)
+        if chunk_type != RES_TABLE_TYPE:
+            raise ValueError("Not a resource table")
+        self.strings: Optional[StringPool] = None
+        # (package_id, type_id) -> [(config_language, entry_count, entries_start, offsets_start, flags, chunk_offset)]
+        self._types: Dict[Tuple[int, int], List[Tuple[str, int, int, int, int, int]]] = {}
+
+        pos = header_size
+        while pos + 8 <= len(data):
+            chunk_type, _, size = struct.unpack_from("<HHI", data, pos)
+            if size <= 0:
+                break
+            if chunk_type == RES_STRING_POOL_TYPE and self.strings is None:
+                self.strings = StringPool(data, pos)
+            elif chunk_type == RES_TABLE_PACKAGE_TYPE:
+                self._index_package(pos, size)
+            pos += size
+
+    def _index_package(self, offset: int, size: int) -> None:
+        data = self._data
+        header_size = struct.unpack_from("<H", data, offset + 2)[0]
+        package_id = struct.unpack_from("<I", data, offset + 8)[0]
+        pos = offset + header_size
+        end = offset + size
+        while pos + 8 <= end:
+            chunk_type, chunk_header, chunk_size = struct.unpack_from("<HHI", data, pos)
+            if chunk_size <= 0:
+                break
+            if chunk_type == RES_TABLE_TYPE_TYPE:
+                type_id, flags = data[pos + 8], data[pos + 9]
+                entry_count, entries_start = struct.unpack_from("<II", data, pos + 12)
+                # ResTable_config 紧跟在 entriesStart 之后：size(4) mcc(2) mnc(2) language(2) country(2)
+                language = data[pos + 28:pos + 30].rstrip(b"\0").decode("ascii", errors="ignore")
+                self._types.setdefault((package_id, type_id), []).append(
+                    (language, entry_count, pos + entries_start, pos + chunk_header, flags, pos)
+                )
+            pos += chunk_size
+
+    def _entry_offset(self, entry_count: int, offsets_start: int, flags: int, entry_index: int) -> Optional[int]:
+        data = self._data
+        if flags & TYPE_FLAG_SPARSE:
+            # 稀疏表：按 (idx u16, offset/4 u16) 有序排列，二分查找
+            low, high = 0, entry_count - 1
+            while low <= high:
+                mid = (low + high) // 2
+                idx, off = struct.unpack_from("<HH", data, offsets_start + mid * 4)
+                if idx == entry_index:
+                    return off * 4
+                if idx < entry_index:
+                    low = mid + 1
+                else:
+                    high = mid - 1
+            return None
+        if entry_index >= entry_count:
+            return None
+        if flags & TYPE_FLAG_OFFSET16:
+            off = struct.unpack_from("<H", data, offsets_start + entry_index * 2)[0]
+            return None if off == 0xFFFF else off * 4
+        off = struct.unpack_from("<I", data, offsets_start + entry_index * 4)[0]
+        return None if off == NO_INDEX else off
+
+    def _read_value(self, pos: int) -> Optional[Tuple[int, int]]:
+        data = self._data
+        size, flags = struct.unpack_from("<HH", data, pos)
+        if flags & ENTRY_FLAG_COMPACT:
+            return flags >> 8, struct.unpack_from("<I", data, pos + 4)[0]
+        if flags & ENTRY_FLAG_COMPLEX:
+            return None
+        _, _, data_type, value = struct.unpack_from("<HBBI", data, pos + size)
+        return data_type, value
+
+    def resolve(self, res_id: int, depth: int = 0) -> str:
+        """解析资源 ID 为字符串值，优先默认语言配置，引用链最多跟随 5 层"""
+        package_id, type_id, entry_index = res_id >> 24, (res_id >> 16) & 0xFF, res_id & 0xFFFF
+        configs = self._types.get((package_id, type_id), [])
+        fallback = ""
+        for language, entry_count, entries_start, offsets_start, flags, _ in sorted(configs, key=lambda c: c[0] != ""):
+            offset = self._entry_offset(entry_count, offsets_start, flags, entry_index)
+            if offset is None:
+                continue
+            value = self._read_value(entries_start + offset)
+            if value is None:
+                continue
+            data_type, data = value
+            if data_type == TYPE_STRING and self.strings is not None:
+                text = self.strings.get(data)
+            elif data_type == TYPE_REFERENCE and depth < 5 and data:
+                text = self.resolve(data, depth + 1)
+            else:
+                text = format_value(data_type, data)
+            if text and not language:
+                return text
+            fallback = fallback or text
+        return fallback
+
+
+def format_value(data_type: int, data: int) -> str:
+    """Res_value 转可读字符串"""
+    if data_type == TYPE_INT_DEC:
+        return str(struct.unpack("<i", struct.pack("<I", data))[0])
+    if data_type == TYPE_INT_HEX:
+        return hex(data)
+    if data_type == TYPE_INT_BOOLEAN:
+        return "true" if data else "false"
+    if data_type == TYPE_FLOAT:
+        return str(struct.unpack("<f", struct.pack("<I", data))[0])
+    if data_type == TYPE_REFERENCE:
+        return f"@0x{data:08x}"
+    return str(data)
+
+
+def iter_axml(data: bytes):
+    """
+    遍历二进制 XML，产生 ("start", 标签名, {属性名: (类型, 原始数据, 字符串值)}) 与 ("end", 标签名, None)
+    """
+    chunk_type, header_size, _ = struct.unpack_from("<HHI", data, 0)
+    if chunk_type != RES_XML_TYPE:
+        raise ValueError("Not a binary XML document")
+
+    strings: Optional[StringPool] = None
+    resource_ids: Tuple[int, ...] = ()
+    pos = header_size
+    while pos + 8 <= len(data):
+        chunk_type, chunk_header, size = struct.unpack_from("<HHI", data, pos)
+        if size <= 0:
+            break
+        if chunk_type == RES_STRING_POOL_TYPE:
+            strings = StringPool(data, pos)
+        elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+            count = (size - chunk_header) // 4
+            resource_ids = struct.unpack_from(f"<{count}I", data, pos + chunk_header)
+        elif chunk_type == RES_XML_START_ELEMENT_TYPE and strings is not None:
+            ext = pos + chunk_header
+            _, name, attr_start, attr_size, attr_count = struct.unpack_from("<IIHHH", data, ext)
+            attrs = {}
+            for i in range(attr_count):
+                a = ext + attr_start + i * attr_size
+                _, attr_name, raw_value, _, _, data_type, value = struct.unpack_from("<IIIHBBI", data, a)
+                key = ATTR_IDS.get(resource_ids[attr_name]) if attr_name < len(resource_ids) else None
+                key = key or strings.get(attr_name)
+                text = strings.get(raw_value) if raw_value != NO_INDEX else (
+                    strings.get(value) if data_type == TYPE_STRING else format_value(data_type, value))
+                attrs[key] = (data_type, value, text)
+            yield "start", strings.get(name), attrs
+        elif chunk_type == RES_XML_END_ELEMENT_TYPE and strings is not None:
+            name = struct.unpack_from("<I", data, pos + chunk_header + 4)[0]
+            yield "end", strings.get(name), None
+        pos += size
+
+
+def read_central_directory(path: str) -> Tuple[bytes, int]:
+    """读取 ZIP 中央目录原始字节（支持 zip64），返回 (中央目录, 文件大小)"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        file_size = f.tell()
+        tail_size = min(file_size, 65536 + 22)
+        f.seek(file_size - tail_size)
+        tail = f.read(tail_size)
+        eocd = tail.rfind(b"PK\x05\x06")
+        if eocd == -1:
+            raise ValueError(f"Not a zip archive: {path}")
+        cd_size, cd_offset = struct.unpack_from("<II", tail, eocd + 12)
+        locator = eocd - 20
+        if (cd_offset == 0xFFFFFFFF or cd_size == 0xFFFFFFFF) and locator >= 0 and tail[locator:locator + 4] == b"PK\x06\x07":
+            zip64_offset = struct.unpack_from("<Q", tail, locator + 8)[0]
+            f.seek(zip64_offset)
+            record = f.read(56)
+            cd_size, cd_offset = struct.unpack_from("<QQ", record, 40)
+        f.seek(cd_offset)
+        return f.read(cd_size), file_size
+
+
+def central_directory_digest(path: str) -> str:
+    """
+    只读取 ZIP 中央目录求摘要：其中包含每个条目的 CRC 与大小，内容变化必然反映在这里
+    200MB 的 APK 也只需读取几十 KB
+    """
+    central_directory, file_size = read_central_directory(path)
+    digest = hashlib.blake2b(central_directory, digest_size=16)
+    digest.update(str(file_size).encode("ascii"))
+    return digest.hexdigest()
+
+
+def _attr_int(attrs: dict, name: str) -> int:
+    value = attrs.get(name)
+    if not value:
+        return 0
+    data_type, data, text = value
+    if data_type in (TYPE_INT_DEC, TYPE_INT_HEX):
+        return data
+    return int(text) if text.isdigit() else 0
+
+
+def _parse_manifest(info: ApkInfo, manifest: bytes, table: Optional[ResourceTable]) -> None:
+    def text_of(attrs: dict, name: str) -> str:
+        value = attrs.get(name)
+        if not value:
+            return ""
+        data_type, data, text = value
+        if data_type == TYPE_REFERENCE and table is not None:
+            return table.resolve(data) or text
+        return text
+
+    stack: List[str] = []
+    activity = ""
+    filter_actions, filter_categories = set(), set()
+    for event, tag, attrs in iter_axml(manifest):
+        if event == "end":
+            if stack:
+                stack.pop()
+            if tag == "intent-filter" and activity and ACTION_MAIN in filter_actions:
+                if CATEGORY_LAUNCHER in filter_categories and not info.launchable_activity:
+                    info.launchable_activity = activity
+                if CATEGORY_LEANBACK in filter_categories and not info.leanback_activity:
+                    info.leanback_activity = activity
+            elif tag in ("activity", "activity-alias"):
+                activity = ""
+            continue
+
+        parent = stack[-1] if stack else ""
+        stack.append(tag)
+        if tag == "manifest":
+            info.package = text_of(attrs, "package")
+            info.version_code = _attr_int(attrs, "versionCode")
+            info.version_name = text_of(attrs, "versionName")
+            info.compile_sdk = _attr_int(attrs, "compileSdkVersion") or _attr_int(attrs, "platformBuildVersionCode")
+            info.platform_build = text_of(attrs, "platformBuildVersionName")
+            info.split = text_of(attrs, "split")
+        elif tag == "uses-sdk":
+            info.min_sdk = _attr_int(attrs, "minSdkVersion") or 1
+            info.target_sdk = _attr_int(attrs, "targetSdkVersion") or info.min_sdk
+        elif tag in ("uses-permission", "uses-permission-sdk-23"):
+            name = text_of(attrs, "name")
+            if name and name not in info.permissions:
+                info.permissions.append(name)
+        elif tag == "uses-feature":
+            name = text_of(attrs, "name")
+            if name:
+                required = text_of(attrs, "required") != "false"
+                info.features.append(name if required else f"{name} (not required)")
+        elif tag == "application":
+            info.label = text_of(attrs, "label")
+            info.icon = text_of(attrs, "icon")
+        elif tag in ("activity", "activity-alias") and parent == "application":
+            name = text_of(attrs, "name")
+            activity = f"{info.package}{name}" if name.startswith(".") else name
+        elif tag == "intent-filter":
+            filter_actions, filter_categories = set(), set()
+        elif tag == "action" and parent == "intent-filter":
+            filter_actions.add(text_of(attrs, "name"))
+        elif tag == "category" and parent == "intent-filter":
+            filter_categories.add(text_of(attrs, "name"))
+
+
+def parse_apk(path: str, use_cache: bool = True) -> ApkInfo:
+    """
+    进程内解析 APK，不依赖 aapt
+    只读取 AndroidManifest.xml 与 resources.arsc 两个条目，结果按中央目录摘要缓存
+    :raises ValueError: 文件不是合法 APK
+    """
+    digest = central_directory_digest(path)
+    if use_cache:
+        with _cache_lock:
+            cached = _cache.get(digest)
+            if cached is not None:
+                _cache.move_to_end(digest)
+                return _copy_info(cached, path)
+
+    with zipfile.ZipFile(path) as apk:
+        names = apk.namelist()
+        if "AndroidManifest.xml" not in names:
+            raise ValueError(f"AndroidManifest.xml not found in {path}")
+        manifest = apk.read("AndroidManifest.xml")
+        table = ResourceTable(apk.read("resources.arsc")) if "resources.arsc" in names else None
+
+    info = ApkInfo(path=path, file_size=os.path.getsize(path), digest=digest)
+    _parse_manifest(info, manifest, table)
+    info.native_abis = sorted({
+        name.split("/")[1] for name in names
+        if name.startswith("lib/") and name.endswith(".so") and name.count("/") >= 2
+    })
+
+    with _cache_lock:
+        _cache[digest] = info
+        _cache.move_to_end(digest)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return _copy_info(info, path)
+
+
+def _copy_info(info: ApkInfo, path: str) -> ApkInfo:
+    """缓存中的对象不直接交给调用方，列表字段一并复制，调用方修改不会污染缓存"""
+    return replace(info, path=path, permissions=list(info.permissions), features=list(info.features),
+                   native_abis=list(info.native_abis))
@@ -0,0 +1,157 @@
+import struct
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Tuple
+
+from utils.apk_parser import read_central_directory
+
+_CD_HEADER = struct.Struct("<4sHHHHHHIIIHHHHHII")
+_CD_SIGNATURE = b"PK\x01\x02"
+_ZIP64_EXTRA = 0x0001
+_FLAG_UTF8 = 0x0800
+METHOD_STORED = 0
+
+
+class SizeEntry(NamedTuple):
+    """中央目录中的单个条目"""
+    name: str
+    compressed: int
+    size: int
+    method: int
+    crc: int
+
+
+def category_of(name: str) -> str:
+    """按路径归类：dex、各 ABI 的 native 库、resources.arsc、res、assets、签名等"""
+    if name.startswith("lib/"):
+        parts = name.split("/")
+        return f"native/{parts[1]}" if len(parts) > 2 else "native"
+    if name.endswith(".dex") and "/" not in name:
+        return "dex"
+    if name == "resources.arsc":
+        return "resources.arsc"
+    if name.startswith("res/"):
+        return "res"
+    if name.startswith("assets/"):
+        return "assets"
+    if name.startswith("META-INF/"):
+        return "META-INF"
+    if name == "AndroidManifest.xml":
+        return "manifest"
+    return "other"
+
+
+def read_entries(path: str) -> Tuple[Dict[str, SizeEntry], int]:
+    """只解析中央目录，返回 (条目名 -> 条目, 文件大小)，耗时与条目数成正比，与文件大小无关"""
+    data, file_size = read_central_directory(path)
+    entries: Dict[str, SizeEntry] = {}
+    pos, end = 0, len(data)
+    while pos + _CD_HEADER.size <= end:
+        (signature, _, _, flags, method, _, _, crc, compressed, size,
+         name_len, extra_len, comment_len, _, _, _, _) = _CD_HEADER.unpack_from(data, pos)
+        if signature != _CD_SIGNATURE:
+            break
+        name_start = pos + _CD_HEADER.size
+        raw_name = data[name_start:name_start + name_len]
+        name = raw_name.decode("utf-8" if flags & _FLAG_UTF8 else "cp437", errors="replace")
+        if size == 0xFFFFFFFF or compressed == 0xFFFFFFFF:
+            size, compressed = _zip64_sizes(data, name_start + name_len, extra_len, size, compressed)
+        if not name.endswith("/"):
+            entries[name] = SizeEntry(name, compressed, size, method, crc)
+        pos = name_start + name_len + extra_len + comment_len
+    return entries, file_size
+
+
+def _zip64_sizes(data: bytes, start: int, length: int, size: int, compressed: int) -> Tuple[int, int]:
+    pos, end = start, start + length
+    while pos + 4 <= end:
+        tag, block_len = struct.unpack_from("<HH", data, pos)
+        if tag == _ZIP64_EXTRA:
+            values = pos + 4
+            if size == 0xFFFFFFFF:
+                size = struct.unpack_from("<Q", data, values)[0]
+                values += 8
+            if compressed == 0xFFFFFFFF:
+                compressed = struct.unpack_from("<Q", data, values)[0]
+            break
+        pos += 4 + block_len
+    return size, compressed
+
+
+@dataclass
+class CategorySize:
+    count: int = 0
+    compressed: int = 0
+    size: int = 0
+    stored: int = 0  # 未压缩存储的字节（对齐的 .so、resources.arsc 等），直接影响下载与安装体积
+
+
+@dataclass
+class ApkSizeReport:
+    path: str
+    file_size: int
+    entries: Dict[str, SizeEntry] = field(default_factory=dict)
+    categories: Dict[str, CategorySize] = field(default_factory=dict)
+
+    @property
+    def overhead(self) -> int:
+        """ZIP 头、中央目录与 APK 签名块等非条目数据"""
+        return self.file_size - sum(c.compressed for c in self.categories.values())
+
+    def largest(self, limit: int = 10) -> List[SizeEntry]:
+        return sorted(self.entries.values(), key=lambda e: e.compressed, reverse=True)[:limit]
+
+
+def analyze_apk_size(path: str) -> ApkSizeReport:
+    entries, file_size = read_entries(path)
+    report = ApkSizeReport(path=path, file_size=file_size, entries=entries)
+    for entry in entries.values():
+        category = report.categories.setdefault(category_of(entry.name), CategorySize())
+        category.count += 1
+        category.compressed += entry.compressed
+        category.size += entry.size
+        if entry.method == METHOD_STORED:
+            category.stored += entry.size
+    return report
+
+
+class EntryDelta(NamedTuple):
+    name: str
+    status: str  # added / removed / changed
+    old_compressed: int
+    new_compressed: int
+
+    @property
+    def delta(self) -> int:
+        return self.new_compressed - self.old_compressed
+
+
+def compare_reports(old: ApkSizeReport, new: ApkSizeReport) -> Tuple[Dict[str, Tuple[int, int]], List[EntryDelta]]:
+    """
+    逐条目对比两个 APK
+    返回 (分类 -> (旧压缩大小, 新压缩大小), 按压缩大小变化绝对值排序的条目差异)
+    CRC 与大小都相同的条目视为未变化
+    """
+    categories = {
+        name: (old.categories.get(name, CategorySize()).compressed, new.categories.get(name, CategorySize()).compressed)
+        for name in sorted(set(old.categories) | set(new.categories))
+    }
+    deltas = []
+    for name in set(old.entries) | set(new.entries):
+        before, after = old.entries.get(name), new.entries.get(name)
+        if before is None:
+            deltas.append(EntryDelta(name, "added", 0, after.compressed))
+        elif after is None:
+            deltas.append(EntryDelta(name, "removed", before.compressed, 0))
+        elif (before.crc, before.size) != (after.crc, after.size) or before.compressed != after.compressed:
+            deltas.append(EntryDelta(name, "changed", before.compressed, after.compressed))
+    deltas.sort(key=lambda d: abs(d.delta), reverse=True)
+    return categories, deltas
+
+
+def format_size(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KB", "MB"):
+        if abs(value) < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.2f} GB"
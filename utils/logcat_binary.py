@@ -0,0 +1,179 @@
+import struct
+import time
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+# logger_entry 公共前缀：len, hdr_size(v1 为填充 0), pid, tid, sec, nsec
+_HEADER = struct.Struct("<HHiIII")
+_V1_HEADER_SIZE = 20
+_V2_HEADER_SIZE = 24   # v2 多 euid，v3 多 lid
+_V4_HEADER_SIZE = 28   # v4 多 lid + uid
+_U32 = struct.Struct("<I")
+_LID_UID = struct.Struct("<II")
+MAX_PAYLOAD = 5 * 1024  # LOGGER_ENTRY_MAX_PAYLOAD 为 4068，超出视为流已损坏
+
+# events / stats / security 缓冲区的载荷是二进制事件，而不是 priority + tag + message
+BINARY_LOG_IDS = {2, 5, 6}
+PRIORITY_CHARS = "??VDIWEFS"
+FORMATS = ("brief", "time", "threadtime", "tag", "process", "raw")
+
+
+class LogEntry(NamedTuple):
+    """
+    一条二进制 logcat 记录
+    payload 是指向原始缓冲区的 memoryview，tag / message 在渲染时才解码
+    """
+    sec: int
+    nsec: int
+    pid: int
+    tid: int
+    lid: int
+    uid: int
+    payload: memoryview
+
+    @property
+    def is_text(self) -> bool:
+        return self.lid not in BINARY_LOG_IDS
+
+    @property
+    def priority(self) -> int:
+        return self.payload[0] if self.is_text and len(self.payload) else 0
+
+    @property
+    def level(self) -> str:
+        priority = self.priority
+        return PRIORITY_CHARS[priority] if priority < len(PRIORITY_CHARS) else "?"
+
+    def _split(self) -> Tuple[bytes, bytes]:
+        raw = self.payload.tobytes()
+        if not self.is_text:
+            tag_id = _U32.unpack_from(raw)[0] if len(raw) >= 4 else 0
+            return str(tag_id).encode(), raw[4:].hex(" ").encode()
+        tag, _, message = raw[1:].partition(b"\0")
+        return tag, message.rstrip(b"\0")
+
+    @property
+    def tag(self) -> str:
+        return self._split()[0].decode("utf-8", errors="replace")
+
+    @property
+    def message(self) -> str:
+        return self._split()[1].decode("utf-8", errors="replace")
+
+    @property
+    def timestamp(self) -> float:
+        return self.sec + self.nsec / 1e9
+
+
+def _iter_entries(view: memoryview, offset: int) -> Iterator[Tuple[LogEntry, int]]:
+    """逐条解析完整记录，同时返回下一条的起始位置；遇到不完整的尾部即停止"""
+    end = len(view)
+    while offset + _V1_HEADER_SIZE <= end:
+        length, header_size, pid, tid, sec, nsec = _HEADER.unpack_from(view, offset)
+        if header_size == 0:
+            header_size = _V1_HEADER_SIZE
+        if header_size not in (_V1_HEADER_SIZE, _V2_HEADER_SIZE, _V4_HEADER_SIZE) or length > MAX_PAYLOAD:
+            raise ValueError(f"Corrupt binary logcat stream at offset {offset} "
+                             f"(header {header_size}, payload {length})")
+        start = offset + header_size
+        if start + length > end:
+            return
+        lid = uid = 0
+        if header_size == _V4_HEADER_SIZE:
+            lid, uid = _LID_UID.unpack_from(view, offset + 20)
+        elif header_size == _V2_HEADER_SIZE:
+            # v2 的 euid 与 v3 的 lid 位置相同，lid 只有 0~7
+            lid = _U32.unpack_from(view, offset + 20)[0]
+            lid = lid if lid < 8 else 0
+        offset = start + length
+        yield LogEntry(sec, nsec, pid, tid, lid, uid, view[start:offset]), offset
+
+
+def decode_entries(buffer) -> List[LogEntry]:
+    """解析整块缓冲区（如 logcat -B -d 的完整输出），忽略末尾不完整的记录"""
+    return [entry for entry, _ in _iter_entries(memoryview(buffer), 0)]
+
+
+class BinaryLogDecoder:
+    """
+    流式解析 logcat -B 输出：feed 任意大小的块，返回其中完整的记录
+    记录直接引用传入的块，只有跨块的残余字节才会被拷贝一次
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self.entries = 0
+
+    def feed(self, chunk: bytes) -> List[LogEntry]:
+        data = self._pending + chunk if self._pending else chunk
+        entries, consumed = [], 0
+        for entry, consumed in _iter_entries(memoryview(data), 0):
+            entries.append(entry)
+        self._pending = data[consumed:]
+        self.entries += len(entries)
+        return entries
+
+    @property
+    def pending_bytes(self) -> int:
+        return len(self._pending)
+
+
+class LogFormatter:
+    """
+    把 LogEntry 渲染成与 logcat -v <fmt> 相同的文本
+    utc_offset 为设备时区偏移（秒）；为 None 时使用本机时区
+    时间前缀按秒缓存，多行消息每行都带前缀
+    """
+
+    def __init__(self, fmt: str = "threadtime", utc_offset: Optional[int] = None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported logcat format: {fmt}")
+        self.fmt = fmt
+        self.utc_offset = utc_offset
+        self._cached_sec = -1
+        self._cached_date = ""
+
+    def _date(self, sec: int) -> str:
+        if sec != self._cached_sec:
+            moment = time.gmtime(sec + self.utc_offset) if self.utc_offset is not None else time.localtime(sec)
+            self._cached_sec = sec
+            self._cached_date = time.strftime("%m-%d %H:%M:%S", moment)
+        return self._cached_date
+
+    def _prefix(self, entry: LogEntry, tag: str) -> str:
+        fmt = self.fmt
+        level = entry.level if entry.is_text else "I"
+        if fmt == "raw":
+            return ""
+        if fmt == "tag":
+            return f"{level}/{tag:<8}: "
+        if fmt == "process":
+            return f"{level}({entry.pid:5d}) "
+        if fmt == "brief":
+            return f"{level}/{tag:<8}({entry.pid:5d}): "
+        date = f"{self._date(entry.sec)}.{entry.nsec // 1000000:03d}"
+        if fmt == "time":
+            return f"{date} {level}/{tag:<8}({entry.pid:5d}): "
+        return f"{date} {entry.pid:5d} {entry.tid:5d} {level} {tag:<8}: "
+
+    def format(self, entry: LogEntry) -> str:
+        tag_raw, message_raw = entry._split()
+        tag = tag_raw.decode("utf-8", errors="replace")
+        message = message_raw.decode("utf-8", errors="replace")
+        prefix = self._prefix(entry, tag)
+        suffix = f"  ({tag})" if self.fmt == "process" else ""
+        if "\n" not in message:
+            return f"{prefix}{message}{suffix}\n"
+        return "".join(f"{prefix}{line}{suffix}\n" for line in message.split("\n"))
+
+    def render(self, entries: List[LogEntry]) -> bytes:
+        """批量渲染并一次性编码，供写盘使用"""
+        return "".join(map(self.format, entries)).encode("utf-8")
+
+
+def parse_utc_offset(text: str) -> Optional[int]:
+    """解析 date +%z 的输出（如 +0800），失败返回 None"""
+    text = text.strip()
+    if len(text) != 5 or text[0] not in "+-" or not text[1:].isdigit():
+        return None
+    seconds = int(text[1:3]) * 3600 + int(text[3:5]) * 60
+    return -seconds if text[0] == "-" else seconds
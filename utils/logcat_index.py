@@ -0,0 +1,300 @@
+import gzip
+import json
+import mmap
+import os
+import re
+import time
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖，未安装时只能读写 gzip / 明文
+    zstandard = None
+
+BLOCK_BYTES = 64 << 10
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+# 抓取与拉取得到的日志文件：logcat.txt / logcat_001.txt.gz / log_<时间>_<设备>.txt
+LOG_FILE_PATTERN = re.compile(r"^(logcat|log_).*\.txt(\.gz|\.zst)?$")
+
+# -v time:       "MM-DD HH:MM:SS.mmm P/Tag(  pid): msg"
+# -v threadtime: "MM-DD HH:MM:SS.mmm  pid  tid P Tag     : msg"
+_LINE = re.compile(
+    rb"(\d\d-\d\d \d\d:\d\d:\d\d\.\d{3}) +"
+    rb"(?:([VDIWEFS])/(.*?) *\( *(\d+)\): |(\d+) +\d+ ([VDIWEFS]) (.*?) *: )"
+)
+
+
+def parse_line(line: bytes) -> Optional[Tuple[str, str, str, str]]:
+    """解析日志行头，返回 (时间戳, 级别, tag, pid)；非日志行返回 None"""
+    parsed = split_line(line)
+    return parsed[:4] if parsed else None
+
+
+def raw_header(line: bytes) -> Optional[Tuple[bytes, bytes, bytes, bytes]]:
+    """同 parse_line，但不解码，返回原始字节 (时间戳, 级别, tag, pid)，供逐行统计的热路径使用"""
+    match = _LINE.match(line)
+    if not match:
+        return None
+    stamp, level, tag, pid, tt_pid, tt_level, tt_tag = match.groups()
+    if level is None:
+        return stamp, tt_level, tt_tag, tt_pid
+    return stamp, level, tag, pid
+
+
+def split_line(line: bytes) -> Optional[Tuple[str, str, str, str, bytes]]:
+    """同 parse_line，额外返回行头之后的消息正文"""
+    match = _LINE.match(line)
+    if not match:
+        return None
+    stamp, level, tag, pid, tt_pid, tt_level, tt_tag = match.groups()
+    if level is None:
+        level, tag, pid = tt_level, tt_tag, tt_pid
+    return (stamp.decode(), level.decode(), tag.decode("utf-8", errors="replace"), pid.decode(),
+            line[match.end():].rstrip(b"\r\n"))
+
+
+def codec_of(path: str) -> str:
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+
+def _compress_block(data: bytes, codec: str) -> bytes:
+    """每个块独立压缩成一个 gzip member / zstd frame，拼接后仍是标准文件，可按块随机读取"""
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    return data
+
+
+def _decompress_block(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    return data
+
+
+def build_index(path: str, codec: str = "none", block_bytes: int = BLOCK_BYTES) -> str:
+    """
+    为明文日志建立旁路索引（<日志>.idx），返回最终日志路径
+    - 按行边界切成约 block_bytes 的块，记录每块的偏移、首末时间戳以及 tag / pid / 级别倒排表
+    - codec 为 gzip / zstd 时按块压缩成 <path>.gz / .zst 并删除明文；查询时只解压命中的块
+    """
+    if codec == "zstd" and zstandard is None:
+        codec = "gzip"
+    elif codec not in ("gzip", "zstd"):
+        codec = "none"
+    target = path + {"gzip": ".gz", "zstd": ".zst"}.get(codec, "")
+    blocks: List[list] = []
+    postings: Dict[str, Dict[str, List[int]]] = {"tags": {}, "pids": {}, "levels": {}}
+    out = open(target, "wb") if codec != "none" else None
+    written = 0
+
+    def flush(lines: List[bytes], offset: int, first: str, last: str, seen: Dict[str, set]):
+        nonlocal written
+        data = b"".join(lines)
+        block_id = len(blocks)
+        if out is not None:
+            packed = _compress_block(data, codec)
+            out.write(packed)
+            blocks.append([written, len(packed), len(data), first, last])
+            written += len(packed)
+        else:
+            blocks.append([offset, len(data), len(data), first, last])
+        for kind, values in seen.items():
+            table = postings[kind]
+            for value in values:
+                table.setdefault(value, []).append(block_id)
+
+    try:
+        with open(path, "rb") as src:
+            lines, size, offset = [], 0, 0
+            first = last = ""
+            seen = {"tags": set(), "pids": set(), "levels": set()}
+            for line in src:
+                parsed = parse_line(line)
+                if parsed:
+                    stamp, level, tag, pid = parsed
+                    first = first or stamp
+                    last = stamp
+                    seen["tags"].add(tag)
+                    seen["pids"].add(pid)
+                    seen["levels"].add(level)
+                lines.append(line)
+                size += len(line)
+                if size >= block_bytes:
+                    flush(lines, offset, first, last, seen)
+                    offset += size
+                    lines, size, first, last = [], 0, "", ""
+                    seen = {"tags": set(), "pids": set(), "levels": set()}
+            if lines:
+                flush(lines, offset, first, last, seen)
+    finally:
+        if out is not None:
+            out.close()
+
+    index = {
+        "version": INDEX_VERSION,
+        "codec": codec,
+        "size": os.path.getsize(target),
+        "blocks": blocks,
+        **postings,
+    }
+    with open(target + INDEX_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+    if out is not None:
+        os.remove(path)
+    return target
+
+
+def load_index(path: str) -> Optional[dict]:
+    """读取旁路索引；不存在、版本不符或日志已被修改时返回 None"""
+    try:
+        with open(path + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION or index.get("size") != os.path.getsize(path):
+        return None
+    return index
+
+
+class LogQuery(NamedTuple):
+    """
+    日志查询条件，空值表示不限
+    start / end 可写成 "02:00"、"02:00:30" 或带日期的 "10-18 02:00"，end 按所写精度包含在内
+    """
+    start: str = ""
+    end: str = ""
+    tags: Tuple[str, ...] = ()
+    levels: str = ""
+    pids: Tuple[str, ...] = ()
+    text: str = ""
+
+
+class _TimeWindow:
+    def __init__(self, start: str, end: str):
+        self.start = start.strip()
+        self.end = end.strip()
+        # 不带日期时只比较一天中的时间
+        self.with_date = "-" in self.start or "-" in self.end
+        self.active = bool(self.start or self.end)
+
+    def _key(self, stamp: str) -> str:
+        return stamp if self.with_date else stamp[6:]
+
+    def contains(self, stamp: str) -> bool:
+        key = self._key(stamp)
+        return (not self.start or key >= self.start) and (not self.end or key[:len(self.end)] <= self.end)
+
+    def overlaps(self, first: str, last: str) -> bool:
+        if not self.active:
+            return True
+        if not first:
+            return False
+        if not self.with_date and first[:5] != last[:5]:
+            return True  # 跨天的块无法按一天中的时间判断，保守读取
+        return ((not self.start or self._key(last) >= self.start)
+                and (not self.end or self._key(first)[:len(self.end)] <= self.end))
+
+
+def _candidate_blocks(index: dict, query: LogQuery, window: _TimeWindow) -> List[int]:
+    candidates = None
+    for kind, values in (("tags", query.tags), ("pids", query.pids), ("levels", tuple(query.levels))):
+        if not values:
+            continue
+        table = index[kind]
+        hits = set()
+        for value in values:
+            hits.update(table.get(value, ()))
+        candidates = hits if candidates is None else candidates & hits
+    ids = sorted(candidates) if candidates is not None else range(len(index["blocks"]))
+    blocks = index["blocks"]
+    return [i for i in ids if window.overlaps(blocks[i][3], blocks[i][4])]
+
+
+def _line_matches(line: bytes, query: LogQuery, window: _TimeWindow, text: bytes, tag_bytes: List[bytes]) -> bool:
+    if text and text not in line:
+        return False
+    # 先做子串预筛，绝大多数不相关的行不需要正则解析
+    if tag_bytes and not any(tag in line for tag in tag_bytes):
+        return False
+    if not (window.active or query.tags or query.levels or query.pids):
+        return True
+    parsed = parse_line(line)
+    if not parsed:
+        return False
+    stamp, level, tag, pid = parsed
+    return ((not query.tags or tag in query.tags)
+            and (not query.levels or level in query.levels)
+            and (not query.pids or pid in query.pids)
+            and (not window.active or window.contains(stamp)))
+
+
+def search_file(path: str, index: dict, query: LogQuery) -> Tuple[List[str], dict]:
+    """按索引只读取命中的块（mmap 切片，压缩文件只解压这些块），再逐行精确过滤"""
+    window = _TimeWindow(query.start, query.end)
+    block_ids = _candidate_blocks(index, query, window)
+    text = query.text.encode("utf-8")
+    tag_bytes = [tag.encode("utf-8") for tag in query.tags]
+    matches, read = [], 0
+    if block_ids and index["size"]:
+        codec = index["codec"]
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for block_id in block_ids:
+                offset, length = index["blocks"][block_id][:2]
+                data = _decompress_block(mapped[offset:offset + length], codec)
+                read += length
+                for line in data.splitlines():
+                    if _line_matches(line, query, window, text, tag_bytes):
+                        matches.append(line.decode("utf-8", errors="replace"))
+    return matches, {"blocks": len(index["blocks"]), "blocks_read": len(block_ids), "bytes_read": read}
+
+
+class LogcatArchive:
+    """
+    目录下所有抓取日志的索引查询
+    明文日志缺少索引时首次查询会建立（一次顺序扫描），之后的查询只读取命中的块
+    旧版整体压缩、没有索引的 .gz / .zst 无法随机读取，计入 skipped
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def files(self) -> Iterator[str]:
+        for folder, _, names in os.walk(self.root):
+            for name in sorted(names):
+                if LOG_FILE_PATTERN.match(name):
+                    yield os.path.join(folder, name)
+
+    def search(self, query: LogQuery, limit: int = 5000) -> dict:
+        started = time.perf_counter()
+        results: List[Tuple[str, str]] = []
+        summary = {"files": 0, "indexed": 0, "skipped": [], "blocks": 0, "blocks_read": 0, "bytes_read": 0,
+                   "total": 0}
+        for path in self.files():
+            index = load_index(path)
+            if index is None:
+                if codec_of(path) != "none":
+                    summary["skipped"].append(path)
+                    continue
+                build_index(path)
+                summary["indexed"] += 1
+                index = load_index(path)
+            summary["files"] += 1
+            matches, stats = search_file(path, index, query)
+            for key in ("blocks", "blocks_read", "bytes_read"):
+                summary[key] += stats[key]
+            summary["total"] += len(matches)
+            source = os.path.relpath(path, self.root)
+            results.extend((source, line) for line in matches[:max(limit - len(results), 0)])
+        summary["matches"] = results
+        summary["truncated"] = summary["total"] > len(results)
+        summary["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return summary